@@ -22,10 +22,11 @@ def create_app():
     )
 
     # Ensure directories exist
-    for directory in [app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER']]:
+    # Slice directories are created per upload under BASE_PATH (see app.services.workspace)
+    for directory in [app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER'], app.config['BASE_PATH'],
+                      app.config['DECOMPRESS_CACHE_FOLDER'], app.config['VOLUME_STORE_FOLDER'],
+                      app.config['RENDER_CACHE_FOLDER']]:
         os.makedirs(directory, exist_ok=True)
-    for view in ['axial', 'coronal', 'sagittal']:
-        os.makedirs(os.path.join(app.config['BASE_PATH'], view), exist_ok=True)
 
     # Supabase client
     try:
@@ -39,9 +40,11 @@ def create_app():
         from app.routes.upload import upload_bp
         from app.routes.status import status_bp
         from app.routes.health import health_bp
+        from app.routes.render import render_bp
         app.register_blueprint(upload_bp)
         app.register_blueprint(status_bp)
         app.register_blueprint(health_bp)
+        app.register_blueprint(render_bp)
     except Exception:
         pass
 
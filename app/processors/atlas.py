@@ -0,0 +1,41 @@
+import os
+import json
+import numpy as np
+
+ATLAS_INDEX_FILENAME = 'atlas_index.json'
+# Per-slice entries in the index are lists in this field order to keep the JSON small
+ATLAS_SLICE_FIELDS = ['atlas', 'x', 'y', 'original_index']
+
+
+def atlas_groups(indices, grid):
+    """Split the kept slice indices of a view into consecutive groups of grid x grid."""
+    per_atlas = grid * grid
+    return [(n, indices[start:start + per_atlas]) for n, start in enumerate(range(0, len(indices), per_atlas))]
+
+
+def build_atlas(tiles, grid):
+    """Pack equally sized 2-D uint8 tiles row-major into one mosaic.
+
+    The mosaic is only as tall as the number of tiles requires, so the last
+    atlas of a view does not carry empty rows.
+    """
+    tile_h, tile_w = tiles[0].shape
+    rows = -(-len(tiles) // grid)
+    mosaic = np.zeros((rows * tile_h, grid * tile_w), dtype=np.uint8)
+    for n, tile in enumerate(tiles):
+        y, x = (n // grid) * tile_h, (n % grid) * tile_w
+        mosaic[y:y + tile_h, x:x + tile_w] = tile
+    return mosaic
+
+
+def tile_origin(position, grid, tile_size):
+    """Top-left pixel of the ``position``-th tile in an atlas; tile_size is (width, height)."""
+    tile_w, tile_h = tile_size
+    return (position % grid) * tile_w, (position // grid) * tile_h
+
+
+def write_atlas_index(workspace_dir, index):
+    path = os.path.join(workspace_dir, ATLAS_INDEX_FILENAME)
+    with open(path, 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    return path
@@ -1,16 +1,56 @@
 import numpy as np
-from PIL import Image
 import os
+import shutil
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from app.services.job_status import JobStatusManager
+from app.services.workspace import create_workspace, get_workspace_path
+from .normalization import (ROBUST_PERCENTILES, block_mean_downsample, compute_intensity_stats, content_bounds,
+                            informative_slice_masks, normalize_to_uint8)
+from .encoders import get_encoder
+from .resample import resample_isotropic
+from .panoramic import PANORAMIC_FILENAME, NegatedVolume, otsu_threshold, render_panoramic
+from .surface import MESH_FORMATS, MESH_WRITERS, extract_surface
+from .thumbnails import THUMBNAIL_DIR, THUMBNAIL_MODES, render_thumbnails
+from app.services.volume_store import write_chunked_volume
+from .windowing import apply_window_luts, build_window_luts
+from .atlas import ATLAS_SLICE_FIELDS, atlas_groups, build_atlas, tile_origin, write_atlas_index
 from flask import current_app
 
 logger = logging.getLogger(__name__)
 
 
 class MedicalImageProcessor:
-    def __init__(self, task_id=None):
+    PREVIEW_DIR = 'preview'
+
+    def __init__(self, task_id=None, encode_workers=None, encoder=None, output_mode=None, preview_callback=None,
+                 window_presets=None, panoramic=False):
         self.task_id = task_id
+        self.encode_workers = encode_workers
+        self.encoder = encoder
+        self.output_mode = output_mode
+        # name -> {'center', 'width'} in HU, rendered next to the min/max slices (see windowing.py)
+        self.window_presets = window_presets or {}
+        # Called with the preview result as soon as the low-resolution tier is on disk
+        self.preview_callback = preview_callback
+        # Render a curved panoramic reformat next to the slices (see panoramic.py)
+        self.panoramic_enabled = panoramic
+        self.first_slice_time = None
+        self.slice_index_map = {}
+        self.slice_format = None
+        self.atlas_counts = None
+        self.preview = None
+        self.volume_store = None
+        self.window_counts = None
+        self.window_atlas_counts = None
+        self.intensity_stats = None
+        self.resample = None
+        self.panoramic = None
+        self.mesh = None
+        self.thumbnails = None
+        self.crop = None
 
     def update_progress(self, progress, message, celery_task=None):
         if self.task_id:
@@ -18,47 +58,540 @@ class MedicalImageProcessor:
         if celery_task:
             celery_task.update_state(state='PROGRESS', meta={'progress': progress, 'message': message})
 
-    def normalize_data(self, data):
+    def resample_volume(self, data, voxel_info):
+        """Reslice to isotropic spacing when RESAMPLE_ISOTROPIC is set; returns (data, voxel_info).
+
+        Coronal and sagittal slices are otherwise stretched whenever the slice
+        spacing differs from the in-plane spacing. ``data`` axes follow the
+        x/y/z order of ``voxel_info``.
+        """
+        self.resample = None
+        config = current_app.config
+        if not config.get('RESAMPLE_ISOTROPIC', False) or len(data.shape) != 3:
+            return data, voxel_info
+        spacing = [voxel_info['x_spacing_mm'], voxel_info['y_spacing_mm'], voxel_info['z_spacing_mm']]
+        if min(spacing) <= 0:
+            logger.warning(f"Skipping isotropic resampling, invalid voxel spacing {spacing}")
+            return data, voxel_info
+        workers = max(1, int(config.get('RESAMPLE_WORKERS', os.cpu_count() or 1)))
+        data, spacing, self.resample = resample_isotropic(
+            np.asarray(data), spacing, config.get('RESAMPLE_TARGET_SPACING_MM') or None, workers
+        )
+        return data, {"x_spacing_mm": spacing[0], "y_spacing_mm": spacing[1], "z_spacing_mm": spacing[2]}
+
+    def autocrop_volume(self, data, voxel_info, slope=1.0, intercept=0.0):
+        """Crop empty (air/zero) borders before rendering when AUTOCROP_ENABLED is set.
+
+        The bounding box covers every plane with at least AUTOCROP_MIN_FRACTION
+        of its voxels above AUTOCROP_THRESHOLD (real-world units; by default
+        halfway between the background and the Otsu threshold), grown by
+        AUTOCROP_MARGIN_MM. Returns a view of ``data``; ``self.crop['offset']``
+        maps cropped indices back to the source volume (source = cropped + offset).
+        """
+        self.crop = None
+        config = current_app.config
+        if not config.get('AUTOCROP_ENABLED', True) or len(data.shape) != 3:
+            return data
+        start = time.perf_counter()
+        threshold = config.get('AUTOCROP_THRESHOLD')
+        # Bright means "above" in real-world units; a negative slope flips that for stored values
+        invert = slope < 0
+        if threshold is None:
+            step = max(1, int(round((np.prod(data.shape, dtype=np.float64) / 2_000_000) ** (1 / 3))))
+            sample = np.asarray(data[::step, ::step, ::step], dtype=np.float32)
+            background = np.percentile(sample, 99.5 if invert else 0.5)
+            # Halfway between the background level and the Otsu split: clear of noise, below faint tissue
+            stored_threshold = (background + otsu_threshold(sample)) / 2
+        else:
+            stored_threshold = (float(threshold) - intercept) / slope
+        shape = tuple(data.shape)
+        min_fraction = float(config.get('AUTOCROP_MIN_FRACTION', 0.001))
+        plane_sizes = [int(np.prod(shape, dtype=np.int64)) // n for n in shape]
+        bounds = content_bounds(data, stored_threshold, invert,
+                                max(1, int(min_fraction * min(plane_sizes))))
+        if bounds is None:
+            logger.warning("Autocrop found no content above the threshold, keeping the full volume")
+            return data
+        spacing = (voxel_info['x_spacing_mm'], voxel_info['y_spacing_mm'], voxel_info['z_spacing_mm'])
+        margin_mm = float(config.get('AUTOCROP_MARGIN_MM', 5.0))
+        box = []
+        for (lo, hi), n, step_mm in zip(bounds, shape, spacing):
+            margin = int(np.ceil(margin_mm / step_mm)) if step_mm > 0 else 0
+            box.append((max(0, lo - margin), min(n, hi + margin)))
+        cropped = data[box[0][0]:box[0][1], box[1][0]:box[1][1], box[2][0]:box[2][1]]
+        self.crop = {
+            'offset': [lo for lo, _ in box],
+            'shape': list(cropped.shape),
+            'source_shape': list(shape),
+            'threshold': round(float(stored_threshold) * slope + intercept, 3),
+            'voxel_fraction': round(float(np.prod(cropped.shape, dtype=np.float64) / np.prod(shape, dtype=np.float64)), 4),
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+        logger.info(f"Autocrop {shape} -> {tuple(cropped.shape)} at offset {tuple(self.crop['offset'])} "
+                    f"({self.crop['voxel_fraction']:.0%} of voxels) in {self.crop['seconds']:.2f}s")
+        return cropped
+
+    def save_panoramic(self, data, voxel_info, output_id, invert=False):
+        """Write the curved panoramic reformat of ``data`` into the workspace when enabled.
+
+        Runs after the slices are saved (saving recreates the workspace). A
+        volume without a recognisable arch is logged and skipped, not failed.
+        """
+        self.panoramic = None
+        if not self.panoramic_enabled or len(data.shape) != 3:
+            return None
+        config = current_app.config
+        spacing = (voxel_info['x_spacing_mm'], voxel_info['y_spacing_mm'], voxel_info['z_spacing_mm'])
+        workers = max(1, int(config.get('PANORAMIC_WORKERS', os.cpu_count() or 1)))
+        try:
+            image, info = render_panoramic(data, spacing, float(config.get('PANORAMIC_SLAB_MM', 15.0)),
+                                           invert, workers)
+        except ValueError as e:
+            logger.warning(f"Panoramic reconstruction skipped: {e}")
+            return None
+        workspace_dir = get_workspace_path(output_id)
+        os.makedirs(workspace_dir, exist_ok=True)
+        info['path'] = os.path.join(workspace_dir, PANORAMIC_FILENAME)
+        image.save(info['path'])
+        logger.info(f"Panoramic {info['width']}x{info['height']} ({info['arch_length_mm']} mm arch) "
+                    f"in {info['timings']['total_s']:.2f}s")
+        self.panoramic = info
+        return info
+
+    def save_thumbnails(self, data, output_id, invert=False):
+        """Write small volume-rendered previews (thumbnails.py) for the study list.
+
+        A failure only costs the thumbnails, never the job.
+        """
+        self.thumbnails = None
+        config = current_app.config
+        if not config.get('THUMBNAILS_ENABLED', True) or len(data.shape) != 3:
+            return None
+        try:
+            images, info = render_thumbnails(data, int(config.get('THUMBNAIL_SIZE', 256)),
+                                             config.get('THUMBNAIL_MODES') or THUMBNAIL_MODES, invert)
+        except Exception as e:
+            logger.warning(f"Thumbnail rendering failed: {e}")
+            return None
+        thumbnail_dir = os.path.join(get_workspace_path(output_id), THUMBNAIL_DIR)
+        os.makedirs(thumbnail_dir, exist_ok=True)
+        info['files'] = {}
+        for name, image in images.items():
+            path = os.path.join(thumbnail_dir, f"{name}.png")
+            image.save(path, optimize=True)
+            info['files'][name] = path
+        logger.info(f"Rendered {len(images)} thumbnails in {info['seconds']:.2f}s")
+        self.thumbnails = info
+        return info
+
+    def normalize_data(self, data, invert=False):
+        """Scale ``data`` to uint8 between its NORMALIZE_PERCENTILES (one statistics sweep)."""
         try:
-            data_min, data_max = data.min(), data.max()
-            if data_max == data_min:
-                logger.warning("Constant intensity data detected")
-                return np.zeros_like(data, dtype=np.uint8)
-            return ((data - data_min) / (data_max - data_min) * 255).astype(np.uint8)
+            data_min, data_max = self.intensity_range(data)
+            return normalize_to_uint8(data, data_min, data_max, invert=invert)
         except Exception as e:
             raise ValueError(f"Data normalization failed: {str(e)}")
 
-    def save_slices(self, volume_data, output_id, progress_callback=None):
+    def intensity_range(self, data):
+        """Compute the volume's intensity statistics once and return the configured percentile range."""
+        self.intensity_stats = compute_intensity_stats(data)
+        return self.intensity_stats.intensity_range(*self._get_percentiles())
+
+    def intensity_summary(self, slope=1.0, intercept=0.0):
+        """Range used for normalization in real-world units, for the result and later stages."""
+        if self.intensity_stats is None:
+            return None
+        return self.intensity_stats.summary(*self._get_percentiles(), slope=slope, intercept=intercept)
+
+    def _get_percentiles(self):
+        lower, upper = current_app.config.get('NORMALIZE_PERCENTILES') or ROBUST_PERCENTILES
+        return float(lower), float(upper)
+
+    def save_slices(self, volume_data, output_id, progress_callback=None, window_source=None):
+        """Render the kept slices of every view; ``window_source`` is (16-bit stored data, slope, intercept)
+        from ``windowing.as_lut_source`` and enables the window preset tiers."""
+        workspace_dir = create_workspace(output_id)
+        self.first_slice_time = None
+        self.slice_index_map = {}
+        self.preview = None
+        self.window_counts = None
+        self.window_atlas_counts = None
         slice_counts = {}
         views_info = [
             ('axial', 2, volume_data.shape[2]),
             ('coronal', 1, volume_data.shape[1]),
             ('sagittal', 0, volume_data.shape[0])
         ]
-        for view_idx, (view, axis, slice_count) in enumerate(views_info):
-            if progress_callback:
-                progress_callback(30 + (view_idx * 20), f'Creating {view} slices...')
-            saved_count = self._save_view_slices(volume_data, view, axis, slice_count, progress_callback)
-            slice_counts[view] = saved_count
-            logger.info(f"Created {saved_count} {view} slices")
+        # Empty/flat slices are detected for all axes in one sweep; only kept ones are rendered
+        masks = informative_slice_masks(volume_data)
+        encoder = self._get_encoder()
+        self.slice_format = encoder.describe()
+        atlas_mode = self._get_output_mode() == 'atlas'
+        atlas_grid = int(current_app.config.get('SLICE_ATLAS_GRID', 8))
+        atlas_index = {}
+        workers = self._get_encode_workers()
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='slice-encode') if workers > 1 else None
+        try:
+            preview_factor = int(current_app.config.get('SLICE_PREVIEW_FACTOR', 4))
+            if preview_factor > 1:
+                if progress_callback:
+                    progress_callback(25, 'Creating preview slices...')
+                self.preview = self._save_preview(volume_data, masks, views_info, preview_factor, workspace_dir,
+                                                  encoder, executor, atlas_grid if atlas_mode else None)
+                if self.preview_callback:
+                    try:
+                        self.preview_callback(self.preview)
+                    except Exception as e:
+                        logger.warning(f"Preview callback failed: {e}")
+            # Queue every view up front so the pool stays busy across view boundaries.
+            # Results are consumed in slice order, which keeps numbering deterministic.
+            encoded_views = []
+            for _, axis, _ in views_info:
+                indices = [int(i) for i in np.flatnonzero(masks[axis])]
+                if atlas_mode:
+                    encoded_views.append(self._encode_view_atlases(volume_data, axis, indices, encoder, atlas_grid, executor))
+                else:
+                    encoded_views.append(self._encode_view_slices(volume_data, axis, indices, encoder, executor))
+            for view_idx, ((view, _, _), encoded) in enumerate(zip(views_info, encoded_views)):
+                if progress_callback:
+                    progress_callback(30 + (view_idx * 20), f'Creating {view} slices...')
+                if atlas_mode:
+                    saved_indices, atlas_index[view] = self._save_view_atlases(
+                        encoded, view, workspace_dir, encoder.extension, atlas_grid)
+                else:
+                    saved_indices = self._save_view_slices(encoded, view, workspace_dir, encoder.extension)
+                # saved_indices[n] is the original volume index of the n-th saved slice of the view
+                self.slice_index_map[view] = saved_indices
+                saved_count = len(saved_indices)
+                slice_counts[view] = saved_count
+                logger.info(f"Created {saved_count} {view} slices")
+            if self.window_presets and window_source is not None:
+                if progress_callback:
+                    progress_callback(90, f'Rendering window presets ({", ".join(self.window_presets)})...')
+                self.window_counts = self._save_window_presets(window_source, views_info, workspace_dir, encoder,
+                                                               executor, atlas_grid if atlas_mode else None)
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+        if atlas_mode:
+            write_atlas_index(workspace_dir, atlas_index)
+            self.atlas_counts = {view: len(index['atlases']) for view, index in atlas_index.items()}
         return slice_counts
 
-    def _save_view_slices(self, data, view, axis, slice_count, progress_callback=None):
-        saved_count = 0
-        view_dir = os.path.join(current_app.config['BASE_PATH'], view)
+    def save_volume_store(self, raw_data, output_id, slope=1.0, intercept=0.0):
+        """Store the volume once as compressed chunks for on-demand rendering instead of slicing it.
+
+        Returns slice counts per view (every index can be rendered by /render).
+        The NORMALIZE_PERCENTILES range is stored with the volume so unwindowed
+        renders are scaled like pre-rendered slices.
+        """
+        config = current_app.config
+        # Nothing is sliced, but slices from an earlier attempt in another mode must not be uploaded
+        create_workspace(output_id)
+        meta = write_chunked_volume(
+            raw_data, output_id, slope, intercept,
+            chunk=int(config.get('VOLUME_CHUNK_SIZE', 64)),
+            level=int(config.get('VOLUME_COMPRESSION_LEVEL', 3)),
+            intensity_range=self.intensity_range(raw_data)
+        )
+        self.slice_index_map = {}
+        self.volume_store = {key: meta[key] for key in ('codec', 'chunk', 'dtype', 'raw_mb', 'stored_mb', 'write_time_s', 'version')}
+        shape = meta['shape']
+        return {'axial': shape[2], 'coronal': shape[1], 'sagittal': shape[0]}
+
+    def save_mesh(self, raw_data, voxel_info, output_id, slope=1.0, intercept=0.0):
+        """Write an isosurface mesh (glTF binary or PLY) instead of slices ('mesh' output mode).
+
+        MESH_ISO_LEVEL is in real-world units (HU for CT); without it the level
+        is an Otsu threshold of the volume. Returns empty slice counts.
+        """
+        config = current_app.config
+        mesh_format = (config.get('MESH_FORMAT') or 'glb').lower()
+        if mesh_format not in MESH_WRITERS:
+            raise ValueError(f"Unknown mesh format '{mesh_format}', expected one of {sorted(MESH_WRITERS)}")
+        volume = raw_data
+        level = config.get('MESH_ISO_LEVEL')
+        if level is not None:
+            level = (float(level) - intercept) / slope
+        if slope < 0:
+            # Keep "inside" as the bright side of the stored data
+            volume = NegatedVolume(raw_data)
+            level = -level if level is not None else None
+        spacing = (voxel_info['x_spacing_mm'], voxel_info['y_spacing_mm'], voxel_info['z_spacing_mm'])
+        vertices, faces, stats = extract_surface(
+            volume, level, spacing,
+            chunk_slices=int(config.get('MESH_CHUNK_SLICES', 32)),
+            workers=int(config.get('MESH_WORKERS', os.cpu_count() or 1)),
+            decimate=float(config.get('MESH_DECIMATE_VOXELS', 2))
+        )
+        if not len(faces):
+            raise ValueError(f"No surface found at iso level {stats['iso_level']}")
+        workspace_dir = create_workspace(output_id)
+        path = os.path.join(workspace_dir, f"mesh.{mesh_format}")
+        MESH_WRITERS[mesh_format](path, vertices, faces)
+        stats.update({'path': path, 'format': mesh_format, 'content_type': MESH_FORMATS[mesh_format],
+                      'size_mb': round(os.path.getsize(path) / (1024 * 1024), 2)})
+        logger.info(f"Mesh {stats['faces']} faces ({stats['faces_before_decimation']} before decimation), "
+                    f"{stats['size_mb']} MB {mesh_format} in {sum(stats['timings'].values()):.2f}s")
+        self.slice_index_map = {}
+        self.mesh = stats
+        return {}
+
+    def _save_preview(self, volume_data, masks, views_info, factor, workspace_dir, encoder, executor=None,
+                      atlas_grid=None):
+        """Write a low-resolution tier (block mean over ``factor``^3 voxels) under preview/.
+
+        Preview slice n of a view covers full-resolution slices
+        ``factor * index .. factor * index + factor - 1``, where index is
+        ``slice_index_map[view][n]``; it is kept if any of them is informative.
+        With ``atlas_grid`` the tier is packed into atlases with its own
+        preview/atlas_index.json, like the main tier in atlas mode.
+        """
+        start_time = time.perf_counter()
+        preview_volume = block_mean_downsample(volume_data, factor)
+        preview_dir = os.path.join(workspace_dir, self.PREVIEW_DIR)
+        preview = {
+            'factor': factor,
+            'slice_counts': {},
+            'slice_index_map': {},
+            'data_shape': list(preview_volume.shape),
+            'slice_format': encoder.describe()
+        }
+        encoded_views = []
+        for _, axis, _ in views_info:
+            keep = np.logical_or.reduceat(masks[axis], np.arange(0, masks[axis].size, factor))
+            indices = [int(i) for i in np.flatnonzero(keep)]
+            if atlas_grid:
+                encoded_views.append(self._encode_view_atlases(preview_volume, axis, indices, encoder, atlas_grid,
+                                                               executor))
+            else:
+                encoded_views.append(self._encode_view_slices(preview_volume, axis, indices, encoder, executor))
+        atlas_index = {}
+        for (view, _, _), encoded in zip(views_info, encoded_views):
+            if atlas_grid:
+                saved_indices, atlas_index[view] = self._save_view_atlases(
+                    encoded, view, preview_dir, encoder.extension, atlas_grid)
+            else:
+                saved_indices = self._save_view_slices(encoded, view, preview_dir, encoder.extension)
+            preview['slice_index_map'][view] = saved_indices
+            preview['slice_counts'][view] = len(saved_indices)
+        if atlas_grid:
+            write_atlas_index(preview_dir, atlas_index)
+            preview['atlas_counts'] = {view: len(index['atlases']) for view, index in atlas_index.items()}
+        preview['build_time_s'] = round(time.perf_counter() - start_time, 3)
+        logger.info(f"Created preview tier {preview['slice_counts']} in {preview['build_time_s']}s")
+        return preview
+
+    def _save_window_presets(self, window_source, views_info, workspace_dir, encoder, executor=None,
+                             atlas_grid=None):
+        """Write every window preset under windows/{preset}/{view}/ with the main tier's numbering.
+
+        Slices are windowed in batches of WINDOW_BATCH_SLICES; each batch goes
+        through all preset LUTs in a single lookup. With ``atlas_grid`` each
+        preset is packed into atlases instead (see _save_window_atlases).
+        Returns {preset: {view: count}}, or {} when a batch failed: preset files
+        are numbered like the main tier, so a gap could not be renumbered away.
+        """
+        data, slope, intercept = window_source
+        names = list(self.window_presets)
+        luts = build_window_luts(self.window_presets, slope, intercept, data.dtype)
+        if atlas_grid:
+            return self._save_window_atlases(data, luts, names, views_info, workspace_dir, encoder, atlas_grid,
+                                             executor)
+        batch_size = max(1, int(current_app.config.get('WINDOW_BATCH_SLICES', 16)))
+        window_counts = {name: {} for name in names}
+        for view, axis, _ in views_info:
+            indices = self.slice_index_map.get(view, [])
+            batches = [indices[start:start + batch_size] for start in range(0, len(indices), batch_size)]
+            encode = partial(self._encode_window_batch, data, axis, luts, encoder)
+            results = executor.map(encode, batches) if executor else map(encode, batches)
+            view_dirs = [os.path.join(workspace_dir, 'windows', name, view) for name in names]
+            for view_dir in view_dirs:
+                os.makedirs(view_dir, exist_ok=True)
+            position = 0
+            failed = False
+            for batch, (encoded, error) in zip(batches, results):
+                if error is not None:
+                    logger.warning(f"Failed to window {view} slices {batch[0]}-{batch[-1]}: {error}")
+                    failed = True
+                elif not failed:
+                    for view_dir, preset_slices in zip(view_dirs, encoded):
+                        for offset, data_bytes in enumerate(preset_slices):
+                            with open(os.path.join(view_dir, f"{position + offset}{encoder.extension}"), 'wb') as f:
+                                f.write(data_bytes)
+                position += len(batch)
+            if failed:
+                logger.warning(f"Dropping window presets {names}: not every {view} slice could be windowed")
+                shutil.rmtree(os.path.join(workspace_dir, 'windows'), ignore_errors=True)
+                return {}
+            for name in names:
+                window_counts[name][view] = position
+        logger.info(f"Created window presets {names}")
+        return window_counts
+
+    def _save_window_atlases(self, data, luts, names, views_info, workspace_dir, encoder, grid, executor=None):
+        """Atlas-mode preset tiers: one atlas per group of grid x grid slices, windowed with all presets at once.
+
+        Each preset gets windows/{preset}/{view}/atlas_<n> and its own
+        windows/{preset}/atlas_index.json; atlas counts go to window_atlas_counts.
+        """
+        window_counts = {name: {} for name in names}
+        atlas_indexes = {name: {} for name in names}
+        for view, axis, _ in views_info:
+            groups = atlas_groups(self.slice_index_map.get(view, []), grid)
+            encode = partial(self._encode_window_atlas, data, axis, luts, encoder, grid)
+            results = executor.map(encode, groups) if executor else map(encode, groups)
+            view_dirs = [os.path.join(workspace_dir, 'windows', name, view) for name in names]
+            for view_dir in view_dirs:
+                os.makedirs(view_dir, exist_ok=True)
+            view_indexes = [{'grid': grid, 'tile_size': None, 'atlases': [], 'slice_fields': ATLAS_SLICE_FIELDS,
+                             'slices': []} for _ in names]
+            for indices, encoded, tile_size, error in results:
+                if error is not None:
+                    logger.warning(f"Failed to window {view} atlas for slices {indices[0]}-{indices[-1]}: {error}")
+                    continue
+                for view_dir, view_index, atlas_bytes in zip(view_dirs, view_indexes, encoded):
+                    atlas_number = len(view_index['atlases'])
+                    atlas_name = f"atlas_{atlas_number}{encoder.extension}"
+                    with open(os.path.join(view_dir, atlas_name), 'wb') as f:
+                        f.write(atlas_bytes)
+                    view_index['atlases'].append(f"{view}/{atlas_name}")
+                    view_index['tile_size'] = list(tile_size)
+                    for position, original_index in enumerate(indices):
+                        x, y = tile_origin(position, grid, tile_size)
+                        view_index['slices'].append([atlas_number, x, y, original_index])
+            for name, view_index in zip(names, view_indexes):
+                atlas_indexes[name][view] = view_index
+                window_counts[name][view] = len(view_index['slices'])
+        self.window_atlas_counts = {}
+        for name in names:
+            write_atlas_index(os.path.join(workspace_dir, 'windows', name), atlas_indexes[name])
+            self.window_atlas_counts[name] = {view: len(index['atlases']) for view, index in atlas_indexes[name].items()}
+        logger.info(f"Created window preset atlases {names}")
+        return window_counts
+
+    def _encode_window_atlas(self, data, axis, luts, encoder, grid, group):
+        """Window one atlas group with all preset LUTs; returns (indices, [preset] bytes, tile_size, error)."""
+        _, indices = group
+        try:
+            stored = np.stack([self._extract_slice(data, axis, index) for index in indices])
+            windowed = apply_window_luts(luts, stored)
+            if axis == 2:
+                windowed = windowed.transpose(0, 1, 3, 2)
+            tile_size = (windowed.shape[3], windowed.shape[2])
+            return indices, [encoder.encode(build_atlas(list(images), grid)) for images in windowed], tile_size, None
+        except Exception as e:
+            return indices, None, None, e
+
+    def _encode_window_batch(self, data, axis, luts, encoder, batch):
+        """Window a batch of slices with all preset LUTs; returns ([preset][slice] bytes, error)."""
+        try:
+            stored = np.stack([self._extract_slice(data, axis, index) for index in batch])
+            windowed = apply_window_luts(luts, stored)
+            if axis == 2:
+                windowed = windowed.transpose(0, 1, 3, 2)
+            return [[encoder.encode(image) for image in preset_images] for preset_images in windowed], None
+        except Exception as e:
+            return None, e
+
+    def _get_output_mode(self):
+        if self.output_mode is None:
+            self.output_mode = current_app.config.get('SLICE_OUTPUT_MODE', 'slices')
+        return self.output_mode
+
+    def _get_encode_workers(self):
+        workers = self.encode_workers or current_app.config.get('SLICE_ENCODE_WORKERS', 1)
+        return max(1, int(workers))
+
+    def _get_encoder(self):
+        if self.encoder is None:
+            self.encoder = get_encoder(current_app.config.get('SLICE_ENCODER_PROFILE'))
+        return self.encoder
+
+    def _encode_view_slices(self, data, axis, indices, encoder, executor=None):
+        encode = partial(self._encode_slice, data, axis, encoder)
+        if executor is None:
+            return map(encode, indices)
+        return executor.map(encode, indices)
+
+    def _encode_slice(self, data, axis, encoder, index):
+        """Encode one slice; returns (index, bytes or None, error)."""
+        try:
+            slice_data = self._extract_slice(data, axis, index)
+            return index, encoder.encode(slice_data.T if axis == 2 else slice_data), None
+        except Exception as e:
+            return index, None, e
+
+    def _save_view_slices(self, encoded_slices, view, workspace_dir, extension='.jpg'):
+        saved_indices = []
+        view_dir = os.path.join(workspace_dir, view)
         os.makedirs(view_dir, exist_ok=True)
-        for i in range(slice_count):
+        for i, encoded, error in encoded_slices:
+            if error is not None:
+                logger.warning(f"Failed to save {view} slice {i}: {error}")
+                continue
             try:
-                slice_data = self._extract_slice(data, axis, i)
-                if np.any(slice_data) and np.std(slice_data) > 1:
-                    img_pil = Image.fromarray(slice_data.T if axis == 2 else slice_data, mode='L')
-                    slice_path = os.path.join(view_dir, f"{saved_count}.jpg")
-                    img_pil.save(slice_path, quality=85, optimize=True)
-                    saved_count += 1
+                slice_path = os.path.join(view_dir, f"{len(saved_indices)}{extension}")
+                with open(slice_path, 'wb') as f:
+                    f.write(encoded)
+                saved_indices.append(i)
+                if self.first_slice_time is None:
+                    self.first_slice_time = time.perf_counter()
             except Exception as e:
                 logger.warning(f"Failed to save {view} slice {i}: {e}")
                 continue
-        return saved_count
+        return saved_indices
+
+    def _encode_view_atlases(self, data, axis, indices, encoder, grid, executor=None):
+        encode = partial(self._encode_atlas, data, axis, encoder, grid)
+        groups = atlas_groups(indices, grid)
+        if executor is None:
+            return map(encode, groups)
+        return executor.map(encode, groups)
+
+    def _encode_atlas(self, data, axis, encoder, grid, group):
+        """Pack one group of slices into a mosaic and encode it.
+
+        Returns (indices, bytes or None, (tile_width, tile_height), error).
+        """
+        _, indices = group
+        try:
+            tiles = []
+            for index in indices:
+                slice_data = self._extract_slice(data, axis, index)
+                tiles.append(slice_data.T if axis == 2 else slice_data)
+            tile_size = (tiles[0].shape[1], tiles[0].shape[0])
+            return indices, encoder.encode(build_atlas(tiles, grid)), tile_size, None
+        except Exception as e:
+            return indices, None, None, e
+
+    def _save_view_atlases(self, encoded_atlases, view, workspace_dir, extension, grid):
+        """Write a view's atlases and return (saved original indices, view index for atlas_index.json)."""
+        view_index = {'grid': grid, 'tile_size': None, 'atlases': [], 'slice_fields': ATLAS_SLICE_FIELDS, 'slices': []}
+        saved_indices = []
+        view_dir = os.path.join(workspace_dir, view)
+        os.makedirs(view_dir, exist_ok=True)
+        for indices, encoded, tile_size, error in encoded_atlases:
+            if error is not None:
+                logger.warning(f"Failed to save {view} atlas for slices {indices[0]}-{indices[-1]}: {error}")
+                continue
+            atlas_number = len(view_index['atlases'])
+            atlas_name = f"atlas_{atlas_number}{extension}"
+            try:
+                with open(os.path.join(view_dir, atlas_name), 'wb') as f:
+                    f.write(encoded)
+            except Exception as e:
+                logger.warning(f"Failed to save {view} atlas {atlas_number}: {e}")
+                continue
+            if self.first_slice_time is None:
+                self.first_slice_time = time.perf_counter()
+            view_index['atlases'].append(f"{view}/{atlas_name}")
+            view_index['tile_size'] = list(tile_size)
+            for position, original_index in enumerate(indices):
+                x, y = tile_origin(position, grid, tile_size)
+                view_index['slices'].append([atlas_number, x, y, original_index])
+                saved_indices.append(original_index)
+        return saved_indices, view_index
 
     def _extract_slice(self, data, axis, index):
         if axis == 0:
@@ -0,0 +1,110 @@
+import logging
+import importlib
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# pydicom pixel data handlers, fastest first. 'numpy' only covers native
+# (uncompressed) data; pylibjpeg needs its libjpeg/openjpeg/rle plugins.
+DEFAULT_DECODER_PREFERENCE = ('numpy', 'pylibjpeg', 'gdcm', 'jpeg_ls', 'pillow', 'rle')
+
+HANDLER_MODULES = {
+    'numpy': 'numpy_handler',
+    'pylibjpeg': 'pylibjpeg_handler',
+    'gdcm': 'gdcm_handler',
+    'jpeg_ls': 'jpeg_ls_handler',
+    'pillow': 'pillow_handler',
+    'rle': 'rle_handler',
+}
+
+TRANSFER_SYNTAX_NAMES = {
+    '1.2.840.10008.1.2': 'Implicit VR Little Endian',
+    '1.2.840.10008.1.2.1': 'Explicit VR Little Endian',
+    '1.2.840.10008.1.2.2': 'Explicit VR Big Endian',
+    '1.2.840.10008.1.2.4.50': 'JPEG Baseline',
+    '1.2.840.10008.1.2.4.51': 'JPEG Extended',
+    '1.2.840.10008.1.2.4.57': 'JPEG Lossless',
+    '1.2.840.10008.1.2.4.70': 'JPEG Lossless SV1',
+    '1.2.840.10008.1.2.4.80': 'JPEG-LS Lossless',
+    '1.2.840.10008.1.2.4.81': 'JPEG-LS Near-Lossless',
+    '1.2.840.10008.1.2.4.90': 'JPEG 2000 Lossless',
+    '1.2.840.10008.1.2.4.91': 'JPEG 2000',
+    '1.2.840.10008.1.2.5': 'RLE Lossless',
+}
+
+
+@lru_cache(maxsize=None)
+def _handler(name):
+    module_name = HANDLER_MODULES.get(name)
+    if module_name is None:
+        return None
+    try:
+        handler = importlib.import_module(f'pydicom.pixel_data_handlers.{module_name}')
+        return handler if handler.is_available() else None
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=None)
+def _supports(name, transfer_syntax):
+    handler = _handler(name)
+    try:
+        return handler is not None and bool(handler.supports_transfer_syntax(transfer_syntax))
+    except Exception:
+        return False
+
+
+def available_decoders():
+    """Names of the pydicom handlers whose dependencies are installed."""
+    return [name for name in HANDLER_MODULES if _handler(name) is not None]
+
+
+class DecoderRegistry:
+    """Pick the pixel data handler per transfer syntax, in DICOM_DECODER_PREFERENCE order.
+
+    ``decode`` falls through to the next candidate when one raises (and finally
+    to pydicom's default dispatch), so a plugin that is installed but cannot
+    handle a particular file does not lose the slice; only when everything
+    fails is the error raised, with all of the messages.
+    """
+
+    def __init__(self, preference=None):
+        self.preference = tuple(preference or DEFAULT_DECODER_PREFERENCE)
+        unknown = [name for name in self.preference if name not in HANDLER_MODULES]
+        if unknown:
+            logger.warning(f"Ignoring unknown DICOM decoders: {unknown}")
+        self.preference = tuple(name for name in self.preference if name in HANDLER_MODULES)
+
+    def candidates(self, transfer_syntax):
+        return [name for name in self.preference if _supports(name, str(transfer_syntax))]
+
+    def decode(self, ds):
+        """Return (pixel_array, decoder_name) for a dataset read with its pixel data."""
+        file_meta = getattr(ds, 'file_meta', None)
+        transfer_syntax = getattr(file_meta, 'TransferSyntaxUID', None) if file_meta is not None else None
+        if transfer_syntax is None:
+            # Bare dataset without file meta: let pydicom infer the encoding
+            return ds.pixel_array, 'pydicom'
+        transfer_syntax = str(transfer_syntax)
+        candidates = self.candidates(transfer_syntax)
+        if not candidates:
+            syntax_name = TRANSFER_SYNTAX_NAMES.get(transfer_syntax, transfer_syntax)
+            raise ValueError(f"No decoder installed for {syntax_name} "
+                             f"(available: {', '.join(available_decoders()) or 'none'})")
+        errors = []
+        for name in candidates:
+            try:
+                ds.convert_pixel_data(handler_name=name)
+                return ds.pixel_array, name
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+        try:
+            # Last resort: pydicom's own handler order
+            return ds.pixel_array, 'pydicom'
+        except Exception as e:
+            errors.append(f"pydicom: {e}")
+        raise ValueError(f"All decoders failed ({'; '.join(errors)})")
+
+
+def get_decoder_registry(config):
+    return DecoderRegistry(config.get('DICOM_DECODER_PREFERENCE'))
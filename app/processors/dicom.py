@@ -1,12 +1,156 @@
 import os
+import time
 import logging
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import numpy as np
 import pydicom
 from .base import MedicalImageProcessor
+from .decoders import TRANSFER_SYNTAX_NAMES, get_decoder_registry
+from .normalization import iter_blocks
+from .windowing import as_lut_source
 from app.services.job_status import JobStatusManager
+from app.services.upload_store import read_upload_manifest
+from app.services.dicom_index import get_dicom_index
+from app.utils.memory import track_peak_memory
+from app.utils.validators import read_dicom_header_and_pixel_location
+from flask import current_app
 
 logger = logging.getLogger(__name__)
 
+# Uncompressed transfer syntaxes (implicit/explicit VR little endian, explicit VR big endian):
+# pixel data is stored raw in this byte order
+NATIVE_SYNTAX_BYTE_ORDER = {'1.2.840.10008.1.2': '<', '1.2.840.10008.1.2.1': '<', '1.2.840.10008.1.2.2': '>'}
+
+
+def _optional_number(value, cast=float):
+    try:
+        return cast(value) if value is not None and value != '' else None
+    except (TypeError, ValueError):
+        return None
+
+
+def read_dicom_header(file_path):
+    """Parse one file's header without its pixel data; returns a picklable summary or None.
+
+    Runs in a worker process during the header scan, so it only returns plain types.
+    For uncompressed data the summary also records where the pixel
+    bytes start, so the decode phase can read them without parsing the file again.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            ds, pixel_offset, pixel_length = read_dicom_header_and_pixel_location(f, force=True)
+        rows, columns = int(ds.Rows), int(ds.Columns)
+    except Exception:
+        return None
+    if pixel_offset is None:
+        return None
+    position = getattr(ds, 'ImagePositionPatient', None)
+    orientation = getattr(ds, 'ImageOrientationPatient', None)
+    pixel_spacing = getattr(ds, 'PixelSpacing', None)
+    return {
+        'path': file_path,
+        'series_uid': str(getattr(ds, 'SeriesInstanceUID', '') or ''),
+        'rows': rows,
+        'columns': columns,
+        'frames': _optional_number(getattr(ds, 'NumberOfFrames', None), int) or 1,
+        'position': [float(v) for v in position] if position is not None and len(position) == 3 else None,
+        'orientation': [float(v) for v in orientation] if orientation is not None and len(orientation) == 6 else None,
+        'instance_number': _optional_number(getattr(ds, 'InstanceNumber', None), int),
+        'slice_location': _optional_number(getattr(ds, 'SliceLocation', None)),
+        'pixel_spacing': [float(v) for v in pixel_spacing] if pixel_spacing is not None and len(pixel_spacing) == 2 else None,
+        'slice_thickness': _optional_number(getattr(ds, 'SliceThickness', None)),
+        'slope': _optional_number(getattr(ds, 'RescaleSlope', None)) or 1.0,
+        'intercept': _optional_number(getattr(ds, 'RescaleIntercept', None)) or 0.0,
+        'bits_stored': _optional_number(getattr(ds, 'BitsStored', None), int),
+        'signed': _optional_number(getattr(ds, 'PixelRepresentation', 0), int) == 1,
+        'transfer_syntax': _transfer_syntax(ds),
+        'native_dtype': _native_pixel_dtype(ds, rows * columns, pixel_length),
+        'pixel_offset': pixel_offset,
+    }
+
+
+def _transfer_syntax(ds):
+    file_meta = getattr(ds, 'file_meta', None)
+    return str(getattr(file_meta, 'TransferSyntaxUID', '') or '') if file_meta is not None else ''
+
+
+def _native_pixel_dtype(ds, pixel_count, pixel_length):
+    """numpy dtype string when the pixel bytes can be read raw (same values as ds.pixel_array), else None."""
+    byte_order = NATIVE_SYNTAX_BYTE_ORDER.get(_transfer_syntax(ds))
+    if byte_order is None:
+        return None
+    bits_allocated = _optional_number(getattr(ds, 'BitsAllocated', None), int)
+    bits_stored = _optional_number(getattr(ds, 'BitsStored', None), int)
+    signed = _optional_number(getattr(ds, 'PixelRepresentation', 0), int) == 1
+    if bits_allocated not in (8, 16) or bits_stored is None:
+        return None
+    # Signed values narrower than the container are sign-extended in _decode_slice
+    if bits_stored > bits_allocated or (bits_stored != bits_allocated and not signed):
+        return None
+    if (_optional_number(getattr(ds, 'SamplesPerPixel', 1), int) or 1) != 1:
+        return None
+    if pixel_length is None or pixel_length < pixel_count * bits_allocated // 8:
+        return None
+    return f"{byte_order}{'i' if signed else 'u'}{bits_allocated // 8}"
+
+
+def _slice_normal(orientation):
+    if orientation is None:
+        return None
+    normal = np.cross(orientation[:3], orientation[3:])
+    return normal if np.any(normal) else None
+
+
+def _slice_sort_key(header, normal):
+    """Order along the slice normal (IPP), then SliceLocation, then InstanceNumber."""
+    if header['position'] is not None:
+        z = float(np.dot(normal, header['position'])) if normal is not None else header['position'][2]
+    elif header['slice_location'] is not None:
+        z = header['slice_location']
+    else:
+        z = float(header['instance_number'] or 0)
+    return z, header['instance_number'] or 0, header['path']
+
+
+def _volume_dtype(series):
+    """int16 when every stored value fits and the rescale is integral (HU), float32 otherwise."""
+    integral = all(float(h['slope']).is_integer() and float(h['intercept']).is_integer() for h in series)
+    stored_fits = all(h['bits_stored'] is not None and h['bits_stored'] <= (16 if h['signed'] else 15)
+                      for h in series)
+    return np.dtype(np.int16) if integral and stored_fits else np.dtype(np.float32)
+
+
+def _rescaled_range(stored_ranges, slopes, intercepts):
+    low = np.minimum(stored_ranges[:, 0] * slopes, stored_ranges[:, 1] * slopes) + intercepts
+    high = np.maximum(stored_ranges[:, 0] * slopes, stored_ranges[:, 1] * slopes) + intercepts
+    return float(low.min()), float(high.max())
+
+
+def rescale_volume(volume, slopes, intercepts, out=None):
+    """Apply per-slice ``stored * slope + intercept`` (slices on the last axis) block by block.
+
+    Works in place unless ``out`` is given; each block is widened to int32/float32
+    only while it is rescaled, so no full-size temporaries are created.
+    """
+    out = volume if out is None else out
+    uniform = np.all(slopes == slopes[0]) and np.all(intercepts == intercepts[0])
+    if np.issubdtype(out.dtype, np.integer):
+        work = np.int32
+        slopes, intercepts = slopes.astype(np.int32), intercepts.astype(np.int32)
+    else:
+        work = np.float32
+        slopes, intercepts = slopes.astype(np.float32), intercepts.astype(np.float32)
+    if uniform:
+        slopes, intercepts = slopes[0], intercepts[0]
+    for index in iter_blocks(volume.shape, 4):
+        block = volume[index].astype(work)
+        block *= slopes
+        block += intercepts
+        np.copyto(out[index], block, casting='unsafe')
+    return out
+
 
 class DICOMProcessor(MedicalImageProcessor):
     SUPPORTED_EXTENSIONS = {'.dcm', '.dicom', '.ima', ''}
@@ -19,28 +163,73 @@ class DICOMProcessor(MedicalImageProcessor):
             dicom_files = self._find_dicom_files(dicom_dir)
             if not dicom_files:
                 raise Exception("No valid DICOM files found in directory")
-            self.update_progress(15, f'Loading {len(dicom_files)} DICOM files...', celery_task)
-            valid_slices = self._load_dicom_slices(dicom_files, celery_task)
-            if not valid_slices:
+            self.update_progress(15, f'Reading {len(dicom_files)} DICOM headers...', celery_task)
+            scan_start = time.perf_counter()
+            headers = self._scan_headers(dicom_files)
+            series = self._select_series(headers)
+            if not series:
                 raise Exception("No valid DICOM files found")
-            self.update_progress(35, 'Creating volume...', celery_task)
-            volume = self._create_volume(valid_slices, celery_task)
-            volume_normalized = self.normalize_data(volume)
-            slice_counts = self.save_slices(
-                volume_normalized,
-                output_id,
-                lambda p, m: self.update_progress(p, m, celery_task)
-            )
-            voxel_info = self._extract_dicom_metadata(valid_slices[0][0])
+            scan_time = time.perf_counter() - scan_start
+            self.update_progress(35, f'Decoding {len(series)} DICOM slices...', celery_task)
+            with track_peak_memory(current_app.config.get('MEMORY_TRACE_ENABLED', False)) as memory_stats:
+                decode_start = time.perf_counter()
+                volume, series = self._create_volume(series, celery_task)
+                decode_time = time.perf_counter() - decode_start
+                logger.info(f"DICOM load: {len(series)}/{len(dicom_files)} files as {volume.dtype}, "
+                            f"header scan {scan_time:.2f}s, decode {decode_time:.2f}s")
+                volume, voxel_info = self.resample_volume(volume, self._extract_dicom_metadata(series))
+                volume = self.autocrop_volume(volume, voxel_info)
+                if self._get_output_mode() == 'on_demand':
+                    slice_counts = self.save_volume_store(volume, output_id)
+                elif self._get_output_mode() == 'mesh':
+                    slice_counts = self.save_mesh(volume, voxel_info, output_id)
+                else:
+                    volume_normalized = self.normalize_data(volume)
+                    # _create_volume has applied the rescale, so the volume is already in HU
+                    window_source = as_lut_source(volume) if self.window_presets else None
+                    slice_counts = self.save_slices(
+                        volume_normalized,
+                        output_id,
+                        lambda p, m: self.update_progress(p, m, celery_task),
+                        window_source
+                    )
+                self.save_panoramic(volume, voxel_info, output_id)
+                self.save_thumbnails(volume, output_id)
+            logger.info(f"DICOM peak memory: +{memory_stats['peak_memory_mb']} MB, "
+                        f"process peak RSS {memory_stats['peak_rss_mb']} MB")
             return {
                 "status": "success",
                 "message": "DICOM files processed successfully",
                 "slice_counts": slice_counts,
                 "voxel_sizes": voxel_info,
                 "data_shape": list(volume.shape),
+                "volume_dtype": str(volume.dtype),
                 "output_id": output_id,
-                "dicom_files_processed": len(valid_slices),
-                "total_slices": sum(slice_counts.values())
+                "dicom_files_processed": len(series),
+                "dicom_files_skipped": len(dicom_files) - len(series) - len(self.decode_failures),
+                "dicom_files_failed": len(self.decode_failures),
+                "decode_failures": self.decode_failures[:20],
+                "decoders": dict(self.decoder_counts),
+                "load_timings": {"header_scan_s": round(scan_time, 3), "decode_s": round(decode_time, 3),
+                                 "resample_s": self.resample['seconds'] if self.resample else None},
+                "resample": self.resample,
+                "panoramic": self.panoramic,
+                "crop": self.crop,
+                "mesh": self.mesh,
+                "thumbnails": self.thumbnails,
+                "header_index": self.header_index_stats,
+                "total_slices": sum(slice_counts.values()),
+                "slice_index_map": self.slice_index_map,
+                "slice_format": self.slice_format,
+                "output_mode": self.output_mode,
+                "atlas_counts": self.atlas_counts,
+                "preview": self.preview,
+                "volume_store": self.volume_store,
+                "window_counts": self.window_counts,
+                "window_atlas_counts": self.window_atlas_counts,
+                "intensity_range": self.intensity_summary(),
+                "peak_memory_mb": memory_stats['peak_memory_mb'],
+                "peak_rss_mb": memory_stats['peak_rss_mb']
             }
         except Exception as e:
             error_msg = f"DICOM processing error: {str(e)}"
@@ -50,6 +239,9 @@ class DICOMProcessor(MedicalImageProcessor):
             raise
 
     def _find_dicom_files(self, dicom_dir):
+        manifest = read_upload_manifest(dicom_dir)
+        if manifest is not None:
+            return self._manifest_dicom_files(dicom_dir, manifest)
         dicom_files = []
         for root, _, files in os.walk(dicom_dir):
             for file in files:
@@ -58,6 +250,17 @@ class DICOMProcessor(MedicalImageProcessor):
                     dicom_files.append(file_path)
         return dicom_files
 
+    def _manifest_dicom_files(self, dicom_dir, manifest):
+        """DICOM candidates from the ingest manifest; same rules as _is_dicom_file, no file opened."""
+        dicom_files = []
+        for entry in manifest['files']:
+            file_ext = os.path.splitext(entry['name'])[1].lower()
+            if file_ext not in self.SUPPORTED_EXTENSIONS:
+                continue
+            if entry['dicm_preamble'] or file_ext in {'.dcm', '.dicom', '.ima'}:
+                dicom_files.append(os.path.join(dicom_dir, entry['name']))
+        return dicom_files
+
     def _is_dicom_file(self, file_path):
         file_ext = os.path.splitext(file_path)[1].lower()
         if file_ext not in self.SUPPORTED_EXTENSIONS:
@@ -69,72 +272,159 @@ class DICOMProcessor(MedicalImageProcessor):
         except Exception:
             return False
 
-    def _load_dicom_slices(self, dicom_files, celery_task=None):
-        valid_slices = []
-        for i, file_path in enumerate(dicom_files):
-            try:
-                ds = pydicom.dcmread(file_path, force=True)
-                if hasattr(ds, 'pixel_array') and ds.pixel_array.size > 0:
-                    valid_slices.append((ds, file_path, ds.pixel_array))
-            except Exception:
-                continue
-            if celery_task and i % 10 == 0:
-                progress = 15 + int((i / len(dicom_files)) * 15)
-                self.update_progress(progress, f'Processing file {i+1}/{len(dicom_files)}...', celery_task)
-        return self._sort_slices(valid_slices)
-
-    def _sort_slices(self, slices):
-        def sort_key(slice_data):
-            ds, _, _ = slice_data
-            if hasattr(ds, 'SliceLocation') and ds.SliceLocation is not None:
-                return float(ds.SliceLocation)
-            elif hasattr(ds, 'ImagePositionPatient') and ds.ImagePositionPatient:
-                return float(ds.ImagePositionPatient[2])
-            elif hasattr(ds, 'InstanceNumber') and ds.InstanceNumber is not None:
-                return int(ds.InstanceNumber)
-            return 0
-        try:
-            slices.sort(key=sort_key)
-        except Exception:
-            slices.sort(key=lambda x: x[1])
-        return slices
+    def _scan_headers(self, dicom_files):
+        """Phase one: headers of every file, from the header index or parsed without pixel data.
 
-    def _create_volume(self, valid_slices, celery_task=None):
-        import numpy as np
-        pixel_data_list = []
-        for i, (ds, _, pixel_array) in enumerate(valid_slices):
+        Files unknown to the index (or changed since) are parsed across a
+        process pool and recorded, so a retry or reprocess is a single lookup.
+        """
+        index = get_dicom_index(current_app.config)
+        cached, missing = {}, dicom_files
+        if index is not None:
             try:
-                if hasattr(ds, 'RescaleSlope') and hasattr(ds, 'RescaleIntercept'):
-                    slope = float(ds.RescaleSlope) if ds.RescaleSlope else 1.0
-                    intercept = float(ds.RescaleIntercept) if ds.RescaleIntercept else 0.0
-                    pixel_array = pixel_array.astype(np.float64) * slope + intercept
-                pixel_data_list.append(pixel_array.astype(np.float64))
-            except Exception:
-                continue
-            if celery_task and i % 20 == 0:
-                progress = 35 + int((i / len(valid_slices)) * 10)
-                self.update_progress(progress, f'Building volume... {i}/{len(valid_slices)}', celery_task)
-        if not pixel_data_list:
-            raise Exception("Failed to create volume from DICOM files")
-        volume = np.stack(pixel_data_list, axis=2)
-        return volume
-
-    def _extract_dicom_metadata(self, first_slice):
+                cached, missing = index.lookup(dicom_files)
+            except Exception as e:
+                logger.warning(f"DICOM header index lookup failed: {e}")
+        parsed = dict(zip(missing, self._parse_headers(missing))) if missing else {}
+        if index is not None and parsed:
+            try:
+                index.store(parsed)
+            except Exception as e:
+                logger.warning(f"DICOM header index update failed: {e}")
+        self.header_index_stats = {'hits': len(cached), 'misses': len(parsed)}
+        return [h for h in (cached.get(path, parsed.get(path)) for path in dicom_files) if h is not None]
+
+    def _parse_headers(self, dicom_files):
+        workers = max(1, int(current_app.config.get('DICOM_SCAN_WORKERS', os.cpu_count() or 1)))
+        if workers == 1 or len(dicom_files) < 2 * workers:
+            return list(map(read_dicom_header, dicom_files))
+        if multiprocessing.current_process().daemon:
+            # Celery prefork children are daemonic and may not start processes of their own
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dicom-scan')
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        with executor:
+            chunksize = max(1, len(dicom_files) // (workers * 4))
+            return list(executor.map(read_dicom_header, dicom_files, chunksize=chunksize))
+
+    def _select_series(self, headers):
+        """Keep the largest group of same-series, same-size single-frame slices, sorted along z."""
+        groups = defaultdict(list)
+        for header in headers:
+            if header['frames'] == 1:
+                groups[(header['series_uid'], header['rows'], header['columns'])].append(header)
+        if not groups:
+            return []
+        key, series = max(groups.items(), key=lambda item: len(item[1]))
+        if len(groups) > 1:
+            logger.warning(f"Found {len(groups)} DICOM series/sizes; using {key} with {len(series)} slices")
+        normal = _slice_normal(series[0]['orientation'])
+        series.sort(key=lambda header: _slice_sort_key(header, normal))
+        return series
+
+    def _create_volume(self, series, celery_task=None):
+        """Phase two: decode only the selected slices, in parallel, straight into their z plane.
+
+        The volume is allocated once, as int16 or float32 (see _volume_dtype);
+        planes receive stored values and the rescale is applied afterwards in
+        blocks. Returns (volume, series) with slices that failed to decode removed.
+        """
+        first = series[0]
+        dtype = _volume_dtype(series)
+        volume = np.empty((first['rows'], first['columns'], len(series)), dtype=dtype)
+        stored_ranges = np.zeros((len(series), 2), dtype=np.float64)
+        workers = max(1, int(current_app.config.get('DICOM_DECODE_WORKERS', os.cpu_count() or 1)))
+        registry = get_decoder_registry(current_app.config)
+        self.decoder_counts = defaultdict(int)
+        self.decode_failures = []
+        failed = []
+        # Compressed slices decode in parallel too: the JPEG/JPEG 2000 codecs release the GIL
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dicom-decode') as executor:
+            futures = [executor.submit(self._decode_slice, volume, z, header, registry)
+                       for z, header in enumerate(series)]
+            for done, future in enumerate(as_completed(futures)):
+                z, result = future.result()
+                if isinstance(result, Exception):
+                    logger.warning(f"Failed to decode {series[z]['path']}: {result}")
+                    failed.append(z)
+                    syntax = series[z]['transfer_syntax']
+                    self.decode_failures.append({
+                        'file': os.path.basename(series[z]['path']),
+                        'transfer_syntax': TRANSFER_SYNTAX_NAMES.get(syntax, syntax),
+                        'error': str(result)
+                    })
+                else:
+                    stored_ranges[z], decoder = result
+                    self.decoder_counts[decoder] += 1
+                if celery_task and done % 20 == 0:
+                    progress = 35 + int((done / len(series)) * 10)
+                    self.update_progress(progress, f'Building volume... {done}/{len(series)}', celery_task)
+        if failed:
+            max_ratio = float(current_app.config.get('DICOM_MAX_DECODE_FAILURE_RATIO', 0.05))
+            if len(failed) == len(series) or len(failed) > max_ratio * len(series):
+                raise Exception(f"{len(failed)}/{len(series)} DICOM slices failed to decode: "
+                                f"{self.decode_failures[0]['error']}")
+            logger.warning(f"Dropped {len(failed)}/{len(series)} DICOM slices that failed to decode")
+            failed = set(failed)
+            kept = [z for z in range(len(series)) if z not in failed]
+            # Compact in place; the trailing planes stay allocated but unused
+            for target, z in enumerate(kept):
+                if target != z:
+                    volume[:, :, target] = volume[:, :, z]
+            volume = volume[:, :, :len(kept)]
+            stored_ranges = stored_ranges[kept]
+            series = [series[z] for z in kept]
+
+        slopes = np.array([h['slope'] for h in series], dtype=np.float64)
+        intercepts = np.array([h['intercept'] for h in series], dtype=np.float64)
+        if np.all(slopes == 1.0) and np.all(intercepts == 0.0):
+            return volume, series
+        if volume.dtype == np.int16:
+            low, high = _rescaled_range(stored_ranges, slopes, intercepts)
+            if low < np.iinfo(np.int16).min or high > np.iinfo(np.int16).max:
+                logger.info(f"Rescaled range [{low}, {high}] exceeds int16; using float32")
+                return rescale_volume(volume, slopes, intercepts,
+                                      out=np.empty(volume.shape, dtype=np.float32)), series
+        return rescale_volume(volume, slopes, intercepts), series
+
+    def _decode_slice(self, volume, z, header, registry):
+        """Copy one slice's stored values into ``volume[:, :, z]``.
+
+        Returns (z, ((min, max), decoder_name)) or (z, error).
+        """
         try:
-            pixel_spacing = getattr(first_slice, 'PixelSpacing', [1.0, 1.0])
-            slice_thickness = getattr(first_slice, 'SliceThickness', 1.0)
-            if isinstance(pixel_spacing, (list, tuple)) and len(pixel_spacing) >= 2:
-                x_spacing = float(pixel_spacing[0])
-                y_spacing = float(pixel_spacing[1])
+            rows, columns = volume.shape[:2]
+            decoder = 'raw'
+            if header['native_dtype']:
+                pixel_array = np.fromfile(header['path'], dtype=header['native_dtype'], count=rows * columns,
+                                          offset=header['pixel_offset']).reshape(rows, columns)
+                shift = pixel_array.dtype.itemsize * 8 - header['bits_stored']
+                if shift:
+                    pixel_array = (pixel_array << shift) >> shift
             else:
-                x_spacing = y_spacing = 1.0
-            z_spacing = float(slice_thickness) if slice_thickness else 1.0
-            return {
-                "x_spacing_mm": x_spacing,
-                "y_spacing_mm": y_spacing,
-                "z_spacing_mm": z_spacing
-            }
-        except Exception:
-            return {"x_spacing_mm": 1.0, "y_spacing_mm": 1.0, "z_spacing_mm": 1.0}
-
+                pixel_array, decoder = registry.decode(pydicom.dcmread(header['path'], force=True))
+            if pixel_array.shape != (rows, columns):
+                raise ValueError(f"unexpected slice shape {pixel_array.shape}")
+            np.copyto(volume[:, :, z], pixel_array, casting='unsafe')
+            return z, ((float(pixel_array.min()), float(pixel_array.max())), decoder)
+        except Exception as e:
+            return z, e
 
+    def _extract_dicom_metadata(self, series):
+        """Voxel spacing of the sorted series; z is the median step between slice positions."""
+        first = series[0]
+        pixel_spacing = first.get('pixel_spacing') or [1.0, 1.0]
+        z_spacing = first.get('slice_thickness') or 1.0
+        if len(series) > 1 and all(h['position'] is not None for h in series):
+            normal = _slice_normal(first['orientation'])
+            if normal is None:
+                normal = np.array([0.0, 0.0, 1.0])
+            steps = np.abs(np.diff([float(np.dot(normal, h['position'])) for h in series]))
+            if np.median(steps) > 0:
+                # SliceThickness is the slab width, which need not match the spacing
+                z_spacing = float(np.median(steps))
+        return {
+            "x_spacing_mm": pixel_spacing[0],
+            "y_spacing_mm": pixel_spacing[1],
+            "z_spacing_mm": z_spacing
+        }
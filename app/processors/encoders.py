@@ -0,0 +1,177 @@
+import io
+import logging
+import numpy as np
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_GRAY, TJSAMP_GRAY
+except ImportError:
+    TurboJPEG = None
+
+try:
+    import pillow_avif  # noqa: F401  registers the AVIF plugin on older Pillow
+except ImportError:
+    pass
+
+
+class SliceEncoder:
+    """Encodes a 2-D uint8 slice to bytes; subclasses define format and options."""
+
+    name = 'base'
+    extension = ''
+    content_type = 'application/octet-stream'
+    profile = None
+
+    def encode(self, slice_data):
+        raise NotImplementedError
+
+    def describe(self):
+        """Format details stored with the processing result for the uploader/viewer."""
+        return {
+            'profile': self.profile,
+            'encoder': self.name,
+            'extension': self.extension,
+            'content_type': self.content_type
+        }
+
+    def _to_image(self, slice_data):
+        return Image.fromarray(np.ascontiguousarray(slice_data, dtype=np.uint8), mode='L')
+
+    def _save(self, slice_data, **save_kwargs):
+        buffer = io.BytesIO()
+        self._to_image(slice_data).save(buffer, **save_kwargs)
+        return buffer.getvalue()
+
+
+class PillowJPEGEncoder(SliceEncoder):
+    name = 'jpeg'
+    extension = '.jpg'
+    content_type = 'image/jpeg'
+
+    def __init__(self, quality=85, optimize=False):
+        self.quality = quality
+        self.optimize = optimize
+
+    def encode(self, slice_data):
+        return self._save(slice_data, format='JPEG', quality=self.quality, optimize=self.optimize)
+
+
+class TurboJPEGEncoder(SliceEncoder):
+    """libjpeg-turbo through PyTurboJPEG, encoding grayscale without a PIL round trip."""
+
+    name = 'turbojpeg'
+    extension = '.jpg'
+    content_type = 'image/jpeg'
+
+    def __init__(self, quality=85):
+        self.quality = quality
+        self._jpeg = TurboJPEG()
+
+    def encode(self, slice_data):
+        gray = np.ascontiguousarray(slice_data, dtype=np.uint8)[:, :, np.newaxis]
+        return self._jpeg.encode(gray, quality=self.quality, pixel_format=TJPF_GRAY, jpeg_subsample=TJSAMP_GRAY)
+
+
+class WebPEncoder(SliceEncoder):
+    name = 'webp'
+    extension = '.webp'
+    content_type = 'image/webp'
+
+    def __init__(self, quality=80, lossless=False, method=4):
+        self.quality = quality
+        self.lossless = lossless
+        self.method = method
+
+    def encode(self, slice_data):
+        return self._save(slice_data, format='WEBP', quality=self.quality, lossless=self.lossless, method=self.method)
+
+
+class AVIFEncoder(SliceEncoder):
+    name = 'avif'
+    extension = '.avif'
+    content_type = 'image/avif'
+
+    def __init__(self, quality=60, speed=8):
+        self.quality = quality
+        self.speed = speed
+
+    def encode(self, slice_data):
+        return self._save(slice_data, format='AVIF', quality=self.quality, speed=self.speed)
+
+
+class PNGEncoder(SliceEncoder):
+    name = 'png'
+    extension = '.png'
+    content_type = 'image/png'
+
+    def __init__(self, compress_level=6):
+        self.compress_level = compress_level
+
+    def encode(self, slice_data):
+        return self._save(slice_data, format='PNG', compress_level=self.compress_level)
+
+
+# Named encoder profiles: (encoder class, options), best choice first, fallbacks after
+ENCODER_PROFILES = {
+    'fast-preview': [
+        (TurboJPEGEncoder, {'quality': 75}),
+        (PillowJPEGEncoder, {'quality': 75, 'optimize': False}),
+    ],
+    'balanced': [
+        (TurboJPEGEncoder, {'quality': 85}),
+        (PillowJPEGEncoder, {'quality': 85, 'optimize': False}),
+    ],
+    'archival': [
+        (PNGEncoder, {'compress_level': 6}),
+    ],
+    'compact-webp': [
+        (WebPEncoder, {'quality': 80, 'method': 4}),
+        (PillowJPEGEncoder, {'quality': 85, 'optimize': False}),
+    ],
+    'compact-avif': [
+        (AVIFEncoder, {'quality': 60, 'speed': 8}),
+        (WebPEncoder, {'quality': 80, 'method': 4}),
+        (PillowJPEGEncoder, {'quality': 85, 'optimize': False}),
+    ],
+}
+
+DEFAULT_PROFILE = 'balanced'
+
+
+def encoder_available(encoder_cls):
+    if encoder_cls is TurboJPEGEncoder:
+        return TurboJPEG is not None
+    if encoder_cls is WebPEncoder:
+        return bool(features.check('webp'))
+    if encoder_cls is AVIFEncoder:
+        return 'AVIF' in Image.registered_extensions().values()
+    return True
+
+
+def get_encoder(profile=None):
+    """Return an encoder for a named profile, falling back to what is installed."""
+    profile = profile or DEFAULT_PROFILE
+    candidates = ENCODER_PROFILES.get(profile)
+    if candidates is None:
+        logger.warning(f"Unknown encoder profile '{profile}', using '{DEFAULT_PROFILE}'")
+        profile, candidates = DEFAULT_PROFILE, ENCODER_PROFILES[DEFAULT_PROFILE]
+    for encoder_cls, options in candidates:
+        if not encoder_available(encoder_cls):
+            continue
+        try:
+            encoder = encoder_cls(**options)
+        except Exception as e:  # e.g. PyTurboJPEG installed without libturbojpeg
+            logger.warning(f"Encoder {encoder_cls.name} unavailable for profile '{profile}': {e}")
+            continue
+        encoder.profile = profile
+        return encoder
+    raise RuntimeError(f"No encoder available for profile '{profile}'")
+
+
+def get_encoder_for_report(report_type, config):
+    """Pick the encoder profile configured for a report type (SLICE_ENCODER_PROFILES)."""
+    profiles = config.get('SLICE_ENCODER_PROFILES') or {}
+    profile = profiles.get((report_type or '').lower()) or config.get('SLICE_ENCODER_PROFILE', DEFAULT_PROFILE)
+    return get_encoder(profile)
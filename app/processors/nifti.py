@@ -1,8 +1,15 @@
 import nibabel as nib
+import numpy as np
 import os
+import time
 import logging
 from .base import MedicalImageProcessor
+from .normalization import NormalizedVolumeView
+from .windowing import as_lut_source
 from app.services.job_status import JobStatusManager
+from app.services.ingest import decompress_to_cache
+from app.utils.memory import track_peak_memory
+from flask import current_app
 
 logger = logging.getLogger(__name__)
 
@@ -12,28 +19,74 @@ class NIfTIProcessor(MedicalImageProcessor):
         try:
             if not os.path.exists(file_path):
                 raise FileNotFoundError(f"File not found: {file_path}")
+            start_time = time.perf_counter()
+            ingest_metrics = None
+            if file_path.lower().endswith('.gz'):
+                # Inflate once into the local cache so the volume can be memory-mapped; the entry is
+                # left to age-based cleanup, since a retry of the same upload may be reading it
+                self.update_progress(5, 'Decompressing NIfTI file...', celery_task)
+                file_path, ingest_metrics = decompress_to_cache(file_path)
             self.update_progress(10, 'Loading NIfTI file...', celery_task)
             img = nib.load(file_path)
-            data = img.get_fdata()
-            if data.size == 0:
+            if int(np.prod(img.shape)) == 0:
                 raise ValueError("Empty NIfTI data")
-            logger.info(f"Data shape: {data.shape}, dtype: {data.dtype}")
+            logger.info(f"Data shape: {img.shape}, dtype: {img.get_data_dtype()}")
             self.update_progress(20, 'Normalizing data...', celery_task)
-            data_normalized = self.normalize_data(data)
-            slice_counts = self.save_slices(
-                data_normalized,
-                output_id,
-                lambda p, m: self.update_progress(p, m, celery_task)
-            )
-            voxel_info = self._extract_voxel_info(img)
+            with track_peak_memory(current_app.config.get('MEMORY_TRACE_ENABLED', False)) as memory_stats:
+                raw, slope, intercept = self._raw_image(img)
+                # Linear interpolation commutes with the rescale, so stored values are resampled
+                raw, voxel_info = self.resample_volume(raw, self._extract_voxel_info(img))
+                raw = self.autocrop_volume(raw, voxel_info, slope, intercept)
+                if self._get_output_mode() == 'on_demand':
+                    streaming = isinstance(raw, np.memmap)
+                    slice_counts = self.save_volume_store(raw, output_id, slope, intercept)
+                elif self._get_output_mode() == 'mesh':
+                    streaming = isinstance(raw, np.memmap)
+                    slice_counts = self.save_mesh(raw, voxel_info, output_id, slope, intercept)
+                else:
+                    data_normalized = self._normalize_image(raw, slope)
+                    streaming = isinstance(data_normalized, NormalizedVolumeView)
+                    window_source = as_lut_source(raw, slope, intercept) if self.window_presets else None
+                    slice_counts = self.save_slices(
+                        data_normalized,
+                        output_id,
+                        lambda p, m: self.update_progress(p, m, celery_task),
+                        window_source
+                    )
+                self.save_panoramic(raw, voxel_info, output_id, invert=slope < 0)
+                self.save_thumbnails(raw, output_id, invert=slope < 0)
+            logger.info(f"NIfTI peak memory: +{memory_stats['peak_memory_mb']} MB, "
+                        f"process peak RSS {memory_stats['peak_rss_mb']} MB (streaming={streaming})")
+            time_to_first_slice = (round(self.first_slice_time - start_time, 3)
+                                   if self.first_slice_time else None)
             return {
                 "status": "success",
                 "message": "NIfTI file processed successfully",
                 "slice_counts": slice_counts,
                 "voxel_sizes": voxel_info,
-                "data_shape": list(data.shape),
+                "data_shape": list(raw.shape),
                 "output_id": output_id,
-                "total_slices": sum(slice_counts.values())
+                "total_slices": sum(slice_counts.values()),
+                "slice_index_map": self.slice_index_map,
+                "slice_format": self.slice_format,
+                "output_mode": self.output_mode,
+                "atlas_counts": self.atlas_counts,
+                "preview": self.preview,
+                "volume_store": self.volume_store,
+                "window_counts": self.window_counts,
+                "window_atlas_counts": self.window_atlas_counts,
+                "intensity_range": self.intensity_summary(float(getattr(img.dataobj, 'slope', 1.0)),
+                                                          float(getattr(img.dataobj, 'inter', 0.0))),
+                "resample": self.resample,
+                "panoramic": self.panoramic,
+                "crop": self.crop,
+                "mesh": self.mesh,
+                "thumbnails": self.thumbnails,
+                "peak_memory_mb": memory_stats['peak_memory_mb'],
+                "peak_rss_mb": memory_stats['peak_rss_mb'],
+                "streaming": streaming,
+                "ingest": ingest_metrics,
+                "time_to_first_slice_s": time_to_first_slice
             }
         except Exception as e:
             error_msg = f"NIfTI processing error: {str(e)}"
@@ -42,6 +95,29 @@ class NIfTIProcessor(MedicalImageProcessor):
             logger.error(f"NIfTI processing failed: {error_msg}")
             raise
 
+    def _normalize_image(self, raw, slope):
+        """Normalize from the stored voxels in their on-disk dtype instead of float64.
+
+        Percentile scaling is invariant to the header's linear rescale, so the raw
+        values can be used directly; only a negative slope flips the mapping.
+        Memory-mapped (uncompressed .nii) volumes are streamed plane by plane
+        when NIFTI_STREAMING is enabled.
+        """
+        invert = slope < 0
+        if isinstance(raw, np.memmap) and current_app.config.get('NIFTI_STREAMING', True):
+            data_min, data_max = self.intensity_range(raw)
+            return NormalizedVolumeView(raw, data_min, data_max, invert)
+        return self.normalize_data(raw, invert=invert)
+
+    def _raw_image(self, img):
+        """Return (stored voxels, slope, intercept); stored voxels are a memmap for uncompressed .nii."""
+        dataobj = img.dataobj
+        if not nib.is_proxy(dataobj):
+            return np.asanyarray(dataobj), 1.0, 0.0
+        slope = float(getattr(dataobj, 'slope', 1.0))
+        intercept = float(getattr(dataobj, 'inter', 0.0))
+        return dataobj.get_unscaled(), slope, intercept
+
     def _extract_voxel_info(self, img):
         try:
             voxel_sizes = img.header.get_zooms()
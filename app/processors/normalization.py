@@ -0,0 +1,305 @@
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Scratch memory used per block while scaling; keeps float temporaries bounded
+DEFAULT_BLOCK_BYTES = 32 * 1024 * 1024
+
+
+def array_order(data):
+    """Return the memory order ('C' or 'F') blocks should follow for ``data``."""
+    order = getattr(data, 'order', None)  # nibabel ArrayProxy
+    if order in ('C', 'F'):
+        return order
+    flags = getattr(data, 'flags', None)
+    if flags is not None and flags.f_contiguous and not flags.c_contiguous:
+        return 'F'
+    return 'C'
+
+
+def iter_blocks(shape, itemsize, order='C', block_bytes=DEFAULT_BLOCK_BYTES):
+    """Yield index tuples covering ``shape`` in slabs along its slowest-varying axis.
+
+    Slabs follow the memory order so each block is a contiguous read, which also
+    matters when ``data`` is a memory-mapped file rather than an in-memory array.
+    """
+    if not shape:
+        yield ()
+        return
+    axis = 0 if order == 'C' else len(shape) - 1
+    axis_len = shape[axis]
+    plane_bytes = max(1, int(np.prod(shape, dtype=np.int64)) // max(1, axis_len) * itemsize)
+    step = max(1, block_bytes // plane_bytes)
+    for start in range(0, axis_len, step):
+        index = [slice(None)] * len(shape)
+        index[axis] = slice(start, min(start + step, axis_len))
+        yield tuple(index)
+
+
+def compute_min_max(data, block_bytes=DEFAULT_BLOCK_BYTES):
+    """Min and max of ``data`` in one blockwise sweep, without full-size temporaries."""
+    data_min = data_max = None
+    itemsize = np.dtype(data.dtype).itemsize
+    for index in iter_blocks(data.shape, itemsize, array_order(data), block_bytes):
+        block = np.asarray(data[index])
+        if block.size == 0:
+            continue
+        block_min, block_max = block.min(), block.max()
+        data_min = block_min if data_min is None else min(data_min, block_min)
+        data_max = block_max if data_max is None else max(data_max, block_max)
+    if data_min is None:
+        raise ValueError("Cannot compute intensity range of empty data")
+    return float(data_min), float(data_max)
+
+
+# Dtypes whose full value range fits a bincount histogram (exact percentiles)
+HISTOGRAM_DTYPES = {
+    np.dtype(np.uint8): (np.uint8, 0),
+    np.dtype(np.int8): (np.uint8, -128),
+    np.dtype(np.uint16): (np.uint16, 0),
+    np.dtype(np.int16): (np.uint16, -32768),
+}
+# Voxels kept from other dtypes for sampled percentiles
+DEFAULT_SAMPLE_SIZE = 1 << 20
+# Percentiles used as the intensity range so a few metal-artifact voxels don't collapse contrast
+ROBUST_PERCENTILES = (0.5, 99.5)
+
+
+class IntensityStats:
+    """Min/max and a distribution summary of a volume, gathered in one blockwise sweep.
+
+    Integer volumes of up to 16 bits get an exact histogram; other dtypes keep
+    a strided sample of about ``DEFAULT_SAMPLE_SIZE`` voxels. Percentiles 0 and
+    100 always return the exact min/max.
+    """
+
+    def __init__(self, data_min, data_max, count, histogram=None, offset=0, sample=None):
+        self.data_min = data_min
+        self.data_max = data_max
+        self.count = count
+        self.histogram = histogram
+        self.offset = offset
+        self.sample = sample
+
+    def percentile(self, q):
+        if q <= 0:
+            return self.data_min
+        if q >= 100:
+            return self.data_max
+        if self.histogram is not None:
+            rank = q / 100.0 * (self.count - 1)
+            position = int(np.searchsorted(np.cumsum(self.histogram), rank, side='right'))
+            return float(min(max(position + self.offset, self.data_min), self.data_max))
+        return float(np.percentile(self.sample, q))
+
+    def intensity_range(self, lower=0.0, upper=100.0):
+        return self.percentile(lower), self.percentile(upper)
+
+    def summary(self, lower=0.0, upper=100.0, slope=1.0, intercept=0.0):
+        """Serializable range in real-world units (``stored * slope + intercept``)."""
+        low, high = sorted(v * slope + intercept for v in self.intensity_range(lower, upper))
+        data_min, data_max = sorted(v * slope + intercept for v in (self.data_min, self.data_max))
+        return {
+            'min': data_min, 'max': data_max, 'low': low, 'high': high,
+            'percentiles': [lower, upper],
+            'method': 'histogram' if self.histogram is not None else 'sample'
+        }
+
+
+def compute_intensity_stats(data, sample_size=DEFAULT_SAMPLE_SIZE, block_bytes=DEFAULT_BLOCK_BYTES):
+    """Scan ``data`` once for min/max plus a histogram or strided sample (see IntensityStats)."""
+    dtype = np.dtype(data.dtype)
+    histogram_spec = HISTOGRAM_DTYPES.get(dtype)
+    total = int(np.prod(data.shape, dtype=np.int64))
+    stride = max(1, total // sample_size)
+    histogram = None
+    samples = []
+    data_min = data_max = None
+    for index in iter_blocks(data.shape, dtype.itemsize, array_order(data), block_bytes):
+        block = np.asarray(data[index])
+        if block.size == 0:
+            continue
+        block_min, block_max = block.min(), block.max()
+        data_min = block_min if data_min is None else min(data_min, block_min)
+        data_max = block_max if data_max is None else max(data_max, block_max)
+        if histogram_spec is not None:
+            view_dtype, _ = histogram_spec
+            counts = np.bincount(np.ascontiguousarray(block).view(view_dtype).ravel(),
+                                 minlength=np.iinfo(view_dtype).max + 1)
+            histogram = counts if histogram is None else histogram + counts
+        else:
+            samples.append(block.ravel(order='K')[::stride].astype(np.float32))
+    if data_min is None:
+        raise ValueError("Cannot compute intensity statistics of empty data")
+    offset = 0
+    if histogram_spec is not None:
+        _, offset = histogram_spec
+        if offset:
+            # Signed values were counted through their unsigned view; put negatives first
+            histogram = np.roll(histogram, -offset)
+        return IntensityStats(float(data_min), float(data_max), total, histogram=histogram, offset=offset)
+    return IntensityStats(float(data_min), float(data_max), total, sample=np.concatenate(samples))
+
+
+def normalize_to_uint8(data, data_min=None, data_max=None, invert=False, out=None,
+                       block_bytes=DEFAULT_BLOCK_BYTES):
+    """Min/max-scale ``data`` to uint8, writing the result block by block.
+
+    ``data`` may be any array-like supporting slicing (ndarray, memmap, nibabel
+    proxy) in its native dtype; only one float32 block is alive at a time.
+    ``invert`` maps ``data_max`` to 0, which is what a negative rescale slope needs.
+    """
+    if data_min is None or data_max is None:
+        data_min, data_max = compute_min_max(data, block_bytes)
+    order = array_order(data)
+    if out is None:
+        out = np.empty(data.shape, dtype=np.uint8, order=order)
+    if data_max == data_min:
+        logger.warning("Constant intensity data detected")
+        out.fill(0)
+        return out
+
+    scale = np.float32(255.0 / (data_max - data_min))
+    itemsize = max(np.dtype(data.dtype).itemsize, 4)
+    for index in iter_blocks(data.shape, itemsize, order, block_bytes):
+        block = np.asarray(data[index])
+        if invert:
+            scaled = np.subtract(np.float32(data_max), block, dtype=np.float32)
+        else:
+            scaled = np.subtract(block, np.float32(data_min), dtype=np.float32)
+        np.multiply(scaled, scale, out=scaled)
+        np.clip(scaled, 0, 255, out=scaled)
+        np.copyto(out[index], scaled, casting='unsafe')
+    return out
+
+
+def informative_slice_masks(data, min_std=1.0, block_bytes=DEFAULT_BLOCK_BYTES):
+    """Boolean mask per axis of the slices worth rendering (non-empty, std > ``min_std``).
+
+    A single blockwise sweep accumulates per-slice sum and sum of squares for all
+    three axes with ``np.add.reduce``, replacing per-slice np.any/np.std calls
+    over strided views.
+    """
+    shape = tuple(data.shape[:3])
+    sums = [np.zeros(n, dtype=np.float64) for n in shape]
+    square_sums = [np.zeros(n, dtype=np.float64) for n in shape]
+    order = array_order(data)
+    slab_axis = 0 if order == 'C' else 2
+    for index in iter_blocks(shape, 8, order, block_bytes):
+        block = np.asarray(data[index])
+        block_squares = np.square(block, dtype=np.float64)
+        for axis in range(3):
+            other_axes = tuple(a for a in range(3) if a != axis)
+            block_sum = np.add.reduce(block, axis=other_axes, dtype=np.float64)
+            block_square_sum = np.add.reduce(block_squares, axis=other_axes)
+            target = index[axis] if axis == slab_axis else slice(None)
+            sums[axis][target] += block_sum
+            square_sums[axis][target] += block_square_sum
+
+    masks = {}
+    total = float(np.prod(shape, dtype=np.int64))
+    for axis in range(3):
+        count = total / shape[axis] if shape[axis] else 1.0
+        mean = sums[axis] / count
+        variance = np.maximum(square_sums[axis] / count - mean * mean, 0.0)
+        masks[axis] = (square_sums[axis] > 0) & (np.sqrt(variance) > min_std)
+    return masks
+
+
+def content_bounds(data, threshold, invert=False, min_count=1, block_bytes=DEFAULT_BLOCK_BYTES):
+    """Per-axis (start, stop) of the planes holding at least ``min_count`` voxels above ``threshold``.
+
+    One blockwise sweep counts the thresholded voxels of every plane of all
+    three axes (projections of the mask); ``invert`` counts voxels below it
+    instead. Returns None when no plane qualifies.
+    """
+    shape = tuple(data.shape[:3])
+    counts = [np.zeros(n, dtype=np.int64) for n in shape]
+    order = array_order(data)
+    slab_axis = 0 if order == 'C' else 2
+    for index in iter_blocks(shape, np.dtype(data.dtype).itemsize, order, block_bytes):
+        block = np.asarray(data[index])
+        mask = block < threshold if invert else block > threshold
+        for axis in range(3):
+            other_axes = tuple(a for a in range(3) if a != axis)
+            target = index[axis] if axis == slab_axis else slice(None)
+            counts[axis][target] += np.count_nonzero(mask, axis=other_axes)
+    bounds = []
+    for axis_counts in counts:
+        kept = np.flatnonzero(axis_counts >= min_count)
+        if not kept.size:
+            return None
+        bounds.append((int(kept[0]), int(kept[-1]) + 1))
+    return bounds
+
+
+class NormalizedVolumeView:
+    """Read-only uint8 view over a raw volume that normalizes on access.
+
+    Used for memory-mapped inputs: slicing pulls only the requested plane from
+    the mapping and scales it with precomputed global min/max, so the full
+    normalized volume is never materialized.
+    """
+
+    def __init__(self, raw, data_min, data_max, invert=False):
+        self.raw = raw
+        self.data_min = data_min
+        self.data_max = data_max
+        self.invert = invert
+        if data_max == data_min:
+            logger.warning("Constant intensity data detected")
+
+    @property
+    def shape(self):
+        return self.raw.shape
+
+    @property
+    def order(self):
+        return array_order(self.raw)
+
+    @property
+    def ndim(self):
+        return len(self.raw.shape)
+
+    @property
+    def dtype(self):
+        return np.dtype(np.uint8)
+
+    def __getitem__(self, index):
+        block = np.asarray(self.raw[index])
+        if self.data_max == self.data_min:
+            return np.zeros(block.shape, dtype=np.uint8)
+        return normalize_to_uint8(block, self.data_min, self.data_max, self.invert)
+
+
+def block_mean_downsample(data, factor=4, block_bytes=DEFAULT_BLOCK_BYTES):
+    """Shrink a uint8 volume by ``factor`` on every axis using the mean of each block.
+
+    Blocks are summed with ``np.add.reduceat`` so edge blocks that are smaller
+    than ``factor`` are averaged over the voxels they actually contain. The input
+    is read in slabs along its slowest-varying axis, like ``normalize_to_uint8``.
+    """
+    shape = tuple(data.shape[:3])
+    order = array_order(data)
+    slab_axis = 0 if order == 'C' else 2
+    out = np.empty(tuple(-(-n // factor) for n in shape), dtype=np.uint8, order=order)
+    # Slab boundaries must fall on block boundaries
+    plane_bytes = max(1, int(np.prod(shape, dtype=np.int64)) // max(1, shape[slab_axis]) * 4)
+    step = max(1, block_bytes // (plane_bytes * factor)) * factor
+    for start in range(0, shape[slab_axis], step):
+        index = [slice(None)] * 3
+        index[slab_axis] = slice(start, min(start + step, shape[slab_axis]))
+        block = np.asarray(data[tuple(index)], dtype=np.float32)
+        counts = np.ones((1, 1, 1), dtype=np.float32)
+        for axis in range(3):
+            axis_len = block.shape[axis]
+            edges = np.arange(0, axis_len, factor)
+            block = np.add.reduceat(block, edges, axis=axis)
+            lengths = np.diff(np.append(edges, axis_len)).astype(np.float32)
+            counts = counts * lengths.reshape([-1 if a == axis else 1 for a in range(3)])
+        out_index = [slice(None)] * 3
+        out_index[slab_axis] = slice(start // factor, start // factor + block.shape[slab_axis])
+        np.rint(block / counts, out=block)
+        np.copyto(out[tuple(out_index)], block, casting='unsafe')
+    return out
@@ -0,0 +1,227 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+from .normalization import DEFAULT_BLOCK_BYTES, array_order, iter_blocks
+
+logger = logging.getLogger(__name__)
+
+PANORAMIC_FILENAME = 'panoramic.png'
+# Fraction of the brightest voxels (enamel/cortical bone) used to find the tooth level
+TOOTH_PERCENTILE = 99.5
+# Pixels within this distance of a candidate arch count as supporting it
+ARCH_TOLERANCE_MM = 3.0
+RANSAC_ITERATIONS = 200
+MAX_FIT_POINTS = 20000
+DEPTH_CHUNK = 4
+
+
+def _strided_sample(volume, target=2_000_000):
+    step = max(1, int(round((np.prod(volume.shape, dtype=np.float64) / target) ** (1 / 3))))
+    return np.asarray(volume[::step, ::step, ::step])
+
+
+def tooth_band(volume, block_bytes=DEFAULT_BLOCK_BYTES):
+    """Axial slice range (z0, z1) around the level with the most tooth-bright voxels."""
+    threshold = np.percentile(_strided_sample(volume), TOOTH_PERCENTILE)
+    counts = np.zeros(volume.shape[2], dtype=np.int64)
+    for index in iter_blocks(volume.shape, np.dtype(volume.dtype).itemsize, array_order(volume), block_bytes):
+        counts[index[2]] += (np.asarray(volume[index]) > threshold).sum(axis=(0, 1))
+    peak = int(np.argmax(counts))
+    keep = counts >= max(1, counts[peak]) * 0.25
+    z0 = z1 = peak
+    while z0 > 0 and keep[z0 - 1]:
+        z0 -= 1
+    while z1 < len(keep) - 1 and keep[z1 + 1]:
+        z1 += 1
+    return z0, z1 + 1
+
+
+def axial_mip(volume, z0, z1, block_bytes=DEFAULT_BLOCK_BYTES):
+    """Maximum over slices z0..z1, read in slabs that follow the volume's memory order."""
+    mip = np.full(volume.shape[:2], -np.inf, dtype=np.float32)
+    shape = volume.shape[:2] + (z1 - z0,)
+    for index in iter_blocks(shape, np.dtype(volume.dtype).itemsize, array_order(volume), block_bytes):
+        z_index = slice(z0 + index[2].start, z0 + index[2].stop) if index[2].start is not None else slice(z0, z1)
+        block = np.asarray(volume[index[0], index[1], z_index]).max(axis=2)
+        np.maximum(mip[index[:2]], block, out=mip[index[:2]])
+    return mip
+
+
+def otsu_threshold(values, bins=256):
+    """Threshold maximizing the between-class variance of ``values`` (Otsu's method)."""
+    hist, edges = np.histogram(values, bins=bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    weight = np.cumsum(hist).astype(np.float64)
+    total = weight[-1]
+    mean = np.cumsum(hist * centers)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mean[-1] * weight / total - mean) ** 2 / (weight * (total - weight))
+    if not np.isfinite(between[:-1]).any():
+        # Constant input: there is nothing to separate
+        return float(centers[0])
+    between = np.nan_to_num(between[:-1], nan=-1.0)
+    # Every threshold in an empty gap between the classes scores the same; take the middle of the gap
+    best = np.flatnonzero(between >= between.max() * (1 - 1e-6))
+    return float((centers[best[0]] + centers[best[-1]]) / 2)
+
+
+def _fit_parabola(u, v, tolerance_mm, rng):
+    """Robust v = a u^2 + b u + c: RANSAC over point triples, then least squares on the inliers.
+
+    Plain least squares is pulled off the arch by the spine and other bright
+    structures at tooth level. Returns (coeffs, rms, inliers).
+    """
+    best = None
+    for _ in range(RANSAC_ITERATIONS):
+        pick = rng.choice(len(u), 3, replace=False)
+        if np.min(np.abs(np.diff(np.sort(u[pick])))) < tolerance_mm:
+            continue
+        coeffs = np.linalg.solve(np.vander(u[pick], 3), v[pick])
+        inliers = np.abs(np.polyval(coeffs, u) - v) < tolerance_mm
+        if best is None or inliers.sum() > best.sum():
+            best = inliers
+    if best is None or best.sum() < 3:
+        best = np.ones(len(u), dtype=bool)
+    coeffs = np.polyfit(u[best], v[best], 2)
+    inliers = np.abs(np.polyval(coeffs, u) - v) < tolerance_mm
+    if inliers.sum() >= 3:
+        coeffs = np.polyfit(u[inliers], v[inliers], 2)
+    else:
+        inliers = best
+    rms = float(np.sqrt(np.mean((np.polyval(coeffs, u[inliers]) - v[inliers]) ** 2)))
+    return coeffs, rms, inliers
+
+
+def fit_dental_arch(mip, spacing, tolerance_mm=ARCH_TOLERANCE_MM):
+    """Fit a parabolic arch to the bright (Otsu) pixels of an axial MIP.
+
+    Both in-plane orientations are tried (the left-right axis differs between
+    DICOM and NIfTI layouts); the one explaining the most pixels wins. Returns
+    a dict with the orientation, coefficients (in mm) and the fitted extent.
+    """
+    threshold = otsu_threshold(mip)
+    points = np.argwhere(mip > threshold).astype(np.float64) * np.asarray(spacing[:2], dtype=np.float64)
+    if len(points) < 50:
+        raise ValueError("Too few bright pixels to fit a dental arch")
+    # Fixed seed: the same volume always gets the same arch
+    rng = np.random.default_rng(0)
+    if len(points) > MAX_FIT_POINTS:
+        points = points[rng.choice(len(points), MAX_FIT_POINTS, replace=False)]
+    best = None
+    for along in (0, 1):
+        u, v = points[:, along], points[:, 1 - along]
+        coeffs, rms, inliers = _fit_parabola(u, v, tolerance_mm, rng)
+        if best is None or inliers.sum() > best['inliers']:
+            best = {'along_axis': along, 'coeffs': coeffs, 'rms_mm': rms, 'inliers': int(inliers.sum()),
+                    'extent_mm': (float(u[inliers].min()), float(u[inliers].max()))}
+    return best
+
+
+def arch_curve(arch, step_mm):
+    """Sample the arch at uniform arc length; returns (points_mm, normals) as (U, 2) arrays in axis order."""
+    u0, u1 = arch['extent_mm']
+    margin = 0.05 * (u1 - u0)
+    u = np.linspace(u0 - margin, u1 + margin, 4096)
+    v = np.polyval(arch['coeffs'], u)
+    dense = np.stack([u, v], axis=1) if arch['along_axis'] == 0 else np.stack([v, u], axis=1)
+    arc = np.concatenate([[0.0], np.cumsum(np.linalg.norm(np.diff(dense, axis=0), axis=1))])
+    samples = np.arange(0.0, arc[-1], step_mm)
+    points = np.stack([np.interp(samples, arc, dense[:, 0]), np.interp(samples, arc, dense[:, 1])], axis=1)
+    tangents = np.gradient(points, axis=0)
+    tangents /= np.linalg.norm(tangents, axis=1, keepdims=True) + 1e-12
+    normals = np.stack([-tangents[:, 1], tangents[:, 0]], axis=1)
+    return points, normals
+
+
+def panoramic_grid(points, normals, depths_mm, spacing, shape):
+    """Precompute bilinear gather indices and weights for every (depth, arc position) sample."""
+    coords = points[None, :, :] + depths_mm[:, None, None] * normals[None, :, :]
+    coords /= np.asarray(spacing[:2], dtype=np.float64)
+    grid = {}
+    for axis, name in ((0, 'i'), (1, 'j')):
+        c = np.clip(coords[..., axis], 0, shape[axis] - 1.001)
+        base = np.floor(c).astype(np.intp)
+        grid[name] = base
+        grid[f'w{name}'] = (c - base).astype(np.float32)[..., None]
+    return grid
+
+
+def sample_curved_slab(volume, grid, workers=1):
+    """Mean of the bilinearly sampled volume across slab depth; returns float32 (U, Z).
+
+    Each depth sample gathers whole z columns (``volume[i, j, :]``), and
+    chunks of depth samples are summed in a thread pool.
+    """
+    depth = grid['i'].shape[0]
+
+    def sample_chunk(start):
+        stop = min(start + DEPTH_CHUNK, depth)
+        i, j = grid['i'][start:stop], grid['j'][start:stop]
+        wi, wj = grid['wi'][start:stop], grid['wj'][start:stop]
+        top = volume[i, j].astype(np.float32) * (1 - wj) + volume[i, j + 1].astype(np.float32) * wj
+        bottom = volume[i + 1, j].astype(np.float32) * (1 - wj) + volume[i + 1, j + 1].astype(np.float32) * wj
+        return (top * (1 - wi) + bottom * wi).sum(axis=0)
+
+    starts = range(0, depth, DEPTH_CHUNK)
+    if workers > 1 and len(starts) > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='panoramic') as executor:
+            total = sum(executor.map(sample_chunk, starts))
+    else:
+        total = sum(sample_chunk(start) for start in starts)
+    return total / depth
+
+
+def render_panoramic(volume, spacing, slab_mm=15.0, invert=False, workers=1):
+    """Curved thick-slab reformat along the dental arch of an axial CBCT volume.
+
+    ``volume`` axes are (in-plane, in-plane, axial) with ``spacing`` in mm.
+    Returns (uint8 image with superior at the top, info dict).
+    """
+    start = time.perf_counter()
+    volume = volume if not invert else NegatedVolume(volume)
+    z0, z1 = tooth_band(volume)
+    mip = axial_mip(volume, z0, z1)
+    arch = fit_dental_arch(mip, spacing)
+    fitted = time.perf_counter()
+
+    step_mm = float(min(spacing[:2]))
+    points, normals = arch_curve(arch, step_mm)
+    depths = np.arange(-slab_mm / 2, slab_mm / 2 + step_mm / 2, step_mm)
+    grid = panoramic_grid(points, normals, depths, spacing, volume.shape)
+    ray_sum = sample_curved_slab(volume, grid, workers)
+    sampled = time.perf_counter()
+
+    low, high = np.percentile(ray_sum, (1.0, 99.5))
+    scaled = np.clip((ray_sum - low) * (255.0 / max(high - low, 1e-6)), 0, 255).astype(np.uint8)
+    image = Image.fromarray(np.ascontiguousarray(scaled.T[::-1]))
+    # Columns are step_mm apart along the arch; rows must match for an undistorted image
+    height = int(round(image.height * spacing[2] / step_mm))
+    if height != image.height:
+        image = image.resize((image.width, height), Image.BILINEAR)
+    info = {
+        'width': image.width,
+        'height': image.height,
+        'arch_length_mm': round(float(len(points) * step_mm), 1),
+        'slab_mm': slab_mm,
+        'depth_samples': len(depths),
+        'tooth_band': [int(z0), int(z1)],
+        'arch_fit_rms_mm': round(arch['rms_mm'], 2),
+        'timings': {'arch_fit_s': round(fitted - start, 3), 'sampling_s': round(sampled - fitted, 3),
+                    'total_s': round(time.perf_counter() - start, 3)}
+    }
+    return image, info
+
+
+class NegatedVolume:
+    """Read-only view that negates values, so a negative rescale slope keeps bone bright."""
+
+    def __init__(self, data):
+        self.data = data
+        self.shape = data.shape
+        self.dtype = np.dtype(np.float32)
+        self.order = array_order(data)
+
+    def __getitem__(self, index):
+        return -np.asarray(self.data[index], dtype=np.float32)
@@ -0,0 +1,88 @@
+import time
+import logging
+import numpy as np
+from PIL import Image
+from .normalization import normalize_to_uint8
+from .panoramic import otsu_threshold
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'thumbnails'
+# Projection axis per view; axial projections are transposed like axial slices
+# (MedicalImageProcessor._encode_slice), so every image has the layout of its view's slices
+THUMBNAIL_VIEWS = (('axial', 2), ('coronal', 1), ('sagittal', 0))
+THUMBNAIL_MODES = ('mip', 'composite')
+# Voxels per axis of the copy that is rendered; images are then scaled up to the thumbnail size
+RENDER_GRID = 128
+# Opacity of a fully opaque sample on the thumbnail grid, before the transfer ramp
+COMPOSITE_DENSITY = 0.12
+
+
+def thumbnail_volume(data, size, invert=False):
+    """Strided copy of ``data`` with at most ``size`` voxels per axis, scaled to float32 0..1.
+
+    The copy is normalized between its own robust percentiles, so raw, HU and
+    already-normalized volumes all give comparable thumbnails.
+    """
+    step = max(1, -(-max(data.shape[:3]) // size))
+    small = np.asarray(data[::step, ::step, ::step], dtype=np.float32)
+    low, high = np.percentile(small, (0.5, 99.5))
+    return normalize_to_uint8(small, low, high, invert=invert).astype(np.float32) / 255.0
+
+
+def maximum_intensity_projection(volume, axis):
+    return volume.max(axis=axis)
+
+
+def composite_projection(volume, axis, threshold, density=COMPOSITE_DENSITY):
+    """Front-to-back emission/absorption compositing along ``axis``.
+
+    The transfer function is a quadratic opacity ramp from ``threshold`` to
+    full intensity with grey emission equal to the sample value. Everything
+    is whole-array numpy: opacity, exclusive cumulative transmittance, sum.
+    """
+    ramp = np.clip((volume - threshold) / max(1.0 - threshold, 1e-6), 0, 1)
+    alpha = density * ramp * ramp
+    opacity = 1.0 - alpha
+    # Light reaching sample n has passed samples 0..n-1 only (alpha < 1, so the division is safe)
+    transmittance = np.cumprod(opacity, axis=axis) / opacity
+    return (transmittance * alpha * volume).sum(axis=axis)
+
+
+def _to_image(projection, size):
+    high = float(projection.max())
+    scaled = np.clip(projection * (255.0 / high if high > 0 else 0), 0, 255).astype(np.uint8)
+    image = Image.fromarray(np.ascontiguousarray(scaled))
+    scale = size / max(image.size)
+    if scale > 1:
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.BILINEAR)
+    return image
+
+
+def render_thumbnails(data, size=256, modes=THUMBNAIL_MODES, invert=False, grid=RENDER_GRID):
+    """MIP and composited projections of ``data`` along the three volume axes.
+
+    Returns ({'<view>_<mode>': PIL image}, info). The work happens on a
+    copy of at most ``grid`` voxels per axis, so cost is bounded by ``grid``
+    rather than the study size.
+    """
+    start = time.perf_counter()
+    volume = thumbnail_volume(data, grid, invert)
+    threshold = otsu_threshold(volume)
+    images = {}
+    for view, axis in THUMBNAIL_VIEWS:
+        for mode in modes:
+            if mode == 'mip':
+                projection = maximum_intensity_projection(volume, axis)
+            elif mode == 'composite':
+                projection = composite_projection(volume, axis, threshold)
+            else:
+                raise ValueError(f"Unknown thumbnail mode '{mode}'")
+            images[f"{view}_{mode}"] = _to_image(projection.T if axis == 2 else projection, size)
+    info = {
+        'volume_shape': list(volume.shape),
+        'transfer_threshold': round(float(threshold), 3),
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+    return images, info
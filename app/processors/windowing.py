@@ -0,0 +1,86 @@
+import logging
+import numpy as np
+from .normalization import DEFAULT_BLOCK_BYTES, array_order, iter_blocks
+
+logger = logging.getLogger(__name__)
+
+# Window presets in Hounsfield units: center (level) and width
+WINDOW_PRESETS = {
+    'bone': {'center': 500.0, 'width': 2000.0},
+    'soft_tissue': {'center': 40.0, 'width': 400.0},
+    'airway': {'center': -600.0, 'width': 1500.0},
+}
+
+LUT_DTYPES = (np.dtype(np.int16), np.dtype(np.uint16))
+HU_MIN, HU_MAX = np.iinfo(np.int16).min, np.iinfo(np.int16).max
+
+
+def build_window_lut(center, width, slope=1.0, intercept=0.0, dtype=np.int16):
+    """65,536-entry uint8 LUT mapping every 16-bit stored value through a window.
+
+    The rescale (``stored * slope + intercept``) is folded into the table, so a
+    slice is windowed with ``np.take(lut, plane.view(np.uint16))`` and no float
+    temporaries. Values below/above the window map to 0/255.
+    """
+    stored = np.arange(65536, dtype=np.uint16).view(np.dtype(dtype)).astype(np.float64)
+    real = stored * slope + intercept
+    width = max(float(width), 1e-6)
+    scaled = (real - (center - width / 2.0)) * (255.0 / width)
+    return np.clip(scaled, 0, 255).astype(np.uint8)
+
+
+def build_window_luts(presets, slope=1.0, intercept=0.0, dtype=np.int16):
+    """Stack one LUT per preset into a (n_presets, 65536) table; ``presets`` maps name -> window."""
+    return np.stack([
+        build_window_lut(window['center'], window['width'], slope, intercept, dtype)
+        for window in presets.values()
+    ])
+
+
+def apply_window_luts(luts, stored):
+    """Window a batch of 16-bit stored values with every preset in one ``np.take`` call.
+
+    Returns uint8 of shape ``(n_presets,) + stored.shape``.
+    """
+    indices = np.ascontiguousarray(stored).view(np.uint16)
+    return np.take(luts, indices, axis=1)
+
+
+def as_lut_source(data, slope=1.0, intercept=0.0, block_bytes=DEFAULT_BLOCK_BYTES):
+    """Return (data, slope, intercept) with 16-bit integer stored values for the LUTs.
+
+    int16/uint16 data is used as-is (memory maps stay mapped). Anything else is
+    rescaled to HU and rounded into a new int16 volume block by block.
+    """
+    if np.dtype(data.dtype) in LUT_DTYPES:
+        return data, slope, intercept
+    order = array_order(data)
+    hu = np.empty(data.shape, dtype=np.int16, order=order)
+    for index in iter_blocks(data.shape, 8, order, block_bytes):
+        block = np.asarray(data[index], dtype=np.float64)
+        if slope != 1.0 or intercept != 0.0:
+            block = block * slope + intercept
+        np.rint(block, out=block)
+        np.clip(block, HU_MIN, HU_MAX, out=block)
+        hu[index] = block
+    return hu, 1.0, 0.0
+
+
+def window_definitions(config):
+    """Built-in presets plus the additions/overrides from the WINDOW_PRESETS setting."""
+    definitions = dict(WINDOW_PRESETS)
+    definitions.update(config.get('WINDOW_PRESETS') or {})
+    return definitions
+
+
+def get_window_presets(report_type, config):
+    """Resolve the window presets rendered for a report type (WINDOW_PRESETS_BY_REPORT)."""
+    definitions = window_definitions(config)
+    names = (config.get('WINDOW_PRESETS_BY_REPORT') or {}).get((report_type or '').lower()) or []
+    presets = {}
+    for name in names:
+        if name not in definitions:
+            logger.warning(f"Unknown window preset '{name}' for report type '{report_type}'")
+            continue
+        presets[name] = definitions[name]
+    return presets
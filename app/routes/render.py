@@ -0,0 +1,61 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+import logging
+from app.services.slice_render import VIEW_AXES, get_slice_renderer, resolve_window_preset
+
+render_bp = Blueprint('render', __name__)
+logger = logging.getLogger(__name__)
+
+
+@render_bp.route('/render/<volume_id>', methods=['GET'])
+def get_volume_info(volume_id):
+    try:
+        volume = get_slice_renderer().get_volume(volume_id)
+        meta = volume.meta
+        return jsonify({
+            'volume_id': volume_id,
+            'data_shape': meta['shape'],
+            'slice_counts': {view: meta['shape'][axis] for view, axis in VIEW_AXES.items()},
+            'value_range': sorted([meta['data_min'] * meta['slope'] + meta['intercept'],
+                                   meta['data_max'] * meta['slope'] + meta['intercept']]),
+            'version': meta['version']
+        })
+    except FileNotFoundError:
+        return jsonify({'error': 'Volume not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error reading volume {volume_id}: {e}")
+        return jsonify({'error': 'Volume lookup failed'}), 500
+
+
+@render_bp.route('/render/<volume_id>/<view>/<int:index>', methods=['GET'])
+def render_slice(volume_id, view, index):
+    """Render one slice on demand; ``preset`` or ``center``/``width`` query args set the window."""
+    try:
+        if view not in VIEW_AXES:
+            return jsonify({'error': f'Unknown view: {view}', 'views': list(VIEW_AXES)}), 400
+        center = request.args.get('center', type=float)
+        width = request.args.get('width', type=float)
+        preset = request.args.get('preset')
+        if (center is None) != (width is None):
+            return jsonify({'error': 'Both center and width are required for a window'}), 400
+        if preset:
+            window = resolve_window_preset(preset, current_app.config)
+        else:
+            window = (center, width) if center is not None else None
+
+        renderer = get_slice_renderer()
+        tile, cache_level = renderer.render(volume_id, view, index, window)
+        response = Response(tile, mimetype=renderer.encoder.content_type)
+        response.headers['Cache-Control'] = 'private, max-age=3600'
+        response.headers['X-Render-Cache'] = cache_level
+        return response
+    except FileNotFoundError:
+        return jsonify({'error': 'Volume not found'}), 404
+    except IndexError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Render failed for {volume_id}/{view}/{index}: {e}")
+        return jsonify({'error': 'Render failed'}), 500
@@ -2,12 +2,15 @@ from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 import uuid
 import os
+import shutil
 import logging
-from app.utils.validators import allowed_file, validate_file_content
+from app.utils.validators import allowed_file, probe_file_content
 from app.services.supabase_manager import update_report_status
 from app.tasks.workflow import start_complete_workflow
 from app.tasks.workflow import start_pano_workflow
 from app.services.uploads import SupabaseUploadManager
+from app.services.upload_store import create_upload_dir, write_upload_manifest
+from app.services.archive_ingest import extract_series_archive
 
 
 upload_bp = Blueprint('upload', __name__)
@@ -49,21 +52,26 @@ def upload_medical_file():
                 update_report_status(report_id, "file_too_large")
             return jsonify({'error': f'File too large. Maximum size: {current_app.config["MAX_FILE_SIZE"] / (1024*1024):.1f} MB'}), 400
 
-        save_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{upload_id}_{filename}")
+        upload_dir = create_upload_dir(upload_id)
+        save_path = os.path.join(upload_dir, filename)
         file.save(save_path)
 
-        is_valid, validation_msg = validate_file_content(save_path, filename)
-        if not is_valid:
-            os.remove(save_path)
+        probe = probe_file_content(save_path, filename)
+        if not probe['valid']:
+            shutil.rmtree(upload_dir, ignore_errors=True)
             if report_id:
                 update_report_status(report_id, "invalid_file")
-            return jsonify({'error': validation_msg}), 400
+            return jsonify({'error': probe['message']}), 400
+        write_upload_manifest(upload_dir)
 
         file_info = {
             'path': save_path,
+            'upload_dir': upload_dir,
             'filename': filename,
             'original_name': file.filename,
-            'file_size': file_size
+            'file_size': file_size,
+            'header_info': probe['header'],
+            'validation_fingerprint': probe['fingerprint']
         }
 
         task_info = start_complete_workflow(file_info, upload_id, clinic_id, patient_id,report_type, report_id)
@@ -84,6 +92,103 @@ def upload_medical_file():
         return jsonify({'error': 'Internal server error'}), 500
 
 
+@upload_bp.route('/cbct-series', methods=['POST'])
+def upload_dicom_series():
+    """Accept a whole DICOM series as one zip/tar archive and start a single workflow.
+
+    The streaming path is the raw archive as the request body (Content-Type
+    application/zip, application/x-tar, application/gzip, ...; form fields as
+    query arguments): entries are extracted into the upload directory as the
+    request is read. A multipart ``file`` part is also accepted, but werkzeug
+    spools the whole part to a temporary file before extraction starts.
+    """
+    upload_dir = None
+    try:
+        streamed = request.mimetype != 'multipart/form-data'
+        if not streamed:
+            if 'file' not in request.files or request.files['file'].filename == '':
+                return jsonify({'error': 'No file part in request'}), 400
+            stream = request.files['file'].stream
+            params = request.form
+        else:
+            stream = request.stream
+            params = request.args
+
+        upload_id = params.get('upload_id', str(uuid.uuid4()))
+        clinic_id = params.get('clinic_id')
+        patient_id = params.get('patient_id')
+        report_type = params.get('report_type', 'cbct')
+        report_id = params.get('report_id')
+
+        if report_id:
+            update_report_status(report_id, "file_uploaded")
+
+        max_size = current_app.config['MAX_FILE_SIZE']
+        if request.content_length and request.content_length > max_size:
+            if report_id:
+                update_report_status(report_id, "file_too_large")
+            return jsonify({'error': f'File too large. Maximum size: {max_size / (1024*1024):.1f} MB'}), 400
+
+        upload_dir = create_upload_dir(upload_id)
+        try:
+            entries, ingest_stats = extract_series_archive(stream, upload_dir, max_size)
+            ingest_stats['streamed'] = streamed
+        except ValueError as e:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            if report_id:
+                update_report_status(report_id, "invalid_file")
+            return jsonify({'error': str(e)}), 400
+        if not entries:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            if report_id:
+                update_report_status(report_id, "invalid_file")
+            return jsonify({'error': 'Archive contains no DICOM files',
+                            'files_skipped': ingest_stats['files_skipped']}), 400
+
+        # Validation probes one representative file; the loader checks every header later.
+        # Entries were kept for a DICM preamble or a DICOM extension, so probe as DICOM whatever the name
+        filename = min(entry['name'] for entry in entries)
+        save_path = os.path.join(upload_dir, filename)
+        probe = probe_file_content(save_path, filename, dicom=True)
+        if not probe['valid']:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            if report_id:
+                update_report_status(report_id, "invalid_file")
+            return jsonify({'error': probe['message']}), 400
+        manifest = write_upload_manifest(upload_dir, entries)
+
+        file_info = {
+            'path': save_path,
+            'upload_dir': upload_dir,
+            'filename': filename,
+            'original_name': filename,
+            'file_size': manifest['total_bytes'],
+            'file_count': len(entries),
+            'header_info': probe['header'],
+            'validation_fingerprint': probe['fingerprint']
+        }
+
+        task_info = start_complete_workflow(file_info, upload_id, clinic_id, patient_id, report_type, report_id)
+
+        return jsonify({
+            'job_id': task_info['workflow_id'],
+            'status': 'queued',
+            'upload_id': upload_id,
+            'report_id': report_id,
+            'message': 'DICOM series uploaded and processing workflow started',
+            'file_info': {
+                'file_count': len(entries),
+                'file_size': manifest['total_bytes']
+            },
+            'ingest': ingest_stats
+        }), 202
+    except Exception as e:
+        if upload_dir:
+            shutil.rmtree(upload_dir, ignore_errors=True)
+        logger.error(f"Error in /cbct-series: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
 @upload_bp.route('/pano-report-generated', methods=['POST'])
 def upload_pano_report():
     try:
@@ -227,21 +332,26 @@ def upload_3d_report():
                 update_report_status(report_id, "file_too_large")
             return jsonify({'error': f'File too large. Maximum size: {current_app.config["MAX_FILE_SIZE"] / (1024*1024):.1f} MB'}), 400
 
-        save_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"{upload_id}_{filename}")
+        upload_dir = create_upload_dir(upload_id)
+        save_path = os.path.join(upload_dir, filename)
         file.save(save_path)
 
-        is_valid, validation_msg = validate_file_content(save_path, filename)
-        if not is_valid:
-            os.remove(save_path)
+        probe = probe_file_content(save_path, filename)
+        if not probe['valid']:
+            shutil.rmtree(upload_dir, ignore_errors=True)
             if report_id:
                 update_report_status(report_id, "invalid_file")
-            return jsonify({'error': validation_msg}), 400
+            return jsonify({'error': probe['message']}), 400
+        write_upload_manifest(upload_dir)
 
         file_info = {
             'path': save_path,
+            'upload_dir': upload_dir,
             'filename': filename,
             'original_name': file.filename,
-            'file_size': file_size
+            'file_size': file_size,
+            'header_info': probe['header'],
+            'validation_fingerprint': probe['fingerprint']
         }
 
         task_info = start_complete_workflow(file_info, upload_id, clinic_id, patient_id, report_type, report_id)
@@ -270,6 +380,7 @@ def index():
         'status': 'running',
         'endpoints': {
             'cbct_upload': '/cbct-report-generated',
+            'cbct_series_upload': '/cbct-series',
                          'pano_upload': '/pano-report-generated',
             '3d_upload': '/3d-report',
             'status': '/job-status/<job_id>',
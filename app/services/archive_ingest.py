@@ -0,0 +1,274 @@
+import os
+import time
+import zlib
+import struct
+import tarfile
+import logging
+from werkzeug.utils import secure_filename
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_BYTES = 1024 * 1024
+DICOM_EXTENSIONS = {'.dcm', '.dicom', '.ima'}
+PREAMBLE_BYTES = 132  # 128-byte preamble + 'DICM'
+
+ZIP_LOCAL_HEADER = b'PK\x03\x04'
+ZIP_DATA_DESCRIPTOR = b'PK\x07\x08'
+ZIP_TRAILER_SIGNATURES = {b'PK\x01\x02', b'PK\x05\x06', b'PK\x06\x06'}
+ZIP_FLAG_ENCRYPTED = 0x01
+ZIP_FLAG_DATA_DESCRIPTOR = 0x08
+ZIP_FLAG_UTF8 = 0x800
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_LIMIT = 0xFFFFFFFF
+
+
+class _PushbackStream:
+    """Read-only stream wrapper that counts bytes and lets a parser hand bytes back."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = b''
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        if self.buffer:
+            if size is None or size < 0:
+                data, self.buffer = self.buffer + self._read_stream(-1), b''
+            else:
+                data, self.buffer = self.buffer[:size], self.buffer[size:]
+            return data
+        return self._read_stream(size)
+
+    def _read_stream(self, size):
+        data = self.stream.read(size) if size is not None and size >= 0 else self.stream.read()
+        self.bytes_read += len(data)
+        return data
+
+    def unread(self, data):
+        self.buffer = data + self.buffer
+
+
+def _read_exact(stream, size):
+    data = b''
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise ValueError("Unexpected end of archive stream")
+        data += chunk
+    return data
+
+
+def detect_archive_format(stream):
+    """Peek at the first bytes: 'zip' for a zip local header, 'tar' (possibly compressed) otherwise."""
+    head = stream.read(4)
+    stream.unread(head)
+    if not head:
+        raise ValueError("Empty archive")
+    return 'zip' if head == ZIP_LOCAL_HEADER else 'tar'
+
+
+def _zip64_sizes(extra, compressed_size, size):
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, length = struct.unpack('<HH', extra[offset:offset + 4])
+        if header_id == ZIP64_EXTRA_ID:
+            values = extra[offset + 4:offset + 4 + length]
+            fields = list(struct.unpack(f'<{len(values) // 8}Q', values[:len(values) // 8 * 8]))
+            if size == ZIP64_LIMIT and fields:
+                size = fields.pop(0)
+            if compressed_size == ZIP64_LIMIT and fields:
+                compressed_size = fields.pop(0)
+            return compressed_size, size, True
+        offset += 4 + length
+    return compressed_size, size, False
+
+
+def _iter_zip_entries(stream):
+    """Yield (name, chunks) from a zip read front to back through its local headers.
+
+    The central directory at the end is never needed, so nothing is buffered
+    or seeked. Each ``chunks`` iterator must be drained before the next entry.
+    """
+    while True:
+        signature = stream.read(4)
+        if not signature or signature in ZIP_TRAILER_SIGNATURES:
+            return
+        if signature != ZIP_LOCAL_HEADER:
+            raise ValueError("Corrupt zip stream")
+        (_, flags, method, _, _, crc, compressed_size, size,
+         name_length, extra_length) = struct.unpack('<HHHHHIIIHH', _read_exact(stream, 26))
+        raw_name = _read_exact(stream, name_length)
+        name = raw_name.decode('utf-8' if flags & ZIP_FLAG_UTF8 else 'cp437')
+        compressed_size, size, zip64 = _zip64_sizes(_read_exact(stream, extra_length), compressed_size, size)
+        if flags & ZIP_FLAG_ENCRYPTED:
+            raise ValueError(f"Encrypted zip entry: {name}")
+        has_descriptor = bool(flags & ZIP_FLAG_DATA_DESCRIPTOR)
+        if method not in (0, 8):
+            raise ValueError(f"Unsupported zip compression method {method} for {name}")
+        if method == 0 and has_descriptor:
+            # A stored entry of unknown length cannot be delimited without the central directory
+            raise ValueError(f"Stored zip entry without sizes cannot be streamed: {name}")
+
+        state = {'crc': 0}
+        chunks = _zip_entry_chunks(stream, method, compressed_size, has_descriptor, state)
+        yield name, chunks
+        for _ in chunks:
+            pass
+        if has_descriptor:
+            descriptor = _read_exact(stream, 4)
+            if descriptor == ZIP_DATA_DESCRIPTOR:
+                descriptor = _read_exact(stream, 4)
+            crc = struct.unpack('<I', descriptor)[0]
+            _read_exact(stream, 16 if zip64 else 8)
+        if state['crc'] != crc:
+            raise ValueError(f"CRC mismatch in zip entry {name}")
+
+
+def _zip_entry_chunks(stream, method, compressed_size, has_descriptor, state):
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if method == 8 else None
+    remaining = None if has_descriptor else compressed_size
+    while remaining is None or remaining > 0:
+        data = stream.read(READ_CHUNK_BYTES if remaining is None else min(READ_CHUNK_BYTES, remaining))
+        if not data:
+            raise ValueError("Unexpected end of archive stream")
+        if remaining is not None:
+            remaining -= len(data)
+        if decompressor is None:
+            state['crc'] = zlib.crc32(data, state['crc'])
+            yield data
+            continue
+        # Inflate at most one chunk at a time, so a small highly compressed read
+        # (a zip bomb) never expands in memory before the size budget sees it
+        piece = decompressor.decompress(data, READ_CHUNK_BYTES)
+        while True:
+            if piece:
+                state['crc'] = zlib.crc32(piece, state['crc'])
+                yield piece
+            if not decompressor.unconsumed_tail and len(piece) < READ_CHUNK_BYTES:
+                break
+            piece = decompressor.decompress(decompressor.unconsumed_tail, READ_CHUNK_BYTES)
+        if decompressor.eof:
+            # Bytes past the deflate stream belong to the descriptor or the next header
+            stream.unread(decompressor.unused_data)
+            remaining = 0
+
+
+def _iter_tar_entries(stream):
+    with tarfile.open(fileobj=stream, mode='r|*') as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            member_file = archive.extractfile(member)
+            yield member.name, iter(lambda: member_file.read(READ_CHUNK_BYTES), b'')
+
+
+def _target_name(name, used_names):
+    """Flatten an archive path to a unique, safe file name; None for entries to ignore."""
+    parts = [part for part in name.replace('\\', '/').split('/') if part]
+    if not parts or parts[-1].startswith('.') or '__MACOSX' in parts:
+        return None
+    target = secure_filename('_'.join(parts))
+    if not target:
+        return None
+    stem, ext = os.path.splitext(target)
+    counter = 1
+    while target in used_names:
+        target = f"{stem}_{counter}{ext}"
+        counter += 1
+    used_names.add(target)
+    return target
+
+
+def _drain(chunks, budget):
+    """Skip the rest of an entry; skipped bytes count against the budget too, so an
+    ignored entry cannot be inflated without limit."""
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size > budget:
+            raise ValueError("Archive contents exceed the maximum upload size")
+
+
+def _extract_entry(chunks, file_path, budget):
+    """Write one entry while checking its preamble; returns (size, dicm_preamble) or None if rejected."""
+    is_dicom_name = os.path.splitext(file_path)[1].lower() in DICOM_EXTENSIONS
+    head = b''
+    size = 0
+    out = None
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            if size > budget:
+                raise ValueError("Archive contents exceed the maximum upload size")
+            if out is None:
+                head += chunk
+                if len(head) < PREAMBLE_BYTES:
+                    continue
+                if head[128:132] != b'DICM' and not is_dicom_name:
+                    _drain(chunks, budget - size)
+                    return None
+                out = open(file_path, 'wb')
+                out.write(head)
+            else:
+                out.write(chunk)
+        if out is None:
+            # Shorter than a preamble: only a named .dcm file is kept (the probe will judge it)
+            if not is_dicom_name:
+                return None
+            out = open(file_path, 'wb')
+            out.write(head)
+        return size, head[128:132] == b'DICM'
+    except Exception:
+        if out is not None:
+            out.close()
+            out = None
+            os.remove(file_path)
+        raise
+    finally:
+        if out is not None:
+            out.close()
+
+
+def extract_series_archive(stream, upload_dir, max_bytes):
+    """Extract a zip or tar(.gz/.bz2/.xz) DICOM series from a stream into ``upload_dir``.
+
+    Entries are written as they arrive; nothing is buffered beyond one chunk.
+    Entries that are neither DICM-tagged nor named .dcm/.dicom/.ima are
+    dropped. Returns (manifest_entries, stats).
+    """
+    start = time.perf_counter()
+    stream = _PushbackStream(stream)
+    archive_format = detect_archive_format(stream)
+    entries_iter = _iter_zip_entries(stream) if archive_format == 'zip' else _iter_tar_entries(stream)
+    entries, used_names = [], set()
+    skipped = extracted_bytes = 0
+    try:
+        for name, chunks in entries_iter:
+            target = _target_name(name, used_names)
+            result = None
+            if target is not None:
+                result = _extract_entry(chunks, os.path.join(upload_dir, target), max_bytes - extracted_bytes)
+            if result is None:
+                skipped += 1
+                _drain(chunks, max_bytes - extracted_bytes)
+                continue
+            size, dicm_preamble = result
+            extracted_bytes += size
+            entries.append({'name': target, 'size': size, 'dicm_preamble': dicm_preamble})
+    except tarfile.TarError as e:
+        raise ValueError(f"Invalid tar archive: {e}")
+    except zlib.error as e:
+        raise ValueError(f"Invalid zip archive: {e}")
+    elapsed = time.perf_counter() - start
+    stats = {
+        'archive_format': archive_format,
+        'files_extracted': len(entries),
+        'files_skipped': skipped,
+        'archive_mb': round(stream.bytes_read / (1024 * 1024), 2),
+        'extracted_mb': round(extracted_bytes / (1024 * 1024), 2),
+        'seconds': round(elapsed, 3),
+        'mb_per_s': round(stream.bytes_read / (1024 * 1024) / elapsed, 1) if elapsed > 0 else None
+    }
+    logger.info(f"Extracted {len(entries)} files ({skipped} skipped) from {archive_format} stream "
+                f"in {elapsed:.2f}s")
+    return entries, stats
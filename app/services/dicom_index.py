@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+# Bump when the fields produced by read_dicom_header change so old rows are re-parsed
+HEADER_VERSION = 2
+# SQLite's default limit on bound parameters per statement is 999
+QUERY_BATCH = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dicom_headers (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    series_uid TEXT,
+    header TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dicom_headers_indexed_at ON dicom_headers (indexed_at);
+"""
+
+
+class DicomHeaderIndex:
+    """Worker-local SQLite cache of parsed DICOM headers, keyed by path + size + mtime.
+
+    A retried or reprocessed study finds every header here and skips parsing.
+    Files that are not readable DICOM are cached too (as a null header), so
+    they are not opened again either. Connections are opened per call, so one
+    index can be shared by threads and worker processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def lookup(self, file_paths):
+        """Split ``file_paths`` into (cached headers by path, paths that need parsing).
+
+        Cached values are header dicts, or None for files known not to be DICOM.
+        """
+        stats = {}
+        for file_path in file_paths:
+            try:
+                stat = os.stat(file_path)
+                stats[os.path.abspath(file_path)] = (file_path, stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                continue
+        cached = {}
+        keys = list(stats)
+        with closing(self._connect()) as conn:
+            for start in range(0, len(keys), QUERY_BATCH):
+                batch = keys[start:start + QUERY_BATCH]
+                rows = conn.execute(
+                    f"SELECT path, size, mtime_ns, header FROM dicom_headers "
+                    f"WHERE version = ? AND path IN ({','.join('?' * len(batch))})",
+                    [HEADER_VERSION] + batch
+                ).fetchall()
+                for key, size, mtime_ns, header in rows:
+                    file_path, current_size, current_mtime = stats[key]
+                    if size == current_size and mtime_ns == current_mtime:
+                        cached[file_path] = _load_header(header, file_path)
+        missing = [file_path for file_path, _, _ in stats.values() if file_path not in cached]
+        return cached, missing
+
+    def store(self, headers):
+        """Record parse results; ``headers`` maps file path to header dict (or None)."""
+        rows = []
+        now = time.time()
+        for file_path, header in headers.items():
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            rows.append((
+                os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, HEADER_VERSION,
+                header['series_uid'] if header else None, json.dumps(header), now
+            ))
+        if not rows:
+            return 0
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO dicom_headers "
+                "(path, size, mtime_ns, version, series_uid, header, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def prune(self, max_age):
+        """Drop rows indexed more than ``max_age`` seconds ago; returns the number removed."""
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute("DELETE FROM dicom_headers WHERE indexed_at < ?", (time.time() - max_age,))
+            return cursor.rowcount
+
+
+def _load_header(raw, file_path):
+    header = json.loads(raw) if raw else None
+    if header is not None:
+        # Rows are keyed by absolute path; hand back the path the caller asked about
+        header['path'] = file_path
+    return header
+
+
+def get_dicom_index(config):
+    """The configured index, or None when DICOM_INDEX_PATH is empty or the index cannot be opened."""
+    path = config.get('DICOM_INDEX_PATH')
+    if not path:
+        return None
+    try:
+        return DicomHeaderIndex(path)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"DICOM header index unavailable at {path}: {e}")
+        return None
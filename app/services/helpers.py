@@ -4,6 +4,10 @@ import json
 import nibabel as nib
 import pydicom
 from flask import current_app
+from app.services.workspace import cleanup_stale_workspaces
+from app.services.upload_store import cleanup_stale_uploads
+from app.services.volume_store import cleanup_stale_volumes
+from app.services.dicom_index import get_dicom_index
 
 
 def _get_app_and_supabase():
@@ -56,18 +60,31 @@ def validate_file_content(file_path, filename):
 
 
 def cleanup_old_files():
-    """Clean up old uploaded files from UPLOAD_FOLDER and PROCESSED_FOLDER based on age."""
+    """Clean up old uploaded files and abandoned slice workspaces based on age."""
     app, _ = _get_app_and_supabase()
     try:
         current_time = time.time()
         max_age = 24 * 60 * 60  # 24 hours
-        for folder in [app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER']]:
+        for folder in [app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER'],
+                       app.config['DECOMPRESS_CACHE_FOLDER']]:
             if os.path.exists(folder):
                 for filename in os.listdir(folder):
                     filepath = os.path.join(folder, filename)
                     if os.path.isfile(filepath):
                         if current_time - os.path.getmtime(filepath) > max_age:
                             os.remove(filepath)
+        # Workspaces of workflows that failed before aggregation are never torn down
+        cleanup_stale_workspaces(max_age)
+        cleanup_stale_uploads(max_age)
+        # A stored volume is the only rendered copy of an on-demand study: abandoned writes expire
+        # with the rest, finished volumes only once nobody rendered them for VOLUME_STORE_MAX_AGE_DAYS.
+        # Cached tiles can always be rendered again
+        cleanup_stale_volumes(max_age, pending_only=True)
+        cleanup_stale_volumes(float(app.config.get('VOLUME_STORE_MAX_AGE_DAYS', 30)) * 24 * 60 * 60)
+        cleanup_stale_volumes(max_age, app.config['RENDER_CACHE_FOLDER'])
+        index = get_dicom_index(app.config)
+        if index is not None:
+            index.prune(max_age)
     except Exception:
         # Best-effort cleanup; log will be handled in caller
         pass
@@ -86,10 +103,8 @@ def validate_configuration():
             missing_configs.append(config_key)
     if missing_configs:
         raise ValueError(f"Missing required configurations: {missing_configs}")
-    for directory in [app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER']]:
+    for directory in [app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER'], app.config['BASE_PATH']]:
         os.makedirs(directory, exist_ok=True)
-    for view in ['axial', 'coronal', 'sagittal']:
-        os.makedirs(os.path.join(app.config['BASE_PATH'], view), exist_ok=True)
 
 
 def update_report_status_completed(report_id, stage="completed"):
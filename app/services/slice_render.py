@@ -0,0 +1,180 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from flask import current_app
+from app.processors.encoders import get_encoder
+from app.processors.normalization import normalize_to_uint8
+from app.processors.windowing import LUT_DTYPES, build_window_lut, window_definitions
+from app.services.volume_store import META_FILENAME, ChunkedVolume, get_volume_path, touch_volume
+
+logger = logging.getLogger(__name__)
+
+# view name -> volume axis, matching MedicalImageProcessor.save_slices
+VIEW_AXES = {'axial': 2, 'coronal': 1, 'sagittal': 0}
+
+# Rendering a volume marks it as used at most this often
+ACCESS_TOUCH_INTERVAL_S = 3600
+
+
+class SliceRenderer:
+    """Render view/index/window requests from chunked volumes, with two tile cache levels.
+
+    Rendered tiles are kept in an in-process LRU (``max_entries``) and on disk
+    under ``cache_dir/{volume_id}/{version}/`` so a restarted worker or another
+    process on the same host can serve them without decoding chunks again.
+    """
+
+    def __init__(self, store_dir, cache_dir, encoder, max_entries=512, chunk_cache_bytes=256 * 1024 * 1024,
+                 max_volumes=4):
+        self.store_dir = store_dir
+        self.cache_dir = cache_dir
+        self.encoder = encoder
+        self.max_entries = max_entries
+        self.chunk_cache_bytes = chunk_cache_bytes
+        self.max_volumes = max_volumes
+        self._tiles = OrderedDict()
+        self._volumes = OrderedDict()
+        self._luts = OrderedDict()
+        self._touched = {}
+        self._lock = threading.Lock()
+
+    def get_volume(self, volume_id):
+        volume_dir = get_volume_path(volume_id, self.store_dir)
+        try:
+            meta_mtime = os.stat(os.path.join(volume_dir, META_FILENAME)).st_mtime_ns
+        except OSError:
+            raise FileNotFoundError(f"Volume not found: {volume_id}")
+        now = time.time()
+        with self._lock:
+            touch = now - self._touched.get(volume_id, 0) > ACCESS_TOUCH_INTERVAL_S
+            if touch:
+                self._touched[volume_id] = now
+        if touch:
+            # Keeps studies that are still being viewed out of VOLUME_STORE_MAX_AGE_DAYS cleanup
+            touch_volume(volume_dir)
+        with self._lock:
+            volume = self._volumes.get(volume_id)
+            # A reprocessed upload replaces the store; drop the stale reader with its chunk cache
+            if volume is not None and volume.meta_mtime == meta_mtime:
+                self._volumes.move_to_end(volume_id)
+                return volume
+        volume = ChunkedVolume(volume_dir, self.chunk_cache_bytes)
+        with self._lock:
+            self._volumes[volume_id] = volume
+            while len(self._volumes) > self.max_volumes:
+                self._volumes.popitem(last=False)
+        return volume
+
+    def render(self, volume_id, view, index, window=None):
+        """Return (image bytes, cache level) where cache level is 'memory', 'disk' or 'miss'.
+
+        ``window`` is (center, width) in real-world units (e.g. HU); None renders
+        the full intensity range exactly like the pre-rendered slices.
+        """
+        if view not in VIEW_AXES:
+            raise ValueError(f"Unknown view: {view}")
+        volume = self.get_volume(volume_id)
+        window_token = 'full' if window is None else f"{window[0]:g}_{window[1]:g}"
+        key = (volume_id, volume.version, view, index, window_token)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                return tile, 'memory'
+
+        tile_path = os.path.join(get_volume_path(volume_id, self.cache_dir), volume.version, view,
+                                 f"{index}_{window_token}{self.encoder.extension}")
+        cache_level = 'disk'
+        try:
+            with open(tile_path, 'rb') as f:
+                tile = f.read()
+        except OSError:
+            tile = self._render_tile(volume, VIEW_AXES[view], index, window)
+            self._write_tile(tile_path, tile)
+            cache_level = 'miss'
+
+        with self._lock:
+            self._tiles[key] = tile
+            while len(self._tiles) > self.max_entries:
+                self._tiles.popitem(last=False)
+        return tile, cache_level
+
+    def _render_tile(self, volume, axis, index, window):
+        plane = volume.get_plane(axis, index)
+        if window is not None and volume.dtype in LUT_DTYPES:
+            image = np.take(self._get_lut(volume, window), plane.view(np.uint16))
+        else:
+            low, high, invert = window_to_stored_range(volume.meta, window)
+            image = normalize_to_uint8(plane, low, high, invert=invert)
+        return self.encoder.encode(image.T if axis == 2 else image)
+
+    def _get_lut(self, volume, window):
+        key = (volume.volume_dir, volume.version, window)
+        with self._lock:
+            lut = self._luts.get(key)
+            if lut is not None:
+                self._luts.move_to_end(key)
+                return lut
+        meta = volume.meta
+        lut = build_window_lut(window[0], window[1], meta.get('slope', 1.0), meta.get('intercept', 0.0), volume.dtype)
+        with self._lock:
+            self._luts[key] = lut
+            while len(self._luts) > 32:
+                self._luts.popitem(last=False)
+        return lut
+
+    def _write_tile(self, tile_path, tile):
+        try:
+            os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+            tmp_path = f"{tile_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(tile)
+            os.replace(tmp_path, tile_path)
+        except OSError as e:
+            logger.warning(f"Could not cache rendered tile {tile_path}: {e}")
+
+
+def window_to_stored_range(meta, window=None):
+    """Translate a real-world (center, width) window into stored-value bounds.
+
+    Returns (low, high, invert); a negative rescale slope flips the mapping,
+    just like ``NIfTIProcessor._normalize_image``. Without a window the stored
+    NORMALIZE_PERCENTILES range is used, so renders match pre-rendered slices.
+    """
+    slope = meta.get('slope', 1.0) or 1.0
+    intercept = meta.get('intercept', 0.0)
+    if window is None:
+        # Stores written before the percentile range was recorded only have min/max
+        low, high = meta.get('intensity_range') or (meta['data_min'], meta['data_max'])
+        return low, high, slope < 0
+    center, width = window
+    width = max(float(width), 1e-6)
+    bounds = sorted(((center - width / 2 - intercept) / slope, (center + width / 2 - intercept) / slope))
+    return bounds[0], bounds[1], slope < 0
+
+
+def resolve_window_preset(name, config):
+    """(center, width) of a named preset, including WINDOW_PRESETS overrides from the config."""
+    definitions = window_definitions(config)
+    if name not in definitions:
+        raise ValueError(f"Unknown window preset: {name}")
+    return float(definitions[name]['center']), float(definitions[name]['width'])
+
+
+def get_slice_renderer():
+    """Per-app renderer, created on first use from the RENDER_* settings."""
+    renderer = current_app.extensions.get('slice_renderer')
+    if renderer is None:
+        config = current_app.config
+        renderer = SliceRenderer(
+            config['VOLUME_STORE_FOLDER'],
+            config['RENDER_CACHE_FOLDER'],
+            get_encoder(config.get('RENDER_ENCODER_PROFILE', 'fast-preview')),
+            max_entries=int(config.get('RENDER_CACHE_ENTRIES', 512)),
+            chunk_cache_bytes=int(config.get('RENDER_CHUNK_CACHE_MB', 256)) * 1024 * 1024
+        )
+        current_app.extensions['slice_renderer'] = renderer
+    return renderer
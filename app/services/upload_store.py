@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import shutil
+import logging
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+def get_upload_dir(upload_id):
+    """Return the per-upload directory under UPLOAD_FOLDER.
+
+    Each upload gets its own directory so the DICOM loader only ever sees the
+    files of one study, never the whole upload history.
+    """
+    safe_id = secure_filename(str(upload_id)) if upload_id else ''
+    if not safe_id:
+        raise ValueError("Upload id is required")
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], safe_id)
+
+
+def create_upload_dir(upload_id):
+    """Create an empty upload directory; files from an earlier attempt with the same id are dropped."""
+    upload_dir = get_upload_dir(upload_id)
+    if os.path.isdir(upload_dir):
+        shutil.rmtree(upload_dir, ignore_errors=True)
+    os.makedirs(upload_dir)
+    return upload_dir
+
+
+def _has_dicom_preamble(file_path):
+    try:
+        with open(file_path, 'rb') as f:
+            f.seek(128)
+            return f.read(4) == b'DICM'
+    except OSError:
+        return False
+
+
+def write_upload_manifest(upload_dir, files=None):
+    """Record every file of an upload (name, size, DICM preamble check) in manifest.json.
+
+    Called once at ingest time; later stages read the manifest instead of
+    listing and opening the files again. ``files`` takes entries already
+    collected while the upload was written; otherwise the directory is listed.
+    Returns the manifest.
+    """
+    if files is None:
+        files = []
+        for root, _, names in os.walk(upload_dir):
+            for name in sorted(names):
+                file_path = os.path.join(root, name)
+                relative_path = os.path.relpath(file_path, upload_dir)
+                if relative_path == MANIFEST_FILENAME or name.endswith('.tmp'):
+                    continue
+                files.append({
+                    'name': relative_path,
+                    'size': os.path.getsize(file_path),
+                    'dicm_preamble': _has_dicom_preamble(file_path)
+                })
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'created_at': time.time(),
+        'total_bytes': sum(entry['size'] for entry in files),
+        'files': files
+    }
+    manifest_path = os.path.join(upload_dir, MANIFEST_FILENAME)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+def read_upload_manifest(upload_dir):
+    """Load an upload's manifest, or None when it is missing or from another version."""
+    try:
+        with open(os.path.join(upload_dir, MANIFEST_FILENAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def cleanup_stale_uploads(max_age=24 * 60 * 60):
+    """Remove per-upload directories older than ``max_age`` seconds."""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if not os.path.isdir(upload_folder):
+        return 0
+    removed = 0
+    current_time = time.time()
+    for name in os.listdir(upload_folder):
+        upload_dir = os.path.join(upload_folder, name)
+        if not os.path.isdir(upload_dir):
+            continue
+        try:
+            if current_time - os.path.getmtime(upload_dir) > max_age:
+                shutil.rmtree(upload_dir, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed
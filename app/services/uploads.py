@@ -1,7 +1,11 @@
 import os
 import time
 import mimetypes
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from app.services.job_status import JobStatusManager
+from app.services.workspace import get_workspace_path
+from app.processors.atlas import ATLAS_INDEX_FILENAME
 from flask import current_app as app
 
 
@@ -18,9 +22,18 @@ class SupabaseUploadManager:
         except Exception:
             return None
 
-    def upload_all_slices(self, slice_counts, clinic_id, patient_id, report_type, report_id, celery_task=None):
+    def upload_all_slices(self, slice_counts, workspace_id, clinic_id, patient_id, report_type, report_id, celery_task=None,
+                          slice_format=None, tier=None):
+        """Upload rendered slices; ``tier`` selects a sub-tier such as 'preview' (stored under {report_id}/{tier}/)."""
         if not self.supabase:
             raise Exception("Supabase client not available")
+        workspace_dir = get_workspace_path(workspace_id)
+        if tier:
+            workspace_dir = os.path.join(workspace_dir, tier)
+        # Format written by the processor's encoder; JPEG for results that predate encoder profiles
+        slice_format = slice_format or {}
+        extension = slice_format.get('extension', '.jpg')
+        content_type = slice_format.get('content_type', 'image/jpeg')
         upload_results = {
             "axial": [], "coronal": [], "sagittal": [],
             "total_uploaded": 0, "failed_uploads": 0,
@@ -33,57 +46,168 @@ class SupabaseUploadManager:
         total_slices = sum(slice_counts.values())
         if total_slices == 0:
             raise Exception("No slices to upload")
+        jobs = []
+        for view in ['axial', 'coronal', 'sagittal']:
+            for i in range(slice_counts.get(view, 0)):
+                jobs.append(((view, i), (workspace_dir, view, i, clinic_id, patient_id, report_type, report_id,
+                                         extension, content_type, tier)))
         uploaded_count = 0
+        for (view, i), result in self._upload_concurrently(self._upload_single_slice, jobs):
+            if result["success"]:
+                upload_results[view].append({
+                    "slice_index": i,
+                    "storage_path": result["storage_path"],
+                    "public_url": result["public_url"]
+                })
+                upload_results["total_uploaded"] += 1
+            else:
+                upload_results["failed_uploads"] += 1
+                upload_results["upload_errors"].append({
+                    "view": view, "slice_index": i, "error": result.get("error")
+                })
+            uploaded_count += 1
+            if total_slices > 0 and uploaded_count % 10 == 0:
+                progress = 10 + int((uploaded_count / total_slices) * 85)
+                message = f'Uploading {view} slices... ({uploaded_count}/{total_slices})'
+                if self.task_id:
+                    JobStatusManager.create_or_update_status(self.task_id, 'processing', message, progress)
+                if celery_task:
+                    celery_task.update_state(state='PROGRESS', meta={'progress': progress, 'message': message})
+        return upload_results
+
+    def _upload_concurrently(self, upload, jobs):
+        """Yield (key, result) of ``upload(*args)`` for each (key, args) job, in job order.
+
+        Up to UPLOAD_WORKERS uploads are in flight at once, all through the one
+        shared storage client and its keep-alive connections. Results are
+        yielded in submission order, so per-file results and progress stay
+        ordered although uploads finish out of order; at most twice the
+        worker count of finished results are held back.
+        """
+        workers = max(1, int(app.config.get('UPLOAD_WORKERS', 1)))
+        if workers == 1 or len(jobs) < 2:
+            for key, args in jobs:
+                yield key, upload(*args)
+            return
+        flask_app = app._get_current_object()
+
+        def run(args):
+            # Worker threads need the app context for the storage client and config
+            with flask_app.app_context():
+                return upload(*args)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='storage-upload') as executor:
+            pending = deque()
+            for key, args in jobs:
+                pending.append((key, executor.submit(run, args)))
+                if len(pending) >= 2 * workers:
+                    key, future = pending.popleft()
+                    yield key, future.result()
+            while pending:
+                key, future = pending.popleft()
+                yield key, future.result()
+
+    def _upload_single_slice(self, workspace_dir, view, slice_index, clinic_id, patient_id, report_type, report_id,
+                             extension='.jpg', content_type='image/jpeg', tier=None):
+        slice_path = os.path.join(workspace_dir, view, f"{slice_index}{extension}")
+        report_path = f"{clinic_id}/{patient_id}/{report_type.lower()}/{report_id}"
+        if tier:
+            report_path = f"{report_path}/{tier}"
+        storage_path = f"{report_path}/{view}/{slice_index}{extension}"
+        return self._upload_file(slice_path, storage_path, content_type, label="Slice")
+
+    def upload_atlases(self, atlas_counts, workspace_id, clinic_id, patient_id, report_type, report_id, celery_task=None,
+                       slice_format=None, tier=None):
+        """Upload the atlas images of each view plus the atlas_index.json that locates every slice.
+
+        Storage path: reports/{clinic_id}/{patient_id}/{report_type}/{report_id}/{view}/atlas_<n><ext>;
+        ``tier`` selects a sub-tier such as 'preview', with its own index, as in upload_all_slices.
+        """
+        if not self.supabase:
+            raise Exception("Supabase client not available")
+        workspace_dir = get_workspace_path(workspace_id)
+        slice_format = slice_format or {}
+        extension = slice_format.get('extension', '.jpg')
+        content_type = slice_format.get('content_type', 'image/jpeg')
+        base_path = f"{clinic_id}/{patient_id}/{report_type.lower()}/{report_id}"
+        if tier:
+            workspace_dir = os.path.join(workspace_dir, tier)
+            base_path = f"{base_path}/{tier}"
+        upload_results = {
+            "axial": [], "coronal": [], "sagittal": [],
+            "atlas_index": None,
+            "total_uploaded": 0, "failed_uploads": 0,
+            "storage_structure": {
+                "clinic_id": clinic_id, "patient_id": patient_id,
+                "report_type": report_type.lower(), "report_id": report_id
+            },
+            "upload_errors": []
+        }
+        total_atlases = sum((atlas_counts or {}).values())
+        if total_atlases == 0:
+            raise Exception("No atlases to upload")
+
+        index_result = self._upload_file(os.path.join(workspace_dir, ATLAS_INDEX_FILENAME),
+                                         f"{base_path}/{ATLAS_INDEX_FILENAME}", 'application/json', label="Atlas index")
+        if not index_result["success"]:
+            raise Exception(f"Atlas index upload failed: {index_result.get('error')}")
+        upload_results["atlas_index"] = {
+            "storage_path": index_result["storage_path"], "public_url": index_result["public_url"]
+        }
+
+        jobs = []
         for view in ['axial', 'coronal', 'sagittal']:
-            slice_count = slice_counts.get(view, 0)
-            if slice_count == 0:
-                continue
-            for i in range(slice_count):
-                result = self._upload_single_slice(view, i, clinic_id, patient_id, report_type, report_id)
-                if result["success"]:
-                    upload_results[view].append({
-                        "slice_index": i,
-                        "storage_path": result["storage_path"],
-                        "public_url": result["public_url"]
-                    })
-                    upload_results["total_uploaded"] += 1
-                else:
-                    upload_results["failed_uploads"] += 1
-                    upload_results["upload_errors"].append({
-                        "view": view, "slice_index": i, "error": result.get("error")
-                    })
-                uploaded_count += 1
-                if total_slices > 0 and uploaded_count % 10 == 0:
-                    progress = 10 + int((uploaded_count / total_slices) * 85)
-                    message = f'Uploading {view} slices... ({uploaded_count}/{total_slices})'
-                    if self.task_id:
-                        JobStatusManager.create_or_update_status(self.task_id, 'processing', message, progress)
-                    if celery_task:
-                        celery_task.update_state(state='PROGRESS', meta={'progress': progress, 'message': message})
+            for i in range(atlas_counts.get(view, 0)):
+                atlas_name = f"atlas_{i}{extension}"
+                jobs.append(((view, i), (os.path.join(workspace_dir, view, atlas_name),
+                                         f"{base_path}/{view}/{atlas_name}", content_type, "Atlas")))
+        uploaded_count = 0
+        for (view, i), result in self._upload_concurrently(self._upload_file, jobs):
+            if result["success"]:
+                upload_results[view].append({
+                    "atlas_index": i,
+                    "storage_path": result["storage_path"],
+                    "public_url": result["public_url"]
+                })
+                upload_results["total_uploaded"] += 1
+            else:
+                upload_results["failed_uploads"] += 1
+                upload_results["upload_errors"].append({
+                    "view": view, "atlas_index": i, "error": result.get("error")
+                })
+            uploaded_count += 1
+            progress = 10 + int((uploaded_count / total_atlases) * 85)
+            message = f'Uploading {view} atlases... ({uploaded_count}/{total_atlases})'
+            if self.task_id:
+                JobStatusManager.create_or_update_status(self.task_id, 'processing', message, progress)
+            if celery_task:
+                celery_task.update_state(state='PROGRESS', meta={'progress': progress, 'message': message})
         return upload_results
 
-    def _upload_single_slice(self, view, slice_index, clinic_id, patient_id, report_type, report_id):
-        slice_path = os.path.join(app.config['BASE_PATH'], view, f"{slice_index}.jpg")
-        if not os.path.exists(slice_path):
-            return {"success": False, "error": "Slice file not found"}
+    def _upload_file(self, file_path, storage_path, content_type, label="File"):
+        if not os.path.exists(file_path):
+            return {"success": False, "error": f"{label} file not found"}
         try:
-            file_size = os.path.getsize(slice_path)
+            file_size = os.path.getsize(file_path)
             if file_size == 0:
-                return {"success": False, "error": "Empty slice file"}
+                return {"success": False, "error": f"Empty {label.lower()} file"}
             if file_size > self.max_file_size:
-                return {"success": False, "error": "Slice file too large"}
+                return {"success": False, "error": f"{label} file too large"}
         except Exception as e:
             return {"success": False, "error": f"File validation failed: {str(e)}"}
-        storage_path = f"{clinic_id}/{patient_id}/{report_type.lower()}/{report_id}/{view}/{slice_index}.jpg"
 
+        try:
+            # Read once; retries resend the same bytes
+            with open(file_path, 'rb') as f:
+                file_data = f.read()
+        except OSError as e:
+            return {"success": False, "error": f"{label} file could not be read: {str(e)}"}
         for attempt in range(self.max_retries):
             try:
-                with open(slice_path, 'rb') as f:
-                    file_data = f.read()
                 result = self.supabase.storage.from_("reports").upload(
                     path=storage_path,
                     file=file_data,
-                    file_options={"content-type": "image/jpeg", "cache-control": "3600", "upsert": "true"}
+                    file_options={"content-type": content_type, "cache-control": "3600", "upsert": "true"}
                 )
                 if result:
                     public_url = self.supabase.storage.from_("reports").get_public_url(storage_path)
@@ -95,6 +219,29 @@ class SupabaseUploadManager:
                     return {"success": False, "error": f"Upload failed after {self.max_retries} attempts: {str(e)}"}
         return {"success": False, "error": "Upload failed"}
 
+    def upload_panoramic(self, image_path, clinic_id, patient_id, report_type, report_id):
+        """Upload the panoramic reconstructed from the volume next to the report's slices."""
+        if not self.supabase:
+            raise Exception("Supabase client not available")
+        storage_path = f"{clinic_id}/{patient_id}/{report_type.lower()}/{report_id}/{os.path.basename(image_path)}"
+        return self._upload_file(image_path, storage_path, "image/png", label="Panoramic")
+
+    def upload_thumbnails(self, thumbnails, clinic_id, patient_id, report_type, report_id):
+        """Upload the study thumbnails under thumbnails/; returns the result per thumbnail name."""
+        if not self.supabase:
+            raise Exception("Supabase client not available")
+        base_path = f"{clinic_id}/{patient_id}/{report_type.lower()}/{report_id}/thumbnails"
+        return {
+            name: self._upload_file(path, f"{base_path}/{os.path.basename(path)}", "image/png", label="Thumbnail")
+            for name, path in thumbnails['files'].items()
+        }
+
+    def upload_mesh(self, mesh, clinic_id, patient_id, report_type, report_id):
+        """Upload the surface mesh written in 'mesh' output mode next to the report JSON."""
+        if not self.supabase:
+            raise Exception("Supabase client not available")
+        storage_path = f"{clinic_id}/{patient_id}/{report_type.lower()}/{report_id}/{os.path.basename(mesh['path'])}"
+        return self._upload_file(mesh['path'], storage_path, mesh['content_type'], label="Mesh")
 
     def upload_pano_image(self, image_path, clinic_id, patient_id, report_id, content_type=None, max_size_bytes=50 * 1024 * 1024):
         """Upload the original panoramic image to Supabase storage under the pano folder.
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import zlib
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from flask import current_app
+from werkzeug.utils import secure_filename
+from app.processors.normalization import array_order
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+META_FILENAME = 'volume.json'
+# Touched when a volume is rendered, so expiry follows use rather than the write time
+ACCESS_FILENAME = '.last_access'
+DEFAULT_CHUNK = 64
+# Integer dtypes stored as-is; anything else is kept as float32
+STORED_DTYPES = {np.dtype(np.int8), np.dtype(np.uint8), np.dtype(np.int16), np.dtype(np.uint16)}
+
+
+def get_volume_path(volume_id, root=None):
+    safe_id = secure_filename(str(volume_id)) if volume_id else ''
+    if not safe_id:
+        raise ValueError("Volume id is required")
+    return os.path.join(root or current_app.config['VOLUME_STORE_FOLDER'], safe_id)
+
+
+def _compress(data, codec, level):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return zlib.compress(data, level)
+
+
+def _decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Volume was stored with zstd but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _storage_dtype(data):
+    dtype = np.dtype(data.dtype)
+    if dtype in STORED_DTYPES:
+        return dtype
+    return np.dtype(np.float32)
+
+
+def write_chunked_volume(data, volume_id, slope=1.0, intercept=0.0, chunk=DEFAULT_CHUNK, level=3, root=None,
+                         intensity_range=None):
+    """Store a 3-D volume as independently compressed ``chunk``^3 blocks.
+
+    ``data`` holds stored values (ndarray, memmap or nibabel proxy); real-world
+    values are ``stored * slope + intercept``. Slabs of ``chunk`` planes along
+    the slowest-varying axis are read one at a time, so memory-mapped inputs are
+    never loaded whole. ``intensity_range`` is the (low, high) stored-value
+    range that unwindowed renders are scaled to; it defaults to the min/max.
+    Returns the volume metadata.
+    """
+    start_time = time.perf_counter()
+    shape = tuple(int(n) for n in data.shape)
+    if len(shape) != 3 or min(shape) <= 0:
+        raise ValueError(f"Only non-empty 3-D volumes can be stored, got shape {shape}")
+    dtype = _storage_dtype(data)
+    codec = 'zstd' if zstandard is not None else 'zlib'
+    volume_dir = get_volume_path(volume_id, root)
+    tmp_dir = f"{volume_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    slab_axis = 0 if array_order(data) == 'C' else 2
+    grid = [-(-n // chunk) for n in shape]
+    data_min = data_max = None
+    raw_bytes = stored_bytes = 0
+    for slab_start in range(0, shape[slab_axis], chunk):
+        index = [slice(None)] * 3
+        index[slab_axis] = slice(slab_start, slab_start + chunk)
+        slab = np.asarray(data[tuple(index)]).astype(dtype, copy=False)
+        slab_min, slab_max = slab.min(), slab.max()
+        data_min = slab_min if data_min is None else min(data_min, slab_min)
+        data_max = slab_max if data_max is None else max(data_max, slab_max)
+        ranges = [range(grid[a]) if a != slab_axis else [slab_start // chunk] for a in range(3)]
+        for ci in ranges[0]:
+            for cj in ranges[1]:
+                for ck in ranges[2]:
+                    key = (ci, cj, ck)
+                    block_index = tuple(
+                        slice(0, chunk) if a == slab_axis else slice(key[a] * chunk, (key[a] + 1) * chunk)
+                        for a in range(3)
+                    )
+                    block = np.ascontiguousarray(slab[block_index]).tobytes()
+                    encoded = _compress(block, codec, level)
+                    raw_bytes += len(block)
+                    stored_bytes += len(encoded)
+                    with open(os.path.join(tmp_dir, f"{ci}_{cj}_{ck}"), 'wb') as f:
+                        f.write(encoded)
+
+    meta = {
+        'shape': list(shape),
+        'dtype': dtype.str,
+        'chunk': chunk,
+        'codec': codec,
+        'slope': float(slope),
+        'intercept': float(intercept),
+        'data_min': float(data_min),
+        'data_max': float(data_max),
+        'intensity_range': [float(v) for v in (intensity_range or (data_min, data_max))],
+        'version': f"{time.time_ns():x}",
+        'raw_mb': round(raw_bytes / (1024 * 1024), 1),
+        'stored_mb': round(stored_bytes / (1024 * 1024), 1),
+        'write_time_s': round(time.perf_counter() - start_time, 3)
+    }
+    with open(os.path.join(tmp_dir, META_FILENAME), 'w') as f:
+        json.dump(meta, f)
+    shutil.rmtree(volume_dir, ignore_errors=True)
+    os.replace(tmp_dir, volume_dir)
+    logger.info(f"Stored volume {volume_id}: {meta['raw_mb']} MB -> {meta['stored_mb']} MB ({codec})")
+    return meta
+
+
+class ChunkedVolume:
+    """Read access to a volume written by ``write_chunked_volume``.
+
+    Decompressed chunks are kept in an LRU bounded by ``cache_bytes`` so
+    neighbouring planes of the same view reuse them.
+    """
+
+    def __init__(self, volume_dir, cache_bytes=256 * 1024 * 1024):
+        meta_path = os.path.join(volume_dir, META_FILENAME)
+        with open(meta_path) as f:
+            self.meta = json.load(f)
+        self.meta_mtime = os.stat(meta_path).st_mtime_ns
+        self.volume_dir = volume_dir
+        self.shape = tuple(self.meta['shape'])
+        self.dtype = np.dtype(self.meta['dtype'])
+        self.chunk = self.meta['chunk']
+        self.cache_bytes = cache_bytes
+        self._chunks = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self.meta['version']
+
+    def read_chunk(self, key):
+        with self._lock:
+            block = self._chunks.get(key)
+            if block is not None:
+                self._chunks.move_to_end(key)
+                return block
+        with open(os.path.join(self.volume_dir, '_'.join(str(k) for k in key)), 'rb') as f:
+            raw = _decompress(f.read(), self.meta['codec'])
+        block_shape = tuple(min(self.chunk, n - k * self.chunk) for n, k in zip(self.shape, key))
+        block = np.frombuffer(raw, dtype=self.dtype).reshape(block_shape)
+        with self._lock:
+            if key not in self._chunks:
+                self._chunks[key] = block
+                self._cached_bytes += block.nbytes
+            while self._cached_bytes > self.cache_bytes and len(self._chunks) > 1:
+                _, evicted = self._chunks.popitem(last=False)
+                self._cached_bytes -= evicted.nbytes
+        return block
+
+    def get_plane(self, axis, index):
+        """Return the stored-value plane ``index`` along ``axis`` (same layout as data[index, :, :] etc.)."""
+        if not 0 <= index < self.shape[axis]:
+            raise IndexError(f"Slice {index} out of range for axis {axis}")
+        other_axes = [a for a in range(3) if a != axis]
+        plane = np.empty([self.shape[a] for a in other_axes], dtype=self.dtype)
+        chunk_index, offset = divmod(index, self.chunk)
+        for u in range(-(-self.shape[other_axes[0]] // self.chunk)):
+            for v in range(-(-self.shape[other_axes[1]] // self.chunk)):
+                key = [0, 0, 0]
+                key[axis], key[other_axes[0]], key[other_axes[1]] = chunk_index, u, v
+                block = np.take(self.read_chunk(tuple(key)), offset, axis=axis)
+                plane[u * self.chunk:u * self.chunk + block.shape[0],
+                      v * self.chunk:v * self.chunk + block.shape[1]] = block
+        return plane
+
+
+def remove_volume(volume_id, root=None):
+    try:
+        volume_dir = get_volume_path(volume_id, root)
+    except ValueError:
+        return False
+    if not os.path.isdir(volume_dir):
+        return False
+    shutil.rmtree(volume_dir, ignore_errors=True)
+    return True
+
+
+def touch_volume(volume_dir):
+    """Record that a volume was just used (see ``cleanup_stale_volumes``)."""
+    try:
+        with open(os.path.join(volume_dir, ACCESS_FILENAME), 'a'):
+            pass
+        os.utime(os.path.join(volume_dir, ACCESS_FILENAME))
+    except OSError as e:
+        logger.warning(f"Could not record access to {volume_dir}: {e}")
+
+
+def _last_used(volume_dir):
+    try:
+        return max(os.path.getmtime(volume_dir), os.path.getmtime(os.path.join(volume_dir, ACCESS_FILENAME)))
+    except OSError:
+        return os.path.getmtime(volume_dir)
+
+
+def cleanup_stale_volumes(max_age=24 * 60 * 60, root=None, pending_only=False):
+    """Remove stored volumes (and leftover .tmp writes) not written or rendered for ``max_age`` seconds.
+
+    With ``pending_only`` only abandoned ``.tmp`` writes are removed.
+    """
+    root = root or current_app.config['VOLUME_STORE_FOLDER']
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    current_time = time.time()
+    for name in os.listdir(root):
+        volume_dir = os.path.join(root, name)
+        try:
+            if pending_only and not name.endswith('.tmp'):
+                continue
+            if os.path.isdir(volume_dir) and current_time - _last_used(volume_dir) > max_age:
+                shutil.rmtree(volume_dir, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed
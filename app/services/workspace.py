@@ -0,0 +1,66 @@
+import os
+import time
+import shutil
+import logging
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+logger = logging.getLogger(__name__)
+
+VIEWS = ('axial', 'coronal', 'sagittal')
+
+
+def get_workspace_path(workspace_id):
+    """Return the per-upload slice directory under BASE_PATH.
+
+    Every study gets its own directory (keyed by upload_id) so several jobs can
+    slice and upload concurrently on the same host without overwriting each other.
+    """
+    safe_id = secure_filename(str(workspace_id)) if workspace_id else ''
+    if not safe_id:
+        raise ValueError("Workspace id is required")
+    return os.path.join(current_app.config['BASE_PATH'], safe_id)
+
+
+def create_workspace(workspace_id):
+    """Create a clean workspace with one sub-directory per view and return its path."""
+    workspace_dir = get_workspace_path(workspace_id)
+    if os.path.isdir(workspace_dir):
+        # A retried job must not pick up slices left over from the previous attempt
+        shutil.rmtree(workspace_dir, ignore_errors=True)
+    for view in VIEWS:
+        os.makedirs(os.path.join(workspace_dir, view), exist_ok=True)
+    return workspace_dir
+
+
+def remove_workspace(workspace_id):
+    """Delete a workspace and everything in it. Returns True if something was removed."""
+    try:
+        workspace_dir = get_workspace_path(workspace_id)
+    except ValueError:
+        return False
+    if not os.path.isdir(workspace_dir):
+        return False
+    shutil.rmtree(workspace_dir, ignore_errors=True)
+    logger.info(f"Removed slice workspace {workspace_dir}")
+    return True
+
+
+def cleanup_stale_workspaces(max_age=24 * 60 * 60):
+    """Remove workspaces left behind by workflows that never reached aggregation."""
+    base_path = current_app.config['BASE_PATH']
+    if not os.path.isdir(base_path):
+        return 0
+    removed = 0
+    current_time = time.time()
+    for name in os.listdir(base_path):
+        workspace_dir = os.path.join(base_path, name)
+        if not os.path.isdir(workspace_dir):
+            continue
+        try:
+            if current_time - os.path.getmtime(workspace_dir) > max_age:
+                shutil.rmtree(workspace_dir, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    return removed
@@ -1,7 +1,24 @@
 from app.celery_app import celery
 from app.services.job_status import JobStatusManager
 from app.services.supabase_manager import update_report_status
+from app.services.workspace import remove_workspace
 from app import create_app
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _find_workspace_id(results_list):
+    """Locate the upload_id the slice workspace was keyed by in the group results."""
+    for result in results_list:
+        if not isinstance(result, dict):
+            continue
+        processing_result = result.get('processing_result')
+        if isinstance(processing_result, dict) and processing_result.get('upload_id'):
+            return processing_result['upload_id']
+        if result.get('upload_id'):
+            return result['upload_id']
+    return None
 
 
 @celery.task(bind=True, name='aggregate_medical_results')
@@ -48,6 +65,14 @@ def aggregate_medical_results_task(self, results_list):
                 'workflow_completed': True
             }
 
+            # Slices are in storage now, so the local workspace can go
+            workspace_id = _find_workspace_id(results_list)
+            if workspace_id:
+                try:
+                    remove_workspace(workspace_id)
+                except Exception as e:
+                    logger.warning(f"Failed to remove slice workspace {workspace_id}: {e}")
+
             # Update status to completed
             if report_id:
                 update_report_status(report_id, "completed")
@@ -3,12 +3,94 @@ from app.services.job_status import JobStatusManager
 from app.services.supabase_manager import update_report_status
 from app.processors.nifti import NIfTIProcessor
 from app.processors.dicom import DICOMProcessor
+from app.processors.encoders import get_encoder_for_report
+from app.processors.windowing import get_window_presets
 import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
 from app import create_app
 
+logger = logging.getLogger(__name__)
+
+
+class _PreviewPublisher:
+    """Preview callback that uploads the preview tier on a background thread.
+
+    Full-resolution slicing continues while the upload runs; ``wait`` joins it
+    and leaves the upload outcome and timing in ``preview['upload']``.
+    """
+
+    def __init__(self, task_id, upload_id, clinic_id, patient_id, report_type, report_id):
+        self.task_id = task_id
+        self.upload_id = upload_id
+        self.clinic_id = clinic_id
+        self.patient_id = patient_id
+        self.report_type = report_type
+        self.report_id = report_id
+        self.executor = None
+
+    def __call__(self, preview):
+        JobStatusManager.create_or_update_status(
+            self.task_id, 'processing', 'Preview slices ready, rendering full resolution...', 30,
+            {'preview_ready': True, 'preview': preview}
+        )
+        if not (self.clinic_id and self.patient_id and self.report_type and self.report_id):
+            return
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='preview-upload')
+        self.executor.submit(self._upload, current_app._get_current_object(), preview)
+
+    def wait(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def _upload(self, flask_app, preview):
+        from app.services.uploads import SupabaseUploadManager
+        start = time.perf_counter()
+        with flask_app.app_context():
+            try:
+                # No task_id: the uploader's own progress would overwrite the processing progress
+                if preview.get('atlas_counts'):
+                    upload_result = SupabaseUploadManager().upload_atlases(
+                        preview['atlas_counts'], self.upload_id, self.clinic_id, self.patient_id, self.report_type,
+                        self.report_id, slice_format=preview.get('slice_format'), tier='preview'
+                    )
+                else:
+                    upload_result = SupabaseUploadManager().upload_all_slices(
+                        preview['slice_counts'], self.upload_id, self.clinic_id, self.patient_id, self.report_type,
+                        self.report_id, slice_format=preview.get('slice_format'), tier='preview'
+                    )
+            except Exception as e:
+                logger.warning(f"Preview upload failed: {e}")
+                preview['upload'] = {'error': str(e), 'seconds': round(time.perf_counter() - start, 3)}
+                return
+            preview['upload'] = {
+                'total_uploaded': upload_result.get('total_uploaded', 0),
+                'failed_uploads': upload_result.get('failed_uploads', 0),
+                'seconds': round(time.perf_counter() - start, 3),
+                'completed_at': time.time()
+            }
+            update_report_status(self.report_id, "preview_uploaded")
+            logger.info(f"Uploaded preview tier in {preview['upload']['seconds']}s")
+
+
+def _analyze_panoramic(panoramic):
+    """Run the pano analysis on the reconstructed panoramic, so CBCT studies need no separate pano upload."""
+    if not panoramic:
+        return
+    from app.tasks.ai import analyze_pano_image
+    try:
+        with open(panoramic['path'], 'rb') as f:
+            panoramic['analysis'] = analyze_pano_image(f.read(), os.path.basename(panoramic['path']))
+    except Exception as e:
+        logger.warning(f"Panoramic analysis failed: {e}")
+        panoramic['analysis'] = None
+
 
 @celery.task(bind=True, name='process_medical_file')
-def process_medical_file_task(self, validation_result, upload_id):
+def process_medical_file_task(self, validation_result, upload_id, report_type=None, clinic_id=None, patient_id=None):
     task_id = self.request.id
     try:
         app = create_app()
@@ -24,14 +106,32 @@ def process_medical_file_task(self, validation_result, upload_id):
             
             JobStatusManager.create_or_update_status(task_id, 'processing', 'Processing medical file...', 20)
             
-            if filename.lower().endswith(('.nii', '.nii.gz')):
-                processor = NIfTIProcessor(task_id=task_id)
-                processing_result = processor.process_file(file_path, upload_id, self)
-            else:
-                processor = DICOMProcessor(task_id=task_id)
-                upload_dir = os.path.dirname(file_path)
-                processing_result = processor.process_directory(upload_dir, upload_id, self)
+            encoder = get_encoder_for_report(report_type, app.config)
+            on_preview = _PreviewPublisher(task_id, upload_id, clinic_id, patient_id, report_type, report_id)
+            processor_options = {
+                'task_id': task_id,
+                'encoder': encoder,
+                'preview_callback': on_preview,
+                'window_presets': get_window_presets(report_type, app.config),
+                'panoramic': (report_type or '').lower() in (app.config.get('PANORAMIC_REPORT_TYPES') or [])
+            }
+            if (report_type or '').lower() in (app.config.get('MESH_REPORT_TYPES') or []):
+                processor_options['output_mode'] = 'mesh'
+            try:
+                if filename.lower().endswith(('.nii', '.nii.gz')):
+                    processor = NIfTIProcessor(**processor_options)
+                    processing_result = processor.process_file(file_path, upload_id, self)
+                else:
+                    processor = DICOMProcessor(**processor_options)
+                    # Jobs queued before per-upload directories existed still point into UPLOAD_FOLDER
+                    upload_dir = file_info.get('upload_dir') or os.path.dirname(file_path)
+                    processing_result = processor.process_directory(upload_dir, upload_id, self)
+            finally:
+                # The preview upload reads from the workspace; let it finish before the job moves on
+                on_preview.wait()
             
+            _analyze_panoramic(processing_result.get('panoramic'))
+
             # Update status to processed
             if report_id:
                 update_report_status(report_id, "processed")
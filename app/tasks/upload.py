@@ -5,6 +5,7 @@ import datetime
 from uuid import uuid4
 from app.celery_app import celery
 from app.services.job_status import JobStatusManager
+from app.services.workspace import get_workspace_path
 from app.services.supabase_manager import update_report_status
 from app import create_app
 from flask import current_app as app
@@ -108,9 +109,10 @@ class SupabaseUploadManager:
         
         return {"success": False, "error": "Upload failed"}
 
-    def upload_all_slices(self, slice_counts, clinic_id, patient_id, report_type, report_id, celery_task=None):
+    def upload_all_slices(self, slice_counts, workspace_id, clinic_id, patient_id, report_type, report_id, celery_task=None):
         if not self.supabase:
             raise Exception("Supabase client not available")
+        workspace_dir = get_workspace_path(workspace_id)
         upload_results = {
             "axial": [], "coronal": [], "sagittal": [],
             "total_uploaded": 0, "failed_uploads": 0,
@@ -129,7 +131,7 @@ class SupabaseUploadManager:
             if slice_count == 0:
                 continue
             for i in range(slice_count):
-                result = self._upload_single_slice(view, i, clinic_id, patient_id, report_type, report_id)
+                result = self._upload_single_slice(workspace_dir, view, i, clinic_id, patient_id, report_type, report_id)
                 if result["success"]:
                     upload_results[view].append({
                         "slice_index": i,
@@ -152,8 +154,8 @@ class SupabaseUploadManager:
                         celery_task.update_state(state='PROGRESS', meta={'progress': progress, 'message': message})
         return upload_results
 
-    def _upload_single_slice(self, view, slice_index, clinic_id, patient_id, report_type, report_id):
-        slice_path = os.path.join(app.config['BASE_PATH'], view, f"{slice_index}.jpg")
+    def _upload_single_slice(self, workspace_dir, view, slice_index, clinic_id, patient_id, report_type, report_id):
+        slice_path = os.path.join(workspace_dir, view, f"{slice_index}.jpg")
         if not os.path.exists(slice_path):
             return {"success": False, "error": "Slice file not found"}
         try:
@@ -184,7 +186,7 @@ class SupabaseUploadManager:
                     return {"success": False, "error": f"Upload failed after {self.max_retries} attempts: {str(e)}"}
         return {"success": False, "error": "Upload failed"}
 
-    def upload_complete_report(self, slice_counts, report_data, clinic_id, patient_id, report_type, report_id, celery_task=None):
+    def upload_complete_report(self, slice_counts, workspace_id, report_data, clinic_id, patient_id, report_type, report_id, celery_task=None):
         """
         Upload both slices and report JSON in one method
         
@@ -194,7 +196,7 @@ class SupabaseUploadManager:
         try:
             # Upload slices first
             slice_results = self.upload_all_slices(
-                slice_counts, clinic_id, patient_id, report_type, report_id, celery_task
+                slice_counts, workspace_id, clinic_id, patient_id, report_type, report_id, celery_task
             )
             
             # Upload report JSON
@@ -241,10 +243,12 @@ def upload_medical_slices_task(self, processing_result, clinic_id, patient_id, r
             try:
                 from app.services.uploads import SupabaseUploadManager
                 
-                # Get slice counts from processing result
+                # Get slice counts and encoded format from processing result
                 slice_counts = processing_result.get('processing_result', {}).get('slice_counts', {})
+                slice_format = processing_result.get('processing_result', {}).get('slice_format')
+                output_mode = processing_result.get('processing_result', {}).get('output_mode') or 'slices'
                 
-                if not slice_counts or sum(slice_counts.values()) == 0:
+                if output_mode != 'mesh' and (not slice_counts or sum(slice_counts.values()) == 0):
                     logger.warning("No slices to upload")
                     return {
                         'status': 'skipped',
@@ -253,14 +257,73 @@ def upload_medical_slices_task(self, processing_result, clinic_id, patient_id, r
                     }
                 
                 # Create upload manager and upload all slices
+                # Slices live in the per-upload workspace written by process_medical_file
+                workspace_id = processing_result.get('upload_id')
                 upload_manager = SupabaseUploadManager(task_id=task_id)
-                upload_result = upload_manager.upload_all_slices(
-                    slice_counts, clinic_id, patient_id, report_type, report_id, self
-                )
+                if output_mode == 'on_demand':
+                    # Nothing is pre-rendered; the viewer requests slices from the render endpoint
+                    upload_result = {
+                        "total_uploaded": 0, "failed_uploads": 0,
+                        "render_url": f"/render/{workspace_id}",
+                        "slice_counts": slice_counts
+                    }
+                elif output_mode == 'mesh':
+                    # One surface mesh replaces the slices
+                    mesh = processing_result.get('processing_result', {}).get('mesh') or {}
+                    mesh_result = upload_manager.upload_mesh(mesh, clinic_id, patient_id, report_type, report_id)
+                    upload_result = {
+                        "total_uploaded": 1 if mesh_result.get('success') else 0,
+                        "failed_uploads": 0 if mesh_result.get('success') else 1,
+                        "mesh": mesh_result
+                    }
+                elif output_mode == 'atlas':
+                    atlas_counts = processing_result.get('processing_result', {}).get('atlas_counts', {})
+                    upload_result = upload_manager.upload_atlases(
+                        atlas_counts, workspace_id, clinic_id, patient_id, report_type, report_id, self,
+                        slice_format=slice_format
+                    )
+                else:
+                    upload_result = upload_manager.upload_all_slices(
+                        slice_counts, workspace_id, clinic_id, patient_id, report_type, report_id, self,
+                        slice_format=slice_format
+                    )
+                upload_result['output_mode'] = output_mode
+
+                # Window preset tiers (bone, soft tissue, ...) use the same numbering as the main slices
+                window_counts = processing_result.get('processing_result', {}).get('window_counts') or {}
+                window_atlas_counts = processing_result.get('processing_result', {}).get('window_atlas_counts') or {}
+                if window_counts:
+                    upload_result['windows'] = {}
+                    for preset, preset_counts in window_counts.items():
+                        if preset in window_atlas_counts:
+                            preset_result = upload_manager.upload_atlases(
+                                window_atlas_counts[preset], workspace_id, clinic_id, patient_id, report_type,
+                                report_id, slice_format=slice_format, tier=f"windows/{preset}"
+                            )
+                        else:
+                            preset_result = upload_manager.upload_all_slices(
+                                preset_counts, workspace_id, clinic_id, patient_id, report_type, report_id,
+                                slice_format=slice_format, tier=f"windows/{preset}"
+                            )
+                        upload_result['windows'][preset] = {
+                            'total_uploaded': preset_result.get('total_uploaded', 0),
+                            'failed_uploads': preset_result.get('failed_uploads', 0)
+                        }
+
+                thumbnails = processing_result.get('processing_result', {}).get('thumbnails')
+                if thumbnails:
+                    upload_result['thumbnails'] = upload_manager.upload_thumbnails(
+                        thumbnails, clinic_id, patient_id, report_type, report_id
+                    )
+                panoramic = processing_result.get('processing_result', {}).get('panoramic')
+                if panoramic:
+                    upload_result['panoramic'] = upload_manager.upload_panoramic(
+                        panoramic['path'], clinic_id, patient_id, report_type, report_id
+                    )
                 
                 if upload_result.get('total_uploaded', 0) > 0:
-                    logger.info(f"Successfully uploaded {upload_result['total_uploaded']} slices")
-                else:
+                    logger.info(f"Successfully uploaded {upload_result['total_uploaded']} files ({output_mode} mode)")
+                elif output_mode != 'on_demand':
                     logger.warning("No slices were uploaded successfully")
                     
             except ImportError as e:
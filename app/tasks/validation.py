@@ -1,7 +1,7 @@
 from app.celery_app import celery
 from app.services.job_status import JobStatusManager
 from app.services.supabase_manager import update_report_status
-from app.utils.validators import validate_file_content
+from app.utils.validators import validate_file_content, file_fingerprint
 import os
 import io
 
@@ -18,7 +18,12 @@ def validate_medical_file_task(self, file_info, report_id=None):
             update_report_status(report_id, "validation_started")
         
         JobStatusManager.create_or_update_status(task_id, 'processing', 'Validating file...', 10)
-        is_valid, validation_msg = validate_file_content(file_path, filename)
+        # The upload route already probed this exact file; skip unless it changed since
+        fingerprint = file_info.get('validation_fingerprint')
+        if fingerprint and os.path.exists(file_path) and fingerprint == file_fingerprint(file_path):
+            is_valid, validation_msg = True, "File validated at upload"
+        else:
+            is_valid, validation_msg = validate_file_content(file_path, filename)
         
         if not is_valid:
             if report_id:
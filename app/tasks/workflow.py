@@ -17,7 +17,7 @@ def start_complete_workflow(file_info, upload_id, clinic_id=None, patient_id=Non
                 celery.signature('validate_medical_file', args=[file_info, report_id]),
                 group(
                     chain(
-                        celery.signature('process_medical_file', args=[upload_id]),
+                        celery.signature('process_medical_file', args=[upload_id, report_type, clinic_id, patient_id]),
                         celery.signature('upload_medical_slices', args=[clinic_id, patient_id, report_type, report_id])
                     ),
                     chain(
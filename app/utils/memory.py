@@ -0,0 +1,54 @@
+import sys
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+@contextmanager
+def track_peak_memory(trace=False):
+    """Measure peak memory around the block.
+
+    Yields a dict filled in on exit: ``peak_rss_mb`` is the process peak RSS
+    (including memory-mapped pages that were read) and ``peak_memory_mb`` how
+    far the block raised it. Reading the peak RSS costs two syscalls, so the
+    block runs at full speed; it is a process-wide high-water mark, so a block
+    that stays below an earlier peak reports 0.
+
+    ``trace=True`` reports the tracemalloc peak above the starting allocation
+    as ``peak_memory_mb`` instead. That isolates the block from earlier peaks
+    but slows every Python allocation inside it, so it is meant for benchmarks
+    and debugging (MEMORY_TRACE_ENABLED), not production jobs.
+    """
+    stats = {'peak_memory_mb': None, 'peak_rss_mb': None}
+    rss_before = peak_rss_mb()
+    started = trace and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    if trace:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    try:
+        yield stats
+    finally:
+        rss_after = peak_rss_mb()
+        if rss_after is not None:
+            stats['peak_rss_mb'] = round(rss_after, 1)
+            stats['peak_memory_mb'] = round(rss_after - rss_before, 1)
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            stats['peak_memory_mb'] = round(max(0, peak - baseline) / (1024 * 1024), 1)
+            if started:
+                tracemalloc.stop()
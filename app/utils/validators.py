@@ -1,8 +1,17 @@
 import os
+import hashlib
 import nibabel as nib
+import numpy as np
 import pydicom
 from flask import current_app
 
+# Bump when the probe rules change so older fingerprints stop matching
+VALIDATOR_VERSION = 1
+
+# (7FE0,0010) as written by little and big endian transfer syntaxes
+PIXEL_DATA_TAGS = {b'\xe0\x7f\x10\x00': 'little', b'\x7f\xe0\x00\x10': 'big'}
+UNDEFINED_LENGTH = 0xFFFFFFFF
+
 
 def allowed_file(filename):
     if not filename or '.' not in filename:
@@ -13,17 +22,120 @@ def allowed_file(filename):
     return extension in current_app.config['ALLOWED_EXTENSIONS']
 
 
-def validate_file_content(file_path, filename):
+def file_fingerprint(file_path):
+    """Cheap identity of a file on disk (path, size, mtime) plus the validator version."""
+    stat = os.stat(file_path)
+    key = f"{VALIDATOR_VERSION}:{os.path.abspath(file_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def probe_file_content(file_path, filename, dicom=False):
+    """Validate a medical file from its headers only, without decoding voxel data.
+
+    The probe is chosen by extension; ``dicom`` probes the file as DICOM
+    whatever its name. Returns a dict with ``valid``, ``message``, ``header``
+    (probe details) and a ``fingerprint`` that later stages can compare to
+    skip re-validation.
+    """
+    result = {'valid': False, 'message': '', 'header': None, 'fingerprint': None}
     try:
-        if filename.lower().endswith(('.nii', '.nii.gz')):
-            img = nib.load(file_path)
-            data = img.get_fdata()
-            return (data.size > 0, "Valid NIfTI file") if data.size > 0 else (False, "Empty NIfTI file")
-        elif filename.lower().endswith(('.dcm', '.dicom', '.ima')):
-            ds = pydicom.dcmread(file_path)
-            return (True, "Valid DICOM file") if hasattr(ds, 'pixel_array') else (False, "DICOM has no pixel data")
-        return True, "File validation passed"
+        lower_name = filename.lower()
+        if dicom:
+            result['valid'], result['message'], result['header'] = _probe_dicom(file_path)
+        elif lower_name.endswith(('.nii', '.nii.gz')):
+            result['valid'], result['message'], result['header'] = _probe_nifti(file_path)
+        elif lower_name.endswith(('.dcm', '.dicom', '.ima')):
+            result['valid'], result['message'], result['header'] = _probe_dicom(file_path)
+        else:
+            result['valid'], result['message'] = True, "File validation passed"
+        if result['valid']:
+            result['fingerprint'] = file_fingerprint(file_path)
     except Exception as e:
-        return False, f"File validation failed: {str(e)}"
+        result['valid'], result['message'] = False, f"File validation failed: {str(e)}"
+    return result
+
+
+def validate_file_content(file_path, filename):
+    probe = probe_file_content(file_path, filename)
+    return probe['valid'], probe['message']
+
+
+def _probe_nifti(file_path):
+    img = nib.load(file_path)  # reads the header; voxels stay behind the array proxy
+    shape = tuple(int(d) for d in img.shape)
+    if len(shape) < 3 or min(shape) <= 0:
+        return False, "Empty NIfTI file", None
+    dtype = img.get_data_dtype()
+    data_offset = int(getattr(img.dataobj, 'offset', img.header.get_data_offset()))
+    expected_bytes = data_offset + int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+    header = {'shape': list(shape), 'dtype': str(dtype), 'vox_offset': data_offset}
+
+    if file_path.lower().endswith('.gz'):
+        # The gzip trailer stores the uncompressed size modulo 2**32
+        with open(file_path, 'rb') as f:
+            if f.read(2) != b'\x1f\x8b':
+                return False, "Invalid gzip stream", header
+            f.seek(-4, os.SEEK_END)
+            available_bytes = int.from_bytes(f.read(4), 'little')
+        size_known = expected_bytes < 2 ** 32
+    else:
+        available_bytes = os.path.getsize(file_path)
+        size_known = True
+    if size_known and available_bytes < expected_bytes:
+        return False, f"Truncated NIfTI file: expected {expected_bytes} bytes, found {available_bytes}", header
+    return True, "Valid NIfTI file", header
+
+
+def read_dicom_header_and_pixel_location(f, **dcmread_kwargs):
+    """Read a dataset up to Pixel Data and locate the pixel value bytes.
+
+    Returns (dataset, value_offset, value_length) with value_offset None when the
+    file has no Pixel Data element; value_length is UNDEFINED_LENGTH for
+    encapsulated (compressed) data. Both little and big endian encodings are
+    recognized.
+    """
+    ds = pydicom.dcmread(f, stop_before_pixels=True, **dcmread_kwargs)
+    pixel_offset = f.tell()  # reader rewinds to the Pixel Data tag
+    element_header = f.read(12)
+    byte_order = PIXEL_DATA_TAGS.get(element_header[:4])
+    if byte_order is None:
+        return ds, None, None
+    if element_header[4:6] in (b'OB', b'OW', b'OF', b'UN'):
+        return ds, pixel_offset + 12, int.from_bytes(element_header[8:12], byte_order)
+    return ds, pixel_offset + 8, int.from_bytes(element_header[4:8], byte_order)
+
+
+def _probe_dicom(file_path):
+    with open(file_path, 'rb') as f:
+        ds, value_offset, pixel_length = read_dicom_header_and_pixel_location(f)
+    if value_offset is None:
+        return False, "DICOM has no pixel data", None
+
+    file_meta = getattr(ds, 'file_meta', None)
+    transfer_syntax = getattr(file_meta, 'TransferSyntaxUID', None) if file_meta is not None else None
+    if transfer_syntax is not None and not transfer_syntax.is_transfer_syntax:
+        return False, f"Unknown transfer syntax: {transfer_syntax}", None
 
+    rows = int(getattr(ds, 'Rows', 0) or 0)
+    columns = int(getattr(ds, 'Columns', 0) or 0)
+    if rows <= 0 or columns <= 0:
+        return False, "DICOM has no image dimensions", None
+    header = {
+        'rows': rows,
+        'columns': columns,
+        'transfer_syntax': str(transfer_syntax) if transfer_syntax is not None else None,
+        'pixel_length': None if pixel_length == UNDEFINED_LENGTH else pixel_length
+    }
 
+    if pixel_length == UNDEFINED_LENGTH:
+        # Encapsulated (compressed) frames; only the decoder can size-check them
+        return True, "Valid DICOM file", header
+    frames = int(getattr(ds, 'NumberOfFrames', 1) or 1)
+    samples = int(getattr(ds, 'SamplesPerPixel', 1) or 1)
+    bits_allocated = int(getattr(ds, 'BitsAllocated', 16) or 16)
+    expected_length = rows * columns * frames * samples * bits_allocated // 8
+    if pixel_length < expected_length:
+        return False, f"DICOM pixel data too short: expected {expected_length} bytes, found {pixel_length}", header
+    if value_offset + pixel_length > os.path.getsize(file_path):
+        return False, "Truncated DICOM file", header
+    return True, "Valid DICOM file", header
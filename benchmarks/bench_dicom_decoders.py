@@ -0,0 +1,139 @@
+"""Decode throughput per transfer syntax and per installed pixel data handler.
+
+For each syntax a synthetic series is written (native, RLE, JPEG-LS, JPEG
+Lossless, JPEG 2000). Syntaxes without an installed encoder are skipped;
+JPEG 2000 falls back to Pillow's codec. Every handler the registry considers
+for that syntax is timed on its own, then the full parallel loader
+(_create_volume) is timed with the default preference order. Decoded values
+are checked against the source pixels.
+
+Usage: python -m benchmarks.bench_dicom_decoders [--files 100] [--size 512] [--workers 4]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import numpy as np
+import pydicom
+from PIL import Image
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.encaps import encapsulate
+from pydicom.uid import (ExplicitVRLittleEndian, JPEG2000Lossless, JPEGLosslessSV1, JPEGLSLossless,
+                         RLELossless, generate_uid)
+from flask import Flask
+from app.processors.decoders import TRANSFER_SYNTAX_NAMES, DecoderRegistry
+from app.processors.dicom import DICOMProcessor
+
+CT_IMAGE_STORAGE = '1.2.840.10008.5.1.4.1.1.2'
+SYNTAXES = (ExplicitVRLittleEndian, RLELossless, JPEGLSLossless, JPEGLosslessSV1, JPEG2000Lossless)
+
+
+def make_dataset(path, pixels, z, series_uid):
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = CT_IMAGE_STORAGE
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = FileDataset(path, {}, file_meta=meta, preamble=b'\0' * 128)
+    ds.SOPClassUID, ds.SOPInstanceUID = CT_IMAGE_STORAGE, meta.MediaStorageSOPInstanceUID
+    ds.SeriesInstanceUID, ds.Modality = series_uid, 'CT'
+    ds.Rows, ds.Columns = pixels.shape
+    ds.SamplesPerPixel, ds.PhotometricInterpretation = 1, 'MONOCHROME2'
+    ds.BitsAllocated, ds.BitsStored, ds.HighBit, ds.PixelRepresentation = 16, 16, 15, 0
+    ds.RescaleSlope, ds.RescaleIntercept = 1, -1024
+    ds.ImagePositionPatient = [0.0, 0.0, float(z)]
+    ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    ds.InstanceNumber = z + 1
+    ds.PixelData = pixels.tobytes()
+    ds.is_little_endian, ds.is_implicit_VR = True, False
+    return ds
+
+
+def encode(ds, pixels, syntax):
+    """Compress ``ds`` in place; returns False when no encoder for ``syntax`` is installed."""
+    if syntax == ExplicitVRLittleEndian:
+        return True
+    try:
+        ds.compress(syntax, pixels)
+        return True
+    except Exception:
+        if syntax != JPEG2000Lossless:
+            return False
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'JPEG2000', no_jp2=True, irreversible=False)
+    ds.PixelData = encapsulate([buffer.getvalue()])
+    ds['PixelData'].VR = 'OB'
+    ds['PixelData'].is_undefined_length = True
+    ds.file_meta.TransferSyntaxUID = syntax
+    return True
+
+
+def write_series(directory, syntax, files, size, seed=0):
+    rng = np.random.default_rng(seed)
+    series_uid = generate_uid()
+    # Smooth gradients plus noise, closer to CT than pure noise for the codecs
+    base = np.add.outer(np.arange(size), np.arange(size)).astype(np.float64) * (2000.0 / (2 * size))
+    volume = []
+    for z in range(files):
+        pixels = (base + rng.normal(0, 40, (size, size)) + 500).clip(0, 4095).astype(np.uint16)
+        path = os.path.join(directory, f"{z:05d}.dcm")
+        ds = make_dataset(path, pixels, z, series_uid)
+        if not encode(ds, pixels, syntax):
+            return None
+        ds.save_as(path, write_like_original=False)
+        volume.append(pixels)
+    return np.stack(volume, axis=2)
+
+
+def time_handler(paths, registry):
+    start = time.perf_counter()
+    for path in paths:
+        registry.decode(pydicom.dcmread(path))
+    return time.perf_counter() - start
+
+
+def run(files, size, workers):
+    app = Flask(__name__)
+    app.config.update(DICOM_SCAN_WORKERS=workers, DICOM_DECODE_WORKERS=workers)
+    for syntax in SYNTAXES:
+        name = TRANSFER_SYNTAX_NAMES.get(str(syntax), str(syntax))
+        with tempfile.TemporaryDirectory() as directory:
+            reference = write_series(directory, syntax, files, size)
+            if reference is None:
+                print(f"{name:<26} skipped (no encoder installed)")
+                continue
+            paths = sorted(os.path.join(directory, p) for p in os.listdir(directory))
+            mb = sum(os.path.getsize(p) for p in paths) / (1024 * 1024)
+            candidates = DecoderRegistry().candidates(syntax)
+            if not candidates:
+                print(f"{name:<26} {mb:7.1f} MB  no decoder installed")
+            for decoder in candidates:
+                try:
+                    elapsed = time_handler(paths, DecoderRegistry([decoder]))
+                    print(f"{name:<26} {mb:7.1f} MB  {decoder:<10} serial {elapsed:.2f}s "
+                          f"({files / elapsed:.0f} slices/s)")
+                except Exception as e:
+                    print(f"{name:<26} {mb:7.1f} MB  {decoder:<10} failed: {e}")
+
+            with app.app_context():
+                processor = DICOMProcessor()
+                series = processor._select_series(processor._scan_headers(paths))
+                start = time.perf_counter()
+                try:
+                    volume, series = processor._create_volume(series)
+                except Exception as e:
+                    print(f"{name:<26} loader failed: {e}")
+                    continue
+                elapsed = time.perf_counter() - start
+            assert np.array_equal(volume, reference.astype(np.int32) - 1024)
+            print(f"{name:<26} loader workers={workers} {elapsed:.2f}s ({files / elapsed:.0f} slices/s) "
+                  f"decoders={dict(processor.decoder_counts)} failures={len(processor.decode_failures)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=100)
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    run(args.files, args.size, args.workers)
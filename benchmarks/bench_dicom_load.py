@@ -0,0 +1,97 @@
+"""Time the two-phase DICOM loader (header scan, then decode) for several worker counts.
+
+A synthetic CT series is written to a temporary directory in shuffled order.
+The baseline is the old serial loader: full dcmread plus pixel_array for every
+file before sorting, stacked as float64. Peak traced memory is reported for both,
+from a separate pass so tracing does not slow down the timed one.
+
+Usage: python -m benchmarks.bench_dicom_load [--files 400] [--size 512] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import numpy as np
+import pydicom
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+from flask import Flask
+from app.processors.dicom import DICOMProcessor
+from app.utils.memory import track_peak_memory
+
+CT_IMAGE_STORAGE = '1.2.840.10008.5.1.4.1.1.2'
+
+
+def write_series(directory, files, size, seed=0):
+    rng = np.random.default_rng(seed)
+    series_uid, study_uid = generate_uid(), generate_uid()
+    order = list(range(files))
+    random.Random(seed).shuffle(order)
+    for n, z in enumerate(order):
+        meta = FileMetaDataset()
+        meta.MediaStorageSOPClassUID = CT_IMAGE_STORAGE
+        meta.MediaStorageSOPInstanceUID = generate_uid()
+        meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        path = os.path.join(directory, f"{n:05d}.dcm")
+        ds = FileDataset(path, {}, file_meta=meta, preamble=b'\0' * 128)
+        ds.SOPClassUID, ds.SOPInstanceUID = CT_IMAGE_STORAGE, meta.MediaStorageSOPInstanceUID
+        ds.StudyInstanceUID, ds.SeriesInstanceUID, ds.Modality = study_uid, series_uid, 'CT'
+        ds.Rows = ds.Columns = size
+        ds.SamplesPerPixel, ds.PhotometricInterpretation = 1, 'MONOCHROME2'
+        ds.BitsAllocated, ds.BitsStored, ds.HighBit, ds.PixelRepresentation = 16, 12, 11, 1
+        ds.RescaleSlope, ds.RescaleIntercept = 1, -1024
+        ds.ImagePositionPatient = [0.0, 0.0, float(z) * 0.5]
+        ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+        ds.InstanceNumber, ds.PixelSpacing, ds.SliceThickness = z + 1, [0.3, 0.3], 0.5
+        ds.PixelData = rng.integers(-1000, 2000, (size, size), dtype=np.int16).tobytes()
+        ds.is_little_endian, ds.is_implicit_VR = True, False
+        ds.save_as(path, write_like_original=False)
+
+
+def legacy_load(files):
+    slices = []
+    for path in files:
+        ds = pydicom.dcmread(path, force=True)
+        slices.append((ds, ds.pixel_array))
+    slices.sort(key=lambda item: float(item[0].ImagePositionPatient[2]))
+    return np.stack([pixels.astype(np.float64) * 1.0 - 1024 for _, pixels in slices], axis=2)
+
+
+def run(files, size, worker_counts):
+    with tempfile.TemporaryDirectory() as directory:
+        write_series(directory, files, size)
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))
+        start = time.perf_counter()
+        reference = legacy_load(paths)
+        elapsed = time.perf_counter() - start
+        with track_peak_memory(trace=True) as memory_stats:
+            legacy_load(paths)
+        print(f"legacy serial      total={elapsed:.2f}s "
+              f"peak={memory_stats['peak_memory_mb']} MB ({reference.dtype})")
+
+        app = Flask(__name__)
+        for workers in worker_counts:
+            app.config.update(DICOM_SCAN_WORKERS=workers, DICOM_DECODE_WORKERS=workers)
+            with app.app_context():
+                processor = DICOMProcessor()
+                start = time.perf_counter()
+                series = processor._select_series(processor._scan_headers(paths))
+                scanned = time.perf_counter()
+                volume, series = processor._create_volume(series)
+                done = time.perf_counter()
+                with track_peak_memory(trace=True) as memory_stats:
+                    processor._create_volume(series)
+            assert np.array_equal(volume, reference)
+            print(f"workers={workers:<3}        total={done - start:.2f}s "
+                  f"(header scan {scanned - start:.2f}s, decode {done - scanned:.2f}s) "
+                  f"peak={memory_stats['peak_memory_mb']} MB ({volume.dtype})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=400)
+    parser.add_argument('--size', type=int, default=512)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    run(args.files, args.size, args.workers)
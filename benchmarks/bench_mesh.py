@@ -0,0 +1,50 @@
+"""Time chunked isosurface extraction of a synthetic jaw-like volume per chunk size and worker count.
+
+Peak memory is traced in the calling process (worker processes hold one
+chunk each), so it shows how memory follows the chunk size.
+
+Usage: python -m benchmarks.bench_mesh [--shape 256 256 200] [--chunks 16 64] [--workers 1 4] [--decimate 2]
+"""
+import argparse
+import time
+import numpy as np
+from app.processors.surface import extract_surface
+from app.utils.memory import track_peak_memory
+
+
+def make_volume(shape, seed=0):
+    """Noisy background with a thick bright shell and a few dense blobs, in HU-like units."""
+    rng = np.random.default_rng(seed)
+    grids = np.ogrid[tuple(slice(0, n) for n in shape)]
+    radius = np.sqrt(sum(((g - n / 2) / (n / 2)) ** 2 for g, n in zip(grids, shape)))
+    volume = rng.normal(0, 40, shape).astype(np.int16)
+    volume[(radius > 0.55) & (radius < 0.7)] += 1200
+    for _ in range(8):
+        center = [rng.integers(n // 4, 3 * n // 4) for n in shape]
+        blob = sum(((g - c) / 8.0) ** 2 for g, c in zip(grids, center)) < 1
+        volume[blob] += 1500
+    return volume
+
+
+def run(shape, chunk_sizes, worker_counts, decimate):
+    volume = make_volume(shape)
+    print(f"volume {shape} int16 ({volume.nbytes / (1024 * 1024):.0f} MB), iso level 500")
+    for chunk in chunk_sizes:
+        for workers in worker_counts:
+            start = time.perf_counter()
+            with track_peak_memory(trace=True) as memory:
+                _, _, stats = extract_surface(volume, 500, (0.3, 0.3, 0.3), chunk, workers, decimate)
+            elapsed = time.perf_counter() - start
+            print(f"chunk={chunk:<4} workers={workers:<3} {elapsed:.2f}s "
+                  f"({volume.size / elapsed / 1e6:.1f} Mvox/s) peak {memory['peak_memory_mb']} MB, "
+                  f"{stats['faces_before_decimation']} -> {stats['faces']} faces")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shape', type=int, nargs=3, default=[256, 256, 200])
+    parser.add_argument('--chunks', type=int, nargs='+', default=[16, 64])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--decimate', type=float, default=2)
+    args = parser.parse_args()
+    run(tuple(args.shape), args.chunks, args.workers, args.decimate)
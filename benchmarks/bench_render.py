@@ -0,0 +1,78 @@
+"""Cold and warm latency of on-demand slice rendering from the chunked volume store.
+
+cold  - fresh renderer, empty tile cache: chunks are decompressed and the tile encoded
+disk  - fresh renderer, tiles already on disk (e.g. another worker rendered them)
+warm  - same renderer, tiles served from the in-process LRU
+
+Usage: python -m benchmarks.bench_render [--size 256] [--requests 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from app.processors.encoders import get_encoder
+from app.services.slice_render import VIEW_AXES, SliceRenderer
+from app.services.volume_store import write_chunked_volume
+
+
+def synthetic_ct(size, seed=0):
+    """int16 sphere phantom in HU: air outside, soft tissue inside, a bone shell."""
+    rng = np.random.default_rng(seed)
+    grid = np.linspace(-1.0, 1.0, size, dtype=np.float32)
+    x, y, z = np.meshgrid(grid, grid, grid, indexing='ij')
+    radius = np.sqrt(x ** 2 + y ** 2 + z ** 2)
+    volume = np.full(radius.shape, -1000.0, dtype=np.float32)
+    volume[radius < 0.8] = 40.0
+    volume[(radius > 0.7) & (radius < 0.8)] = 1200.0
+    volume += rng.normal(0.0, 15.0, radius.shape).astype(np.float32)
+    return volume.astype(np.int16)
+
+
+def _requests(shape, count, seed=1):
+    rng = np.random.default_rng(seed)
+    views = list(VIEW_AXES)
+    picks = []
+    for _ in range(count):
+        view = views[rng.integers(len(views))]
+        picks.append((view, int(rng.integers(shape[VIEW_AXES[view]]))))
+    return picks
+
+
+def _measure(renderer, picks, window):
+    timings = []
+    for view, index in picks:
+        start = time.perf_counter()
+        renderer.render('bench', view, index, window)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 95)
+
+
+def run(size, count, chunk, level):
+    volume = synthetic_ct(size)
+    encoder = get_encoder('fast-preview')
+    window = (40.0, 400.0)
+    with tempfile.TemporaryDirectory() as root:
+        store_dir, cache_dir = os.path.join(root, 'volumes'), os.path.join(root, 'tiles')
+        meta = write_chunked_volume(volume, 'bench', chunk=chunk, level=level, root=store_dir)
+        print(f"volume {volume.shape} {meta['codec']}: {meta['raw_mb']} MB -> {meta['stored_mb']} MB "
+              f"in {meta['write_time_s']:.2f}s")
+        # Unique requests so the cold pass never hits a tile it rendered itself
+        picks = list(dict.fromkeys(_requests(volume.shape, count)))
+
+        renderer = SliceRenderer(store_dir, cache_dir, encoder, max_entries=len(picks))
+        cold = _measure(renderer, picks, window)
+        warm = _measure(renderer, picks, window)
+        disk = _measure(SliceRenderer(store_dir, cache_dir, encoder, max_entries=len(picks)), picks, window)
+        for label, (p50, p95) in (('cold', cold), ('disk', disk), ('warm', warm)):
+            print(f"{label:<5} requests={len(picks):<4} p50={p50:7.2f} ms  p95={p95:7.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=256)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--chunk', type=int, default=64)
+    parser.add_argument('--level', type=int, default=3)
+    args = parser.parse_args()
+    run(args.size, args.requests, args.chunk, args.level)
@@ -0,0 +1,74 @@
+"""Compare ingesting a DICOM series file by file against one streamed archive.
+
+Runs through the Flask test client: one POST per file to /cbct-report-generated
+versus a single zip or tar.gz POST to /cbct-series. The workflow is not
+started (the enqueue is replaced by a counter), so only the ingest is timed.
+
+Usage: python -m benchmarks.bench_series_upload [--files 300] [--size 512]
+"""
+import argparse
+import io
+import os
+import tarfile
+import tempfile
+import time
+import zipfile
+import app.routes.upload as upload_routes
+from app import create_app
+from benchmarks.bench_dicom_load import write_series
+
+
+def build_archives(directory):
+    names = sorted(os.listdir(directory))
+    zip_buffer, tar_buffer = io.BytesIO(), io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for name in names:
+            archive.write(os.path.join(directory, name), f"series/{name}")
+    with tarfile.open(fileobj=tar_buffer, mode='w:gz', compresslevel=1) as archive:
+        for name in names:
+            archive.add(os.path.join(directory, name), f"series/{name}")
+    return names, zip_buffer.getvalue(), tar_buffer.getvalue()
+
+
+def run(files, size):
+    enqueued = []
+    upload_routes.start_complete_workflow = lambda *args, **kwargs: enqueued.append(args) or {'workflow_id': None}
+    app = create_app()
+    with tempfile.TemporaryDirectory() as series_dir, tempfile.TemporaryDirectory() as upload_folder:
+        app.config['UPLOAD_FOLDER'] = upload_folder
+        write_series(series_dir, files, size)
+        names, zip_bytes, tar_bytes = build_archives(series_dir)
+        series_mb = sum(os.path.getsize(os.path.join(series_dir, n)) for n in names) / (1024 * 1024)
+        client = app.test_client()
+
+        start = time.perf_counter()
+        for n, name in enumerate(names):
+            with open(os.path.join(series_dir, name), 'rb') as f:
+                response = client.post('/cbct-report-generated', content_type='multipart/form-data',
+                                       data={'file': (f, name), 'upload_id': f"per-file-{n}"})
+            assert response.status_code == 202, response.get_json()
+        elapsed = time.perf_counter() - start
+        print(f"per-file   {len(names)} requests, {len(enqueued)} enqueues: {elapsed:.2f}s "
+              f"({series_mb / elapsed:.1f} MB/s)")
+
+        for label, body, content_type in (('zip', zip_bytes, 'application/zip'),
+                                          ('tar.gz', tar_bytes, 'application/gzip')):
+            enqueued.clear()
+            start = time.perf_counter()
+            response = client.post(f'/cbct-series?upload_id=series-{label.replace(".", "-")}',
+                                   data=io.BytesIO(body), content_type=content_type)
+            elapsed = time.perf_counter() - start
+            result = response.get_json()
+            assert response.status_code == 202, result
+            assert result['file_info']['file_count'] == len(names)
+            print(f"{label:<10} 1 request, {len(enqueued)} enqueue: {elapsed:.2f}s "
+                  f"({series_mb / elapsed:.1f} MB/s, archive {len(body) / (1024 * 1024):.1f} MB, "
+                  f"extract {result['ingest']['seconds']:.2f}s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=300)
+    parser.add_argument('--size', type=int, default=512)
+    args = parser.parse_args()
+    run(args.files, args.size)
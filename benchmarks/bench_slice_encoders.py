@@ -0,0 +1,40 @@
+"""Encode time vs. output size for every slice encoder profile.
+
+Usage: python -m benchmarks.bench_slice_encoders [--size 256] [--slices 64]
+"""
+import argparse
+import time
+from app.processors.encoders import ENCODER_PROFILES, PillowJPEGEncoder, get_encoder
+from benchmarks.bench_slice_encoding import synthetic_volume
+
+
+def measure(encoder, slices):
+    start = time.perf_counter()
+    total_bytes = sum(len(encoder.encode(s)) for s in slices)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(slices) * 1000, total_bytes / len(slices)
+
+
+def run(size, slice_count):
+    volume = synthetic_volume(size)
+    step = max(1, size // slice_count)
+    slices = [volume[:, :, i].T for i in range(0, size, step)][:slice_count]
+
+    # The pre-profile default, for reference
+    legacy = PillowJPEGEncoder(quality=85, optimize=True)
+    rows = [('legacy (jpeg q85 optimize)', *measure(legacy, slices))]
+    for profile in ENCODER_PROFILES:
+        encoder = get_encoder(profile)
+        rows.append((f"{profile} ({encoder.name})", *measure(encoder, slices)))
+
+    print(f"{len(slices)} slices of {size}x{size}")
+    for label, ms_per_slice, bytes_per_slice in rows:
+        print(f"{label:<34} {ms_per_slice:7.2f} ms/slice {bytes_per_slice / 1024:8.1f} KiB/slice")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=256)
+    parser.add_argument('--slices', type=int, default=64)
+    args = parser.parse_args()
+    run(args.size, args.slices)
@@ -0,0 +1,50 @@
+"""Compare serial and threaded slice encoding in MedicalImageProcessor.save_slices.
+
+Usage: python -m benchmarks.bench_slice_encoding [--size 256] [--workers 1 2 4 8]
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from flask import Flask
+from app.processors.base import MedicalImageProcessor
+
+
+def synthetic_volume(size, seed=0):
+    """Sphere phantom with noise, roughly the intensity layout of a normalized CBCT."""
+    rng = np.random.default_rng(seed)
+    grid = np.linspace(-1.0, 1.0, size, dtype=np.float32)
+    x, y, z = np.meshgrid(grid, grid, grid, indexing='ij')
+    radius = np.sqrt(x ** 2 + y ** 2 + z ** 2)
+    volume = np.where(radius < 0.8, 180.0, 0.0) + rng.normal(0.0, 20.0, radius.shape)
+    return np.clip(volume, 0, 255).astype(np.uint8)
+
+
+def run(size, worker_counts, repeats):
+    volume = synthetic_volume(size)
+    with tempfile.TemporaryDirectory() as base_path:
+        app = Flask(__name__)
+        app.config['BASE_PATH'] = base_path
+        with app.app_context():
+            baseline = None
+            for workers in worker_counts:
+                processor = MedicalImageProcessor(encode_workers=workers)
+                timings = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    slice_counts = processor.save_slices(volume, f"bench-{workers}")
+                    timings.append(time.perf_counter() - start)
+                best = min(timings)
+                baseline = baseline or best
+                total = sum(slice_counts.values())
+                print(f"workers={workers:<3} slices={total:<5} best={best:.2f}s "
+                      f"({best / total * 1000:.2f} ms/slice, speedup x{baseline / best:.2f})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=256)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+    run(args.size, args.workers, args.repeats)
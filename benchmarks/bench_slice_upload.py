@@ -0,0 +1,145 @@
+"""Slice upload throughput per UPLOAD_WORKERS against a local fake storage server.
+
+The server answers storage uploads (POST /object/<bucket>/<path>) after a
+fixed latency to stand in for the round trip to Supabase. The client mimics
+the storage API used by SupabaseUploadManager and keeps one persistent
+HTTP/1.1 connection per thread, like the shared keep-alive client of
+supabase-py; --no-keepalive opens a connection per request instead.
+Per-slice results are checked to come back complete and in order.
+
+Usage: python -m benchmarks.bench_slice_upload [--slices 300] [--kb 40] [--latency-ms 30] [--workers 1 4 8 16]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from flask import Flask
+from app.services.uploads import SupabaseUploadManager
+
+
+class FakeStorageHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; Nagle would hold the body back on a kept-alive socket
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.uploads += 1
+            self.server.bytes += len(body)
+        payload = json.dumps({'Key': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeBucket:
+    def __init__(self, client, name):
+        self.client, self.name = client, name
+
+    def upload(self, path, file, file_options=None):
+        connection = self.client.connection()
+        headers = {'Content-Type': (file_options or {}).get('content-type', 'application/octet-stream')}
+        if not self.client.keepalive:
+            headers['Connection'] = 'close'
+        connection.request('POST', f"/object/{self.name}/{path}", body=file, headers=headers)
+        response = connection.getresponse()
+        data = response.read()
+        if not self.client.keepalive:
+            connection.close()
+            self.client.local.connection = None
+        if response.status != 200:
+            raise Exception(f"HTTP {response.status}")
+        return json.loads(data)
+
+    def get_public_url(self, path):
+        # Built locally, as in supabase-py
+        return f"http://{self.client.host}:{self.client.port}/object/public/{self.name}/{path}"
+
+
+class FakeStorageClient:
+    """Just enough of ``supabase.Client`` for SupabaseUploadManager: ``client.storage.from_(bucket)``."""
+
+    def __init__(self, host, port, keepalive=True):
+        self.host, self.port, self.keepalive = host, port, keepalive
+        self.local = threading.local()
+        self.storage = self
+
+    def from_(self, bucket):
+        return FakeBucket(self, bucket)
+
+    def connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            connection.connect()
+            connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.local.connection = connection
+        return self.local.connection
+
+
+def write_slices(workspace_dir, slices, kb):
+    payload = os.urandom(kb * 1024)
+    counts = {'axial': slices // 3, 'coronal': slices // 3, 'sagittal': slices - 2 * (slices // 3)}
+    for view, count in counts.items():
+        os.makedirs(os.path.join(workspace_dir, view), exist_ok=True)
+        for i in range(count):
+            with open(os.path.join(workspace_dir, view, f"{i}.jpg"), 'wb') as f:
+                f.write(payload)
+    return counts
+
+
+def run(slices, kb, latency_ms, worker_counts, keepalive):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeStorageHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000.0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as base_path:
+        app.config['BASE_PATH'] = base_path
+        counts = write_slices(os.path.join(base_path, 'bench'), slices, kb)
+        total_mb = slices * kb / 1024
+        print(f"{slices} slices x {kb} KB ({total_mb:.1f} MB), server latency {latency_ms} ms, "
+              f"keep-alive {'on' if keepalive else 'off'}")
+        for workers in worker_counts:
+            app.config['UPLOAD_WORKERS'] = workers
+            app.extensions['supabase'] = FakeStorageClient(host, port, keepalive)
+            server.connections = server.uploads = server.bytes = 0
+            with app.app_context():
+                start = time.perf_counter()
+                result = SupabaseUploadManager().upload_all_slices(counts, 'bench', 'clinic', 'patient', 'cbct', 'report')
+                elapsed = time.perf_counter() - start
+            for view, count in counts.items():
+                assert [r['slice_index'] for r in result[view]] == list(range(count)), f"{view} out of order"
+            assert result['failed_uploads'] == 0 and server.uploads == slices
+            print(f"workers={workers:<3} {elapsed:.2f}s ({slices / elapsed:.0f} slices/s, "
+                  f"{total_mb / elapsed:.1f} MB/s), {server.connections} connections")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--slices', type=int, default=300)
+    parser.add_argument('--kb', type=int, default=40)
+    parser.add_argument('--latency-ms', type=float, default=30)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--no-keepalive', action='store_true')
+    args = parser.parse_args()
+    run(args.slices, args.kb, args.latency_ms, args.workers, not args.no_keepalive)
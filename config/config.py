@@ -1,4 +1,5 @@
 import os
+import json
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'chams_medical_app_key')
@@ -7,11 +8,91 @@ class Config:
     BASE_PATH = os.environ.get('BASE_PATH', './cache_slices')
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', './uploads')
     PROCESSED_FOLDER = os.environ.get('PROCESSED_FOLDER', './processed')
+    DECOMPRESS_CACHE_FOLDER = os.environ.get('DECOMPRESS_CACHE_FOLDER', './processed/nii_cache')
+    VOLUME_STORE_FOLDER = os.environ.get('VOLUME_STORE_FOLDER', './processed/volumes')
+    RENDER_CACHE_FOLDER = os.environ.get('RENDER_CACHE_FOLDER', './processed/render_cache')
     
     # File limits
     MAX_FILE_SIZE = int(os.environ.get('MAX_FILE_SIZE', 1000 * 1024 * 1024))  # 1000MB
     ALLOWED_EXTENSIONS = {'nii', 'nii.gz', 'dcm', 'dicom', 'IMA'}
     ALLOWED_REPORT_TYPES = {'cbct', 'panoramic', 'cephalometric', 'intraoral'}
+
+    # Storage uploads in flight at once per upload task (slices, atlases); 1 uploads sequentially
+    UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 8))
+
+    # Slice rendering
+    SLICE_ENCODE_WORKERS = int(os.environ.get('SLICE_ENCODE_WORKERS', os.cpu_count() or 1))
+    # DICOM loading: header scan runs in a process pool, pixel decode in threads
+    DICOM_SCAN_WORKERS = int(os.environ.get('DICOM_SCAN_WORKERS', os.cpu_count() or 1))
+    DICOM_DECODE_WORKERS = int(os.environ.get('DICOM_DECODE_WORKERS', os.cpu_count() or 1))
+    # Worker-local SQLite cache of parsed DICOM headers (see app.services.dicom_index); empty disables it
+    DICOM_INDEX_PATH = os.environ.get('DICOM_INDEX_PATH', './processed/dicom_index.sqlite')
+    # Pixel data handlers tried per transfer syntax, fastest first (see app.processors.decoders)
+    DICOM_DECODER_PREFERENCE = json.loads(os.environ.get(
+        'DICOM_DECODER_PREFERENCE', '["numpy", "pylibjpeg", "gdcm", "jpeg_ls", "pillow", "rle"]'))
+    # Fail the job rather than build a volume with gaps when more slices than this fail to decode
+    DICOM_MAX_DECODE_FAILURE_RATIO = float(os.environ.get('DICOM_MAX_DECODE_FAILURE_RATIO', 0.05))
+    # Intensity percentiles mapped to 0..255; [0, 100] restores plain min/max scaling
+    NORMALIZE_PERCENTILES = json.loads(os.environ.get('NORMALIZE_PERCENTILES', '[0.5, 99.5]'))
+    # Render planes straight from memory-mapped .nii files instead of loading the volume
+    NIFTI_STREAMING = os.environ.get('NIFTI_STREAMING', 'true').lower() == 'true'
+    # Measure job peak memory with tracemalloc instead of the process peak RSS; much slower, debugging only
+    MEMORY_TRACE_ENABLED = os.environ.get('MEMORY_TRACE_ENABLED', 'false').lower() == 'true'
+    # Reslice anisotropic volumes to isotropic voxels before rendering (see app.processors.resample);
+    # the target spacing defaults to the finest axis spacing
+    RESAMPLE_ISOTROPIC = os.environ.get('RESAMPLE_ISOTROPIC', 'false').lower() == 'true'
+    RESAMPLE_TARGET_SPACING_MM = float(os.environ.get('RESAMPLE_TARGET_SPACING_MM', 0))
+    RESAMPLE_WORKERS = int(os.environ.get('RESAMPLE_WORKERS', os.cpu_count() or 1))
+    # Crop air/zero borders before rendering (see MedicalImageProcessor.autocrop_volume); the
+    # threshold is in real-world units (HU for CT), unset picks one between background and the Otsu threshold
+    AUTOCROP_ENABLED = os.environ.get('AUTOCROP_ENABLED', 'true').lower() == 'true'
+    AUTOCROP_THRESHOLD = float(os.environ['AUTOCROP_THRESHOLD']) if os.environ.get('AUTOCROP_THRESHOLD') else None
+    AUTOCROP_MARGIN_MM = float(os.environ.get('AUTOCROP_MARGIN_MM', 5.0))
+    # Planes with fewer voxels above the threshold than this fraction count as empty
+    AUTOCROP_MIN_FRACTION = float(os.environ.get('AUTOCROP_MIN_FRACTION', 0.001))
+    # Curved panoramic reformat (see app.processors.panoramic) rendered for these report types
+    PANORAMIC_REPORT_TYPES = json.loads(os.environ.get('PANORAMIC_REPORT_TYPES', '["cbct"]'))
+    PANORAMIC_SLAB_MM = float(os.environ.get('PANORAMIC_SLAB_MM', 15.0))
+    PANORAMIC_WORKERS = int(os.environ.get('PANORAMIC_WORKERS', os.cpu_count() or 1))
+    # Volume-rendered study thumbnails (see app.processors.thumbnails)
+    THUMBNAILS_ENABLED = os.environ.get('THUMBNAILS_ENABLED', 'true').lower() == 'true'
+    THUMBNAIL_SIZE = int(os.environ.get('THUMBNAIL_SIZE', 256))
+    THUMBNAIL_MODES = json.loads(os.environ.get('THUMBNAIL_MODES', '["mip", "composite"]'))
+    # Isosurface mesh (see app.processors.surface), the output mode for these report types
+    MESH_REPORT_TYPES = json.loads(os.environ.get('MESH_REPORT_TYPES', '["3d"]'))
+    MESH_FORMAT = os.environ.get('MESH_FORMAT', 'glb')
+    # Real-world units (HU for CT); unset uses an Otsu threshold of the volume
+    MESH_ISO_LEVEL = float(os.environ['MESH_ISO_LEVEL']) if os.environ.get('MESH_ISO_LEVEL') else None
+    MESH_CHUNK_SLICES = int(os.environ.get('MESH_CHUNK_SLICES', 32))
+    MESH_WORKERS = int(os.environ.get('MESH_WORKERS', os.cpu_count() or 1))
+    # Vertex clustering cell size in voxels; 1 keeps the full-resolution mesh
+    MESH_DECIMATE_VOXELS = float(os.environ.get('MESH_DECIMATE_VOXELS', 2))
+    # Encoder profile (see app.processors.encoders.ENCODER_PROFILES), overridable per report type
+    SLICE_ENCODER_PROFILE = os.environ.get('SLICE_ENCODER_PROFILE', 'balanced')
+    SLICE_ENCODER_PROFILES = json.loads(os.environ.get('SLICE_ENCODER_PROFILES', '{"3d": "fast-preview"}'))
+    # 'slices' writes one image per slice; 'atlas' packs SLICE_ATLAS_GRID x SLICE_ATLAS_GRID slices per image;
+    # 'on_demand' only stores the chunked volume and slices are rendered by /render/<upload_id>/<view>/<index>;
+    # 'mesh' writes one isosurface mesh instead of slices (see MESH_*)
+    SLICE_OUTPUT_MODE = os.environ.get('SLICE_OUTPUT_MODE', 'slices')
+    SLICE_ATLAS_GRID = int(os.environ.get('SLICE_ATLAS_GRID', 8))
+    # Downsampling factor of the preview tier written before full-resolution slices; 0 or 1 disables it
+    SLICE_PREVIEW_FACTOR = int(os.environ.get('SLICE_PREVIEW_FACTOR', 4))
+
+    # HU window presets rendered per report type (see app.processors.windowing.WINDOW_PRESETS), opt-in
+    # since every preset is another full tier to encode and upload, e.g. '{"cbct": ["bone", "airway"]}';
+    # WINDOW_PRESETS adds or overrides definitions, e.g. '{"bone": {"center": 600, "width": 2500}}'
+    WINDOW_PRESETS_BY_REPORT = json.loads(os.environ.get('WINDOW_PRESETS_BY_REPORT', '{}'))
+    WINDOW_PRESETS = json.loads(os.environ.get('WINDOW_PRESETS', '{}'))
+    WINDOW_BATCH_SLICES = int(os.environ.get('WINDOW_BATCH_SLICES', 16))
+
+    # On-demand rendering (see app.services.volume_store / app.services.slice_render)
+    VOLUME_CHUNK_SIZE = int(os.environ.get('VOLUME_CHUNK_SIZE', 64))
+    VOLUME_COMPRESSION_LEVEL = int(os.environ.get('VOLUME_COMPRESSION_LEVEL', 3))
+    # Stored volumes not rendered for this long are removed by /cleanup; their render URLs stop working
+    VOLUME_STORE_MAX_AGE_DAYS = float(os.environ.get('VOLUME_STORE_MAX_AGE_DAYS', 30))
+    RENDER_ENCODER_PROFILE = os.environ.get('RENDER_ENCODER_PROFILE', 'fast-preview')
+    RENDER_CACHE_ENTRIES = int(os.environ.get('RENDER_CACHE_ENTRIES', 512))
+    RENDER_CHUNK_CACHE_MB = int(os.environ.get('RENDER_CHUNK_CACHE_MB', 256))
     
     # Redis Configuration
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
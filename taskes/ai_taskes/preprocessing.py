@@ -3,26 +3,44 @@ import nibabel as nib
 import numpy as np
 import os
 from .utils import normalize_array
+from flask import current_app, has_app_context
+from app.processors.normalization import compute_intensity_stats, ROBUST_PERCENTILES
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def _get_percentiles():
+    """NORMALIZE_PERCENTILES from the running app's config, so overrides apply here as for the slices."""
+    if has_app_context():
+        percentiles = current_app.config.get('NORMALIZE_PERCENTILES')
+    else:
+        from app import create_app
+        with create_app().app_context():
+            percentiles = current_app.config.get('NORMALIZE_PERCENTILES')
+    lower, upper = percentiles or ROBUST_PERCENTILES
+    return float(lower), float(upper)
+
+
 @shared_task
-def preprocess_file(file_path, upload_id):
+def preprocess_file(file_path, upload_id, percentiles=None):
     """
     Preprocess medical file before AI model.
     - Load NIfTI
-    - Normalize intensities
+    - Normalize intensities (``percentiles`` range, defaulting to the app's
+      NORMALIZE_PERCENTILES as for the slices)
     - Return path of preprocessed file
     """
     logger.info(f"🔄 Preprocessing file: {file_path}")
 
     # Load file
     img = nib.load(file_path)
-    data = img.get_fdata()
+    data = img.get_fdata(dtype=np.float32)
 
     # Normalize
-    norm_data = normalize_array(data)
+    lower, upper = percentiles or _get_percentiles()
+    data_min, data_max = compute_intensity_stats(data).intensity_range(float(lower), float(upper))
+    norm_data = normalize_array(data, data_min, data_max)
 
     # Save new file
     preprocessed_path = file_path.replace(".nii", "_preprocessed.nii")
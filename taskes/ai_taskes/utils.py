@@ -68,12 +68,18 @@ def save_json_report(report_data, upload_id):
     logger.info(f"📝 Report saved: {result_path}")
     return result_path
 
-def normalize_array(data):
+def normalize_array(data, data_min=None, data_max=None):
     """
     Normalize numpy array [0,1]
+    data_min/data_max: precomputed intensity range (e.g. robust percentiles from
+    compute_intensity_stats); values outside it are clipped. Defaults to min/max.
     """
     data = data.astype(np.float32)
-    return (data - np.min(data)) / (np.max(data) - np.min(data) + 1e-8)
+    if data_min is None or data_max is None:
+        data_min, data_max = float(np.min(data)), float(np.max(data))
+    data -= np.float32(data_min)
+    data *= np.float32(1.0 / (data_max - data_min + 1e-8))
+    return np.clip(data, 0.0, 1.0, out=data)
 
 def load_nifti(file_path):
     """
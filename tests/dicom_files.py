@@ -0,0 +1,37 @@
+"""Small synthetic DICOM files for the tests."""
+import numpy as np
+import pydicom
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import ExplicitVRBigEndian, ExplicitVRLittleEndian, generate_uid
+
+CT_IMAGE_STORAGE = '1.2.840.10008.5.1.4.1.1.2'
+
+
+def write_dicom(path, pixels, z=0.0, bits_stored=16, big_endian=False, slope=1, intercept=-1024):
+    """Write ``pixels`` (rows x columns, int16 or uint16; signedness sets PixelRepresentation) as one CT slice."""
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = CT_IMAGE_STORAGE
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRBigEndian if big_endian else ExplicitVRLittleEndian
+    ds = FileDataset(str(path), {}, file_meta=meta, preamble=b'\0' * 128)
+    ds.SOPClassUID, ds.SOPInstanceUID = CT_IMAGE_STORAGE, meta.MediaStorageSOPInstanceUID
+    ds.Modality = 'CT'
+    ds.Rows, ds.Columns = pixels.shape
+    ds.SamplesPerPixel, ds.PhotometricInterpretation = 1, 'MONOCHROME2'
+    ds.BitsAllocated, ds.BitsStored, ds.HighBit = 16, bits_stored, bits_stored - 1
+    ds.PixelRepresentation = 1 if pixels.dtype.kind == 'i' else 0
+    ds.RescaleSlope, ds.RescaleIntercept = slope, intercept
+    ds.ImagePositionPatient = [0.0, 0.0, float(z)]
+    ds.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    ds.PixelSpacing, ds.SliceThickness = [0.5, 0.5], 0.5
+    stored = pixels
+    if bits_stored < 16:
+        # Scanners leave the bits above BitsStored clear, so negative values need sign extension
+        stored = (pixels.astype(np.int32) & ((1 << bits_stored) - 1)).astype(np.uint16)
+    ds.PixelData = stored.astype(stored.dtype.newbyteorder('>' if big_endian else '<')).tobytes()
+    if int(pydicom.__version__.split('.')[0]) >= 3:
+        pydicom.dcmwrite(str(path), ds, implicit_vr=False, little_endian=not big_endian, force_encoding=True)
+    else:
+        ds.is_little_endian, ds.is_implicit_VR = not big_endian, False
+        ds.save_as(str(path), write_like_original=False)
+    return path
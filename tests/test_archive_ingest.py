@@ -0,0 +1,89 @@
+import io
+import os
+import tarfile
+import tracemalloc
+import zipfile
+import pytest
+from app.services.archive_ingest import extract_series_archive
+
+DICOM_BYTES = b'\0' * 128 + b'DICM' + b'\x02\x00\x00\x00' * 64
+
+
+class _Unseekable(io.RawIOBase):
+    """Write-only sink that forces zipfile to emit data descriptors, like streaming zip writers."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+def _zip(files, streamed=False, compression=zipfile.ZIP_DEFLATED):
+    sink = _Unseekable() if streamed else io.BytesIO()
+    with zipfile.ZipFile(sink, 'w', compression) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return io.BytesIO((sink.buffer if streamed else sink).getvalue())
+
+
+def _tar_gz(files):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize('make_archive', [
+    lambda files: _zip(files),
+    lambda files: _zip(files, streamed=True),
+    lambda files: _zip(files, compression=zipfile.ZIP_STORED),
+    _tar_gz,
+])
+def test_keeps_dicom_entries_only(tmp_path, make_archive):
+    files = {
+        'series/IM0001': DICOM_BYTES,
+        'series/b.dcm': b'named dicom without preamble',
+        'series/readme.txt': b'not a slice' * 100,
+        '__MACOSX/series/._IM0001': DICOM_BYTES,
+    }
+    entries, stats = extract_series_archive(make_archive(files), str(tmp_path), 10 * 1024 * 1024)
+    assert [(e['name'], e['dicm_preamble']) for e in entries] == [('series_IM0001', True), ('series_b.dcm', False)]
+    assert (tmp_path / 'series_IM0001').read_bytes() == DICOM_BYTES
+    assert stats['files_extracted'] == 2 and stats['files_skipped'] == 2
+    assert sorted(os.listdir(tmp_path)) == ['series_IM0001', 'series_b.dcm']
+
+
+@pytest.mark.parametrize('name', ['bomb.dcm', 'bomb.bin'])
+def test_zip_bomb_is_stopped_at_the_size_budget(tmp_path, name):
+    # ~200 MB of zeros deflates to ~200 KB, i.e. a single compressed read
+    archive = _zip({name: b'\0' * (200 * 1024 * 1024)}, streamed=True)
+    tracemalloc.start()
+    try:
+        with pytest.raises(ValueError, match='maximum upload size'):
+            extract_series_archive(archive, str(tmp_path), 4 * 1024 * 1024)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 32 * 1024 * 1024
+    assert os.listdir(tmp_path) == []
+
+
+def test_budget_covers_the_whole_archive(tmp_path):
+    files = {f"IM{n:04d}": DICOM_BYTES + os.urandom(64 * 1024) for n in range(8)}
+    with pytest.raises(ValueError, match='maximum upload size'):
+        extract_series_archive(_zip(files), str(tmp_path), 5 * 64 * 1024)
+
+
+def test_corrupt_zip_entry_is_rejected(tmp_path):
+    data = bytearray(_zip({'IM0001': DICOM_BYTES}, compression=zipfile.ZIP_STORED).getvalue())
+    data[data.index(b'DICM')] ^= 0xFF
+    with pytest.raises(ValueError, match='CRC mismatch'):
+        extract_series_archive(io.BytesIO(bytes(data)), str(tmp_path), 1024 * 1024)
@@ -0,0 +1,57 @@
+import numpy as np
+import pydicom
+import pytest
+from flask import Flask
+from app.processors.dicom import DICOMProcessor, read_dicom_header
+from app.utils.validators import probe_file_content
+from tests.dicom_files import write_dicom
+
+
+def _load(paths, workers=1):
+    app = Flask(__name__)
+    app.config.update(DICOM_SCAN_WORKERS=workers, DICOM_DECODE_WORKERS=workers)
+    with app.app_context():
+        processor = DICOMProcessor()
+        series = processor._select_series(processor._scan_headers([str(p) for p in paths]))
+        return processor._create_volume(series)
+
+
+def _write_series(directory, slices, **kwargs):
+    # Written in reverse order; the loader sorts by position
+    return [write_dicom(directory / f"{n}.dcm", pixels, z=float(len(slices) - n), **kwargs)
+            for n, pixels in enumerate(reversed(slices))]
+
+
+def _reference(paths):
+    datasets = sorted((pydicom.dcmread(str(p)) for p in paths), key=lambda ds: float(ds.ImagePositionPatient[2]))
+    return np.stack([ds.pixel_array * float(ds.RescaleSlope) + float(ds.RescaleIntercept) for ds in datasets],
+                    axis=2)
+
+
+@pytest.mark.parametrize('big_endian', [False, True])
+@pytest.mark.parametrize('bits_stored', [16, 12])
+def test_raw_decode_matches_pydicom(tmp_path, big_endian, bits_stored):
+    rng = np.random.default_rng(0)
+    low, high = -(1 << (bits_stored - 1)), (1 << (bits_stored - 1)) - 1
+    slices = [rng.integers(low, high, (12, 10), dtype=np.int16) for _ in range(4)]
+    slices[0][0, 0], slices[0][0, 1] = low, high
+    paths = _write_series(tmp_path, slices, bits_stored=bits_stored, big_endian=big_endian, intercept=0)
+    header = read_dicom_header(str(paths[0]))
+    assert header['native_dtype'] == ('>i2' if big_endian else '<i2')
+    volume, series = _load(paths)
+    assert len(series) == 4 and volume.shape == (12, 10, 4)
+    assert np.array_equal(volume, _reference(paths))
+    assert volume[0, 0, 0] == low and volume[0, 1, 0] == high
+
+
+def test_sign_extension_of_negative_hu(tmp_path):
+    slices = [np.full((4, 4), value, dtype=np.int16) for value in (-2048, -1, 0, 2047)]
+    volume, _ = _load(_write_series(tmp_path, slices, bits_stored=12, intercept=-1024))
+    assert [int(v) for v in volume[0, 0, :]] == [-3072, -1025, -1024, 1023]
+
+
+def test_big_endian_upload_passes_validation(tmp_path):
+    path = write_dicom(tmp_path / 'be.dcm', np.arange(20, dtype=np.int16).reshape(4, 5), big_endian=True)
+    probe = probe_file_content(str(path), 'be.dcm')
+    assert probe['valid'], probe['message']
+    assert probe['header']['pixel_length'] == 40
@@ -0,0 +1,24 @@
+import gzip
+import os
+from flask import Flask
+from app.services.ingest import decompress_to_cache
+
+
+def test_same_name_uploads_do_not_share_a_cache_entry(tmp_path):
+    app = Flask(__name__)
+    app.config['DECOMPRESS_CACHE_FOLDER'] = str(tmp_path / 'cache')
+    paths = []
+    for upload, payload in (('a', b'first study'), ('b', b'other study')):
+        os.makedirs(tmp_path / upload)
+        path = tmp_path / upload / 'scan.nii.gz'
+        path.write_bytes(gzip.compress(payload))
+        paths.append(path)
+    # Same name, same size, same second
+    os.utime(paths[1], ns=(os.stat(paths[0]).st_atime_ns, os.stat(paths[0]).st_mtime_ns))
+    with app.app_context():
+        first, first_metrics = decompress_to_cache(str(paths[0]))
+        second, second_metrics = decompress_to_cache(str(paths[1]))
+        again, again_metrics = decompress_to_cache(str(paths[0]))
+    assert first != second and not second_metrics['cache_hit']
+    assert open(second, 'rb').read() == b'other study'
+    assert again == first and again_metrics['cache_hit']
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from app.processors.normalization import compute_intensity_stats
+
+
+@pytest.mark.parametrize('dtype', [np.int16, np.uint16, np.int8, np.uint8])
+def test_histogram_percentiles_match_numpy(dtype):
+    info = np.iinfo(dtype)
+    data = np.random.default_rng(0).integers(info.min, info.max, (20, 18, 16), endpoint=True).astype(dtype)
+    stats = compute_intensity_stats(data, block_bytes=1024)
+    assert stats.histogram is not None
+    for q in (0.5, 1, 25, 50, 75, 99, 99.5):
+        assert stats.percentile(q) == np.percentile(data, q, method='lower')
+
+
+def test_histogram_percentiles_keep_negative_values():
+    data = np.full((8, 8, 8), -1000, dtype=np.int16)
+    data[:, :, 4:] = np.arange(-3000, -3000 + 8 * 8 * 4, dtype=np.int16).reshape(8, 8, 4)
+    stats = compute_intensity_stats(data)
+    assert stats.intensity_range(0, 100) == (float(data.min()), float(data.max()))
+    assert stats.percentile(10) == np.percentile(data, 10, method='lower')
+    assert stats.percentile(75) == -1000
+
+
+def test_min_max_are_exact_at_the_extremes():
+    data = np.zeros((10, 10, 10), dtype=np.float32)
+    data[3, 4, 5], data[6, 7, 8] = -2048.5, 3071.25
+    stats = compute_intensity_stats(data, sample_size=16)
+    assert stats.histogram is None
+    assert stats.intensity_range(0, 100) == (-2048.5, 3071.25)
+
+
+def test_fortran_ordered_data_gives_the_same_stats():
+    data = np.random.default_rng(1).integers(-1024, 3000, (14, 12, 10)).astype(np.int16)
+    c_stats = compute_intensity_stats(data, block_bytes=512)
+    f_stats = compute_intensity_stats(np.asfortranarray(data), block_bytes=512)
+    assert np.array_equal(c_stats.histogram, f_stats.histogram)
+
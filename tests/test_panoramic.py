@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from app.processors.panoramic import NegatedVolume, axial_mip, tooth_band
+
+
+def _volume():
+    volume = np.random.default_rng(0).integers(0, 1000, (24, 20, 16)).astype(np.int16)
+    volume[4:20, 5:15, 6:9] += 2500  # bright tooth level
+    return volume
+
+
+@pytest.mark.parametrize('order', ['C', 'F'])
+def test_tooth_band_and_mip_match_across_memory_orders(tmp_path, order):
+    reference = _volume()
+    volume = np.memmap(str(tmp_path / 'volume.raw'), dtype=np.int16, mode='w+', shape=reference.shape, order=order)
+    volume[:] = reference
+    block_bytes = 20 * 16 * 2 * 3  # a few planes per block either way
+    assert tooth_band(volume, block_bytes) == tooth_band(reference)
+    z0, z1 = tooth_band(reference)
+    np.testing.assert_array_equal(axial_mip(volume, z0, z1, block_bytes), reference[:, :, z0:z1].max(axis=2))
+
+
+def test_negated_volume_follows_the_data_order():
+    volume = np.asfortranarray(_volume())
+    negated = NegatedVolume(volume)
+    assert negated.order == 'F'
+    np.testing.assert_array_equal(axial_mip(negated, 2, 10, 512), (-volume[:, :, 2:10].astype(np.float32)).max(axis=2))
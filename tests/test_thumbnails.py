@@ -0,0 +1,30 @@
+import io
+import numpy as np
+from PIL import Image
+from app.processors.base import MedicalImageProcessor
+from app.processors.encoders import get_encoder
+from app.processors.thumbnails import THUMBNAIL_VIEWS, render_thumbnails
+
+
+def test_thumbnails_have_the_layout_of_their_view_slices():
+    # Non-cubic and below the render grid, so projections keep the slice shapes exactly
+    data = np.random.default_rng(0).integers(0, 255, (120, 60, 40)).astype(np.uint8)
+    images, _ = render_thumbnails(data, size=32, modes=('mip', 'composite'))
+    processor = MedicalImageProcessor()
+    encoder = get_encoder()
+    for view, axis in THUMBNAIL_VIEWS:
+        _, encoded, error = processor._encode_slice(data, axis, encoder, 0)
+        assert error is None
+        slice_size = Image.open(io.BytesIO(encoded)).size
+        for mode in ('mip', 'composite'):
+            assert images[f"{view}_{mode}"].size == slice_size, view
+
+
+def test_axial_thumbnail_is_not_transposed():
+    data = np.zeros((40, 20, 10), dtype=np.float32)
+    # Bright bar along the first volume axis: a wide axial image, like data[:, :, k].T
+    data[:, 5, :] = 1.0
+    images, _ = render_thumbnails(data, size=16, modes=('mip',))
+    pixels = np.asarray(images['axial_mip'])
+    assert pixels.shape == (20, 40)
+    assert pixels[5].min() == 255 and pixels[0].max() == 0
@@ -0,0 +1,13 @@
+import numpy as np
+from app.utils.validators import probe_file_content
+from tests.dicom_files import write_dicom
+
+
+def test_probe_checks_dicom_without_extension(tmp_path):
+    path = write_dicom(tmp_path / 'IM0001', np.zeros((8, 6), dtype=np.int16))
+    probe = probe_file_content(str(path), 'IM0001', dicom=True)
+    assert probe['valid'] and probe['header']['rows'] == 8 and probe['header']['columns'] == 6
+
+    # Truncated pixel data fails although the name says nothing about the format
+    path.write_bytes(path.read_bytes()[:-20])
+    assert not probe_file_content(str(path), 'IM0001', dicom=True)['valid']
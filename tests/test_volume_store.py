@@ -0,0 +1,33 @@
+import os
+import time
+import numpy as np
+from flask import Flask
+from app.processors.encoders import get_encoder
+from app.services.slice_render import SliceRenderer
+from app.services.volume_store import cleanup_stale_volumes, get_volume_path, write_chunked_volume
+
+DAY = 24 * 60 * 60
+
+
+def _age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_cleanup_keeps_volumes_that_are_still_rendered(tmp_path):
+    app = Flask(__name__)
+    app.config['VOLUME_STORE_FOLDER'] = str(tmp_path / 'volumes')
+    data = np.arange(8 * 8 * 8, dtype=np.int16).reshape(8, 8, 8)
+    with app.app_context():
+        for volume_id in ('viewed', 'idle'):
+            write_chunked_volume(data, volume_id, chunk=4)
+            _age(get_volume_path(volume_id), 40 * DAY)
+        os.makedirs(get_volume_path('abandoned') + '.tmp')
+        _age(get_volume_path('abandoned') + '.tmp', 2 * DAY)
+
+        renderer = SliceRenderer(app.config['VOLUME_STORE_FOLDER'], str(tmp_path / 'cache'), get_encoder())
+        renderer.render('viewed', 'axial', 3)
+
+        assert cleanup_stale_volumes(DAY, pending_only=True) == 1
+        assert cleanup_stale_volumes(30 * DAY) == 1
+        assert sorted(os.listdir(app.config['VOLUME_STORE_FOLDER'])) == ['viewed']
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+from flask import Flask
+from app.processors.base import MedicalImageProcessor
+from app.processors.windowing import as_lut_source, get_window_presets
+from app.services.workspace import get_workspace_path
+
+PRESETS = {'WINDOW_PRESETS_BY_REPORT': {'cbct': ['bone', 'airway']}}
+
+
+def _save(tmp_path, processor, volume, output_id):
+    app = Flask(__name__)
+    app.config.update(BASE_PATH=str(tmp_path), SLICE_PREVIEW_FACTOR=1, WINDOW_BATCH_SLICES=4)
+    with app.app_context():
+        processor.save_slices(processor.normalize_data(volume), output_id, None, as_lut_source(volume))
+        return get_workspace_path(output_id)
+
+
+def _volume():
+    return np.random.default_rng(0).integers(-1000, 2000, (12, 10, 9)).astype(np.int16)
+
+
+def test_window_counts_match_written_files(tmp_path):
+    processor = MedicalImageProcessor(window_presets=get_window_presets('cbct', PRESETS))
+    workspace = _save(tmp_path, processor, _volume(), 'ok')
+    for name, counts in processor.window_counts.items():
+        for view, count in counts.items():
+            assert count == len(os.listdir(os.path.join(workspace, 'windows', name, view)))
+            assert count == len(processor.slice_index_map[view])
+
+
+def test_failed_window_batch_drops_the_presets(tmp_path):
+    class FailingProcessor(MedicalImageProcessor):
+        def _encode_window_batch(self, data, axis, luts, encoder, batch):
+            if axis == 1 and 4 in batch:
+                return None, RuntimeError('decoder failure')
+            return super()._encode_window_batch(data, axis, luts, encoder, batch)
+
+    processor = FailingProcessor(window_presets=get_window_presets('cbct', PRESETS))
+    workspace = _save(tmp_path, processor, _volume(), 'failed')
+    assert processor.window_counts == {}
+    assert not os.path.exists(os.path.join(workspace, 'windows'))
+    assert sum(len(indices) for indices in processor.slice_index_map.values()) == 12 + 10 + 9